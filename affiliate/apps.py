@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AffiliateConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'affiliate'
+
+    def ready(self):
+        import affiliate.signals
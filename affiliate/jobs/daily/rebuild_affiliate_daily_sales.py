@@ -0,0 +1,10 @@
+from django_extensions.management.jobs import DailyJob
+
+from affiliate.models import AffiliateDailySale
+
+
+class Job(DailyJob):
+    help = "Rebuild daily sales of every business, changes are picked up by signals during the day"
+
+    def execute(self):
+        AffiliateDailySale.refresh()
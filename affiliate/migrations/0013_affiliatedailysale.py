@@ -0,0 +1,55 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:09
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, F, DecimalField
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def fill_affiliate_daily_sales(apps, schema_editor):
+    # as `AffiliateDailySale.refresh`
+    AffiliateFactor = apps.get_model('affiliate', 'AffiliateFactor')
+    AffiliateDailySale = apps.get_model('affiliate', 'AffiliateDailySale')
+    sales = AffiliateFactor.objects.filter(
+        business__isnull=False, created_at__isnull=False
+    ).order_by().annotate(day=TruncDate('created_at')).values('business_id', 'day').annotate(
+        count=Count('id', distinct=True),
+        quantity_sum=Sum('items__quantity'),
+        amount_sum=Sum(F('items__quantity') * F('items__price'), output_field=DecimalField()),
+    )
+    AffiliateDailySale.objects.bulk_create([
+        AffiliateDailySale(
+            business_id=sale['business_id'],
+            day=sale['day'],
+            factors_count=sale['count'],
+            quantity=sale['quantity_sum'] or 0,
+            amount=sale['amount_sum'] or 0,
+        ) for sale in sales
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_alter_currency_exchange_rate_to_toman'),
+        ('affiliate', '0012_alter_affiliatefactor_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AffiliateDailySale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('factors_count', models.IntegerField(default=0)),
+                ('quantity', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=6, default=0, max_digits=24)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='affiliate_daily_sales', to='main.business')),
+            ],
+            options={
+                'unique_together': {('business', 'day')},
+            },
+        ),
+        migrations.RunPython(fill_affiliate_daily_sales, migrations.RunPython.noop),
+    ]
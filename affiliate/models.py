@@ -2,10 +2,12 @@ import datetime
 from decimal import Decimal
 
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Sum, F, DecimalField, Max
+from django.db import models, transaction
+from django.db.models import Sum, F, DecimalField, Max, Count
+from django.db.models.functions import TruncDate
 import zeep
 
+from helpers.db import add_to_commit_batch, get_commit_batch
 from helpers.models import BaseModel, DECIMAL, EXPLANATION
 from main.models import Business
 from products.models import Product
@@ -83,3 +85,89 @@ class AffiliateFactorItem(BaseModel):
             ('updateOwn.affiliate_factor_item', 'ویرایش ردیف فاکتور افیلیت خود'),
             ('deleteOwn.affiliate_factor_item', 'حذف ردیف فاکتور افیلیت خود'),
         )
+
+
+class AffiliateDailySale(models.Model):
+    """
+        Factors, quantity and amount of affiliate factors of business by day of their registration
+        Kept by `affiliate.signals` on changes of factors and items and rebuilt daily
+    """
+    business = models.ForeignKey(Business, related_name='affiliate_daily_sales', on_delete=models.CASCADE)
+    day = models.DateField()
+    factors_count = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    amount = DECIMAL()
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('business', 'day')
+
+    def __str__(self):
+        return '{} {}'.format(self.business_id, self.day)
+
+    @classmethod
+    def refresh(cls, business_id=None, days=None):
+        """
+            Recompute sales of business in days (all by default), pass None to rebuild every business
+            Business row is locked while its sales are replaced
+        """
+        if business_id is None:
+            business_ids = set(AffiliateFactor.objects.filter(
+                business__isnull=False
+            ).order_by().values_list('business_id', flat=True).distinct())
+            rows = cls.objects.exclude(business_id__in=business_ids)
+            if days is not None:
+                rows = rows.filter(day__in=days)
+            with transaction.atomic():
+                rows.delete()
+                for business_id in sorted(business_ids):
+                    cls.refresh(business_id, days)
+            return
+
+        factors = AffiliateFactor.objects.filter(business_id=business_id, created_at__isnull=False)
+        rows = cls.objects.filter(business_id=business_id)
+        if days is not None:
+            factors = factors.filter(created_at__date__in=days)
+            rows = rows.filter(day__in=days)
+
+        with transaction.atomic():
+            # refreshes of a business wait for each other, so rows of a day are not inserted twice and each one
+            # reads factors committed before it
+            list(Business.objects.select_for_update().filter(id=business_id).values_list('id', flat=True))
+            sales = list(factors.order_by().annotate(day=TruncDate('created_at')).values('day').annotate(
+                count=Count('id', distinct=True),
+                quantity_sum=Sum('items__quantity'),
+                amount_sum=Sum(F('items__quantity') * F('items__price'), output_field=DecimalField()),
+            ))
+            rows.delete()
+            cls.objects.bulk_create([
+                cls(
+                    business_id=business_id,
+                    day=sale['day'],
+                    factors_count=sale['count'],
+                    quantity=sale['quantity_sum'] or 0,
+                    amount=sale['amount_sum'] or 0,
+                ) for sale in sales
+            ], batch_size=500)
+
+    @classmethod
+    def refresh_on_commit(cls, business_id, days):
+        """
+            Refreshes days changed in the running transaction once for each business after commit
+        """
+        if business_id is not None:
+            add_to_commit_batch('affiliate_daily_sales', cls.refresh, business_id, (day for day in days if day))
+
+    @classmethod
+    def get_factor_sale_day(cls, factor_id):
+        """
+            Business and day of factor, remembered for the running transaction (items are deleted one by one)
+        """
+        batch = get_commit_batch('affiliate_daily_sales')
+        if batch is not None and factor_id in batch.cache:
+            return batch.cache[factor_id]
+        factor = AffiliateFactor.objects.filter(pk=factor_id).values_list('business_id', 'created_at').first()
+        sale_day = (factor[0], factor[1].date() if factor[1] else None) if factor else (None, None)
+        if batch is not None:
+            batch.cache[factor_id] = sale_day
+        return sale_day
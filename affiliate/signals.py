@@ -0,0 +1,45 @@
+from django.db.models.signals import pre_save, post_save, pre_delete
+from django.dispatch import receiver
+
+from affiliate.models import AffiliateFactor, AffiliateFactorItem, AffiliateDailySale
+from helpers.db import get_commit_batch
+
+
+def get_sale_day(factor):
+    return factor.business_id, factor.created_at.date() if factor.created_at else None
+
+
+@receiver(pre_save, sender=AffiliateFactor)
+def keep_previous_sale_day(sender, instance, **kwargs):
+    instance.previous_sale_day = None
+    if instance.pk:
+        previous = AffiliateFactor.objects.filter(pk=instance.pk).only('business_id', 'created_at').first()
+        instance.previous_sale_day = get_sale_day(previous) if previous else None
+
+
+@receiver(post_save, sender=AffiliateFactor)
+def refresh_factor_daily_sale(sender, instance, **kwargs):
+    business_id, day = get_sale_day(instance)
+    if instance.previous_sale_day and instance.previous_sale_day != (business_id, day):
+        previous_business_id, previous_day = instance.previous_sale_day
+        AffiliateDailySale.refresh_on_commit(previous_business_id, [previous_day])
+    AffiliateDailySale.refresh_on_commit(business_id, [day])
+
+    batch = get_commit_batch('affiliate_daily_sales')
+    if batch is not None:
+        batch.cache[instance.pk] = (business_id, day)
+
+
+@receiver(post_save, sender=AffiliateFactorItem)
+def refresh_item_daily_sale(sender, instance, **kwargs):
+    business_id, day = AffiliateDailySale.get_factor_sale_day(instance.affiliate_factor_id)
+    AffiliateDailySale.refresh_on_commit(business_id, [day])
+
+
+# deletes run in a transaction, factor is read before it goes and sales are refreshed after commit
+@receiver(pre_delete, sender=AffiliateFactor)
+@receiver(pre_delete, sender=AffiliateFactorItem)
+def refresh_deleted_daily_sale(sender, instance, **kwargs):
+    factor_id = instance.pk if sender is AffiliateFactor else instance.affiliate_factor_id
+    business_id, day = AffiliateDailySale.get_factor_sale_day(factor_id)
+    AffiliateDailySale.refresh_on_commit(business_id, [day])
@@ -1,3 +1,57 @@
-from django.test import TestCase
+import datetime
+from decimal import Decimal
 
-# Create your tests here.
+from affiliate.models import AffiliateFactor, AffiliateFactorItem, AffiliateDailySale
+from helpers.test import MTestCase
+from main.models import Business
+from products.models import Product
+
+
+class AffiliateDailySaleTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.business = Business.objects.create(name='business')
+        self.other_business = Business.objects.create(name='other business')
+        self.product = Product.objects.create(product_id='sold', name='sold')
+
+    def get_sales(self):
+        return list(AffiliateDailySale.objects.order_by('business_id', 'day').values_list(
+            'business_id', 'factors_count', 'quantity', 'amount'
+        ))
+
+    def create_factor(self, business, *quantities):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            factor = AffiliateFactor.objects.create(business=business)
+            for quantity in quantities:
+                AffiliateFactorItem.objects.create(
+                    affiliate_factor=factor, product=self.product, quantity=quantity, price=1000
+                )
+        self.assertEqual(len(callbacks), 1)
+        return factor
+
+    def test_sales_follow_factors(self):
+        factor = self.create_factor(self.business, 1, 2)
+        self.create_factor(self.business, 4)
+        self.assertEqual(self.get_sales(), [(self.business.id, 2, 7, Decimal('7000'))])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            factor.business = self.other_business
+            factor.save()
+        self.assertEqual(self.get_sales(), [
+            (self.business.id, 1, 4, Decimal('4000')), (self.other_business.id, 1, 3, Decimal('3000'))
+        ])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            factor.delete()
+        self.assertEqual(self.get_sales(), [(self.business.id, 1, 4, Decimal('4000'))])
+
+    def test_rebuild(self):
+        factor = self.create_factor(self.business, 3)
+        AffiliateFactor.objects.filter(pk=factor.pk).update(created_at=datetime.datetime(2020, 1, 1, 12))
+        AffiliateDailySale.objects.create(business=self.other_business, day=datetime.date(2020, 1, 1))
+
+        AffiliateDailySale.refresh()
+        self.assertEqual(list(AffiliateDailySale.objects.values_list('business_id', 'day', 'quantity')), [
+            (self.business.id, datetime.date(2020, 1, 1), 3)
+        ])
@@ -1,5 +1,8 @@
-from django.db.models import Sum, F, DecimalField
+from django.db import transaction
+from django.db.models import Sum, F, DecimalField, Count, Q
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
@@ -48,35 +51,37 @@ class AffiliateFactorCreateApiView(APIView):
 
         serializer = AffiliateFactorCreateSerializer(data=data)
         if serializer.is_valid():
-            serializer.save()
-            if User.objects.filter(mobile_number=serializer.instance.phone).exists():
-                customer = User.objects.get(mobile_number=serializer.instance.phone)
-                if not customer.postal_code:
-                    customer.postal_code = serializer.instance.postal_code
-                if not customer.address:
-                    customer.address = serializer.instance.address
-                customer.save()
-            else:
-                customer = User.objects.create(
-                    username=serializer.instance.phone,
-                    mobile_number=serializer.instance.phone,
-                    password=serializer.instance.phone,
-                    first_name=serializer.instance.customer_name,
-                    address=serializer.instance.address,
-                    postal_code=serializer.instance.postal_code,
-                    user_type=User.CUSTOMER
-                )
-            serializer.instance.customer = customer
-            serializer.instance.save()
-            business.customers.add(customer)
-            business.save()
-            for item in items:
-                AffiliateFactorItem.objects.create(
-                    affiliate_factor=serializer.instance,
-                    product=Product.objects.get(id=item['product_code']),
-                    quantity=item['quantity'],
-                    price=item['price']
-                )
+            # factor and its items are saved together, daily sales are refreshed once after commit
+            with transaction.atomic():
+                serializer.save()
+                if User.objects.filter(mobile_number=serializer.instance.phone).exists():
+                    customer = User.objects.get(mobile_number=serializer.instance.phone)
+                    if not customer.postal_code:
+                        customer.postal_code = serializer.instance.postal_code
+                    if not customer.address:
+                        customer.address = serializer.instance.address
+                    customer.save()
+                else:
+                    customer = User.objects.create(
+                        username=serializer.instance.phone,
+                        mobile_number=serializer.instance.phone,
+                        password=serializer.instance.phone,
+                        first_name=serializer.instance.customer_name,
+                        address=serializer.instance.address,
+                        postal_code=serializer.instance.postal_code,
+                        user_type=User.CUSTOMER
+                    )
+                serializer.instance.customer = customer
+                serializer.instance.save()
+                business.customers.add(customer)
+                business.save()
+                for item in items:
+                    AffiliateFactorItem.objects.create(
+                        affiliate_factor=serializer.instance,
+                        product=Product.objects.get(id=item['product_code']),
+                        quantity=item['quantity'],
+                        price=item['price']
+                    )
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -208,26 +213,44 @@ class AffiliateCustomersView(APIView):
 class BusinessAffiliateReportView(APIView):
     permission_basename = 'business'
 
+    def get_businesses(self, start_date, end_date):
+        if not start_date and not end_date:
+            return Business.objects.annotate(
+                factors_count=Count('affiliate_factors', distinct=True),
+                sale_price_sum=Sum(
+                    F('affiliate_factors__items__quantity') * F('affiliate_factors__items__price'),
+                    output_field=DecimalField()
+                ),
+                sale_quantity_sum=Sum('affiliate_factors__items__quantity'),
+            )
+
+        # date ranges are read from daily sales
+        sales = Q()
+        if start_date:
+            sales &= Q(affiliate_daily_sales__day__gte=start_date)
+        if end_date:
+            sales &= Q(affiliate_daily_sales__day__lte=end_date)
+        return Business.objects.annotate(
+            factors_count=Coalesce(Sum('affiliate_daily_sales__factors_count', filter=sales), 0),
+            sale_price_sum=Sum('affiliate_daily_sales__amount', filter=sales),
+            sale_quantity_sum=Sum('affiliate_daily_sales__quantity', filter=sales),
+        )
+
     def get(self, request):
-        response = []
-        for business in Business.objects.all():
-            affiliate_factors = AffiliateFactor.objects.filter(business=business).select_related('business')
-            affiliate_factor_quantity_sum = AffiliateFactorItem.objects.filter(
-                affiliate_factor__in=affiliate_factors).aggregate(Sum('quantity'))['quantity__sum']
-            affiliate_factor_price_sum = AffiliateFactorItem.objects.filter(
-                affiliate_factor__in=affiliate_factors).annotate(
-                final_price=Sum(F('quantity') * F('price'), output_field=DecimalField()),
-            ).aggregate(Sum('final_price'))['final_price__sum']
-
-            result = {
+        try:
+            start_date = parse_date(request.query_params.get('start_date') or '')
+            end_date = parse_date(request.query_params.get('end_date') or '')
+        except ValueError:
+            return Response({'detail': 'invalid date format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = [
+            {
                 'business': business.name,
                 'domain_address': business.domain_address,
-                'factors_count': affiliate_factors.count(),
-                'sale_price_sum': affiliate_factor_price_sum,
-                'sale_quantity_sum': affiliate_factor_quantity_sum,
-            }
-
-            response.append(result)
+                'factors_count': business.factors_count,
+                'sale_price_sum': business.sale_price_sum,
+                'sale_quantity_sum': business.sale_quantity_sum,
+            } for business in self.get_businesses(start_date, end_date).only('id', 'name', 'domain_address')
+        ]
 
         return Response(response, status=status.HTTP_200_OK)
-
@@ -0,0 +1,10 @@
+from django_extensions.management.jobs import DailyJob
+
+from crm.models import UserRecommendation
+
+
+class Job(DailyJob):
+    help = "Rebuild recommended products of active users and remove inactive ones"
+
+    def execute(self):
+        UserRecommendation.refresh()
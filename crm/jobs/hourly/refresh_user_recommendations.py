@@ -0,0 +1,10 @@
+from django_extensions.management.jobs import HourlyJob
+
+from crm.models import UserRecommendation
+
+
+class Job(HourlyJob):
+    help = "Recompute recommended products of users active since the last refresh"
+
+    def execute(self):
+        UserRecommendation.refresh_changed()
@@ -0,0 +1,10 @@
+from django_extensions.management.jobs import MinutelyJob
+
+from crm.log_events import flush_log_events
+
+
+class Job(MinutelyJob):
+    help = "Save queued product view and search logs in batches"
+
+    def execute(self):
+        flush_log_events()
@@ -0,0 +1,190 @@
+import datetime
+import json
+import logging
+import time
+from collections import deque
+
+from django.core.cache import cache
+from django.db import transaction, InterfaceError, OperationalError
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from crm.models import ShopProductViewLog, SearchLog
+from products.models import Product
+from users.models import User
+
+PRODUCT_VIEW_EVENT = 'view'
+SEARCH_EVENT = 'search'
+
+LOG_EVENTS_KEY = 'log_events'
+FAILED_LOG_EVENTS_KEY = 'log_events:failed'
+FLUSH_BATCH_SIZE = 1000
+FAILED_LOG_EVENTS_SIZE = 10000
+
+# used when the default cache is not redis (ex: tests)
+_local_events = deque()
+_local_failed_events = deque(maxlen=FAILED_LOG_EVENTS_SIZE)
+
+logger = logging.getLogger(__name__)
+
+
+def get_log_events_key(key=LOG_EVENTS_KEY):
+    # not made by cache key function, queued events must survive `bump_cache_generation`
+    return '{}:{}'.format(cache.key_prefix, key)
+
+
+def get_connection():
+    try:
+        return get_redis_connection('default')
+    except NotImplementedError:
+        return None
+
+
+def push_log_event(event_type, **data):
+    """
+        Queues a log to be saved by `flush_log_events`, falls back to saving it at once if redis is down
+    """
+    event = json.dumps({'type': event_type, 'time': time.time(), **data}, separators=(',', ':'))
+    connection = get_connection()
+
+    if connection is None:
+        _local_events.append(event)
+        return
+
+    try:
+        connection.rpush(get_log_events_key(), event)
+    except RedisError:
+        save_log_events([event])
+
+
+def pop_log_events(count):
+    connection = get_connection()
+
+    if connection is None:
+        return [_local_events.popleft() for i in range(min(count, len(_local_events)))]
+
+    key = get_log_events_key()
+    pipeline = connection.pipeline()
+    pipeline.lrange(key, 0, count - 1)
+    pipeline.ltrim(key, count, -1)
+    events, trimmed = pipeline.execute()
+    return events
+
+
+def requeue_log_events(events):
+    """
+        Puts popped events back to the head of queue in their order
+    """
+    connection = get_connection()
+
+    if connection is None:
+        _local_events.extendleft(reversed(events))
+        return
+
+    connection.lpush(get_log_events_key(), *reversed(events))
+
+
+def push_failed_log_events(events):
+    """
+        Keeps the last `FAILED_LOG_EVENTS_SIZE` events that could not be saved, to be inspected by hand
+    """
+    connection = get_connection()
+
+    if connection is None:
+        _local_failed_events.extend(events)
+        return
+
+    key = get_log_events_key(FAILED_LOG_EVENTS_KEY)
+    pipeline = connection.pipeline()
+    pipeline.rpush(key, *events)
+    pipeline.ltrim(key, -FAILED_LOG_EVENTS_SIZE, -1)
+    pipeline.execute()
+
+
+def truncate_char_fields(log):
+    # long queries and referers are cut to fit their columns
+    for field in log._meta.concrete_fields:
+        value = getattr(log, field.attname)
+        if field.max_length and isinstance(value, str) and len(value) > field.max_length:
+            setattr(log, field.attname, value[:field.max_length])
+
+
+def save_log_events(events):
+    events = [json.loads(event) for event in events]
+    product_ids = set(Product.objects.filter(
+        id__in={event['product_id'] for event in events if event['type'] == PRODUCT_VIEW_EVENT}
+    ).values_list('id', flat=True))
+    # users may be deleted while their events are queued
+    user_ids = set(User.objects.filter(
+        id__in={event['user_id'] for event in events if event.get('user_id')}
+    ).values_list('id', flat=True))
+
+    view_logs = []
+    search_logs = []
+    for event in events:
+        event_type = event.pop('type')
+        event['created_at'] = datetime.datetime.fromtimestamp(event.pop('time'))
+        if event.get('user_id') not in user_ids:
+            event['user_id'] = None
+
+        if event_type == PRODUCT_VIEW_EVENT:
+            if event['product_id'] not in product_ids:
+                continue
+            log = ShopProductViewLog(**event)
+            view_logs.append(log)
+        else:
+            log = SearchLog(**event)
+            search_logs.append(log)
+
+        if log.user_agent:
+            log.set_user_agent_fields()
+        truncate_char_fields(log)
+
+    with transaction.atomic():
+        ShopProductViewLog.objects.bulk_create(view_logs, batch_size=500)
+        SearchLog.objects.bulk_create(search_logs, batch_size=500)
+
+
+def save_log_events_by_halves(events):
+    """
+        Saves events of a failed batch, halves are split again until the failing events are found
+        and moved to the failed events
+    """
+    middle = len(events) // 2
+    for part in (events[:middle], events[middle:]):
+        try:
+            save_log_events(part)
+        except (OperationalError, InterfaceError):
+            raise
+        except Exception:
+            if len(part) > 1:
+                save_log_events_by_halves(part)
+            else:
+                logger.exception('Log event is not saved: %s', part[0])
+                push_failed_log_events(part)
+
+
+def flush_log_events():
+    """
+        Saves queued logs in batches, returns count of flushed events
+        A batch is put back to the queue when database is not reachable, events that fail on their own are
+        moved to the failed events so the rest of batch is saved
+    """
+    flushed = 0
+    while True:
+        events = pop_log_events(FLUSH_BATCH_SIZE)
+        if not events:
+            return flushed
+        try:
+            save_log_events(events)
+        except (OperationalError, InterfaceError):
+            requeue_log_events(events)
+            raise
+        except Exception:
+            try:
+                save_log_events_by_halves(events)
+            except (OperationalError, InterfaceError):
+                # saved halves are saved again on next flush
+                requeue_log_events(events)
+                raise
+        flushed += len(events)
@@ -0,0 +1,85 @@
+import random
+import time
+
+from django.core.management import BaseCommand
+from django.db.models import Count
+from user_agents import parse as user_agent_parse
+
+from crm import models as crm_models
+from crm.models import ShopProductViewLog, parse_user_agent, get_user_agent_cache_stats
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 13; SM-A536E) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'SamsungBrowser/23.0 Chrome/115.0.0.0 Mobile Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 12; M2101K6G) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/119.0.6045.163 Mobile Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+    'Version/17.1 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+    'Mobile/15E148 Instagram 307.0.0.34.111 (iPhone13,2; iOS 16_6; fa_IR; fa; scale=3.00; 1170x2532; 531437136)',
+    'Mozilla/5.0 (iPad; CPU OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+    'Version/16.6 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+    'Version/17.1 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+    'Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)',
+    'TelegramBot (like TwitterBot)',
+]
+
+
+class Command(BaseCommand):
+    help = 'compare user agent parse time per saved log with and without the shared LRU cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--saves', type=int, default=10000)
+        parser.add_argument('--from-logs', action='store_true', help='use user agents of latest product view logs')
+
+    def get_corpus(self, saves, from_logs):
+        if from_logs:
+            rows = ShopProductViewLog.objects.exclude(user_agent='').values('user_agent').annotate(
+                count=Count('id')
+            ).order_by('-count')[:1000]
+            user_agents = [row['user_agent'] for row in rows]
+            weights = [row['count'] for row in rows]
+        else:
+            # few user agents make most of the traffic
+            user_agents = USER_AGENTS
+            weights = [1 / (rank + 1) for rank in range(len(user_agents))]
+
+        random.seed(0)
+        return random.choices(user_agents, weights=weights, k=saves)
+
+    def run(self, corpus):
+        log = ShopProductViewLog()
+        started_at = time.perf_counter()
+        for user_agent in corpus:
+            log.user_agent = user_agent
+            log.set_user_agent_fields()
+        return (time.perf_counter() - started_at) / len(corpus)
+
+    def handle(self, *args, **options):
+        corpus = self.get_corpus(options['saves'], options['from_logs'])
+        if not corpus:
+            self.stdout.write('no user agents to parse')
+            return
+
+        crm_models.parse_user_agent = user_agent_parse
+        try:
+            before = self.run(corpus)
+        finally:
+            crm_models.parse_user_agent = parse_user_agent
+
+        parse_user_agent.cache.clear()
+        after = self.run(corpus)
+
+        self.stdout.write('{} saves, {} distinct user agents'.format(len(corpus), len(set(corpus))))
+        self.stdout.write('without cache: {:.1f} µs per save'.format(before * 10 ** 6))
+        self.stdout.write('with cache: {:.1f} µs per save ({:.1f}x)'.format(after * 10 ** 6, before / after))
+        self.stdout.write('cache: {}'.format(get_user_agent_cache_stats()))
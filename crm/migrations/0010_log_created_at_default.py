@@ -0,0 +1,24 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:31
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0009_alter_notification_product'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='searchlog',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=datetime.datetime.now),
+        ),
+        migrations.AlterField(
+            model_name='shopproductviewlog',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=datetime.datetime.now),
+        ),
+    ]
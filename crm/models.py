@@ -1,11 +1,37 @@
-from django.db import models
+import datetime
 
+from django.contrib.postgres.fields import ArrayField
+from django.db import models, transaction
+from django.db.models import Max
+
+from helpers.memoize import local_cache, get_local_cache_stats
 from helpers.models import TimeStampedModel
 
 from user_agents import parse as user_agent_parse
 from helpers.sms import Sms
 
 
+USER_AGENT_CACHE_SIZE = 1024
+USER_AGENT_CACHE_TIMEOUT = 60 * 60
+
+
+@local_cache(timeout=USER_AGENT_CACHE_TIMEOUT, maxsize=USER_AGENT_CACHE_SIZE, key_func=lambda user_agent: user_agent)
+def parse_user_agent(user_agent):
+    """
+        Parsed user agents are shared by every `UserAgentModel` of the process, parsing is regex heavy
+    """
+    return user_agent_parse(user_agent)
+
+
+def get_user_agent_cache_stats():
+    stats = get_local_cache_stats().get(parse_user_agent.cache.name, {'hits': 0, 'misses': 0, 'hit_rate': None})
+    return {
+        **stats,
+        'size': len(parse_user_agent.cache),
+        'max_size': parse_user_agent.cache.maxsize,
+    }
+
+
 class UserAgentModel(models.Model):
     DESKTOP = 'd'
     MOBILE = 'm'
@@ -34,7 +60,7 @@ class UserAgentModel(models.Model):
 
     @property
     def user_agent_object(self):
-        return user_agent_parse(self.user_agent or '')
+        return parse_user_agent(self.user_agent or '')
 
     @property
     def get_browser_type(self):
@@ -56,7 +82,7 @@ class UserAgentModel(models.Model):
 
     @property
     def get_device_family(self):
-        return self.user_agent_object.device.version or None
+        return self.user_agent_object.device.family or None
 
     @property
     def get_user_device(self):
@@ -78,15 +104,21 @@ class UserAgentModel(models.Model):
     class Meta:
         abstract = True
 
+    def set_user_agent_fields(self):
+        """
+            Fills parsed fields of `user_agent`, `bulk_create` callers have to call it themselves
+        """
+        self.device_type = self.get_user_device
+        self.browser_type = self.get_browser_type
+        self.browser_version = self.get_browser_version
+        self.os_type = self.get_os_type
+        self.os_version = self.get_os_version
+        self.device_family = self.get_device_family
+        self.is_touch_device = self.get_is_touch_device
+
     def save(self, *args, **kwargs):
         if not self.id and self.user_agent:
-            self.device_type = self.get_user_device
-            self.browser_type = self.get_browser_type
-            self.browser_version = self.get_browser_version
-            self.os_type = self.get_os_type
-            self.os_version = self.get_os_version
-            self.device_family = self.get_device_family
-            self.is_touch_device = self.get_is_touch_device
+            self.set_user_agent_fields()
 
         super().save(*args, **kwargs)
 
@@ -195,6 +227,58 @@ class SearchLog(TimeStampedModel, UserAgentModel):
         return f"{self.user.name or 'guest'} search about ''' {self.query_value} ''' at {self.created_at}"
 
 
+class UserRecommendation(models.Model):
+    user = models.OneToOneField('users.User', related_name='recommendation', on_delete=models.CASCADE)
+    # best first
+    product_ids = ArrayField(models.BigIntegerField(), default=list)
+    last_updated = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return '{} {}'.format(self.user_id, self.product_ids[:5])
+
+    @classmethod
+    def refresh(cls, user_ids=None):
+        """
+        Recompute recommended products of users, pass None to rebuild every user active in the last
+        `ACTIVITY_DAYS`, rows of other users are removed then
+        """
+        from crm.recommendations import RecommendationBuilder, get_active_user_ids, ACTIVITY_DAYS
+
+        now = datetime.datetime.now()
+        since = now - datetime.timedelta(days=ACTIVITY_DAYS)
+        if user_ids is None:
+            user_ids = get_active_user_ids(since)
+            cls.objects.exclude(user_id__in=user_ids).delete()
+
+        builder = RecommendationBuilder()
+        user_ids = sorted(user_ids)
+        for index in range(0, len(user_ids), 500):
+            chunk = user_ids[index:index + 500]
+            recommendations = builder.get_recommendations(chunk, since)
+            with transaction.atomic():
+                cls.objects.filter(user_id__in=chunk).delete()
+                cls.objects.bulk_create([
+                    cls(user_id=user_id, product_ids=product_ids, last_updated=now)
+                    for user_id, product_ids in recommendations.items() if product_ids
+                ])
+
+    @classmethod
+    def refresh_changed(cls):
+        """
+        Recompute users active since the last refresh, rebuilds every user on first run
+        """
+        from crm.recommendations import get_active_user_ids
+
+        last_refresh = cls.objects.aggregate(last_refresh=Max('last_updated'))['last_refresh']
+        if last_refresh is None:
+            cls.refresh()
+            return
+
+        user_ids = get_active_user_ids(last_refresh)
+        if user_ids:
+            cls.refresh(user_ids)
+
+
 class Notification(models.Model):
     SEND_BY_SYSTEM = 'ss'
     SEND_BY_ADMIN = 'sa'
@@ -0,0 +1,167 @@
+import heapq
+from collections import defaultdict, Counter
+from operator import itemgetter
+
+from django.db.models import Count
+
+from crm.models import ShopProductViewLog, SearchLog, UserRecommendation
+from helpers.memoize import shared_cache
+from products.models import Product, ProductSimilarity, ProductViewCount
+from products.search import search_products, normalize_persian
+from shop.models import WishList, ShopOrderItem, ShopOrder
+
+RECOMMENDED_PRODUCTS_COUNT = 50
+ACTIVITY_DAYS = 30
+
+VIEW_WEIGHT = 1
+VIEWS_CAP = 5
+SEARCH_WEIGHT = 2
+ORDER_WEIGHT = 3
+WISHLIST_WEIGHT = 4
+
+SEARCH_KEYWORDS_COUNT = 5
+SEARCH_RESULTS_COUNT = 20
+
+
+def get_active_user_ids(since):
+    user_ids = set(ShopProductViewLog.objects.filter(
+        created_at__gte=since, user__isnull=False
+    ).order_by().values_list('user_id', flat=True).distinct())
+    user_ids.update(SearchLog.objects.filter(
+        created_at__gte=since, user__isnull=False
+    ).order_by().values_list('user_id', flat=True).distinct())
+    user_ids.update(WishList.objects.filter(
+        created_at__gte=since
+    ).order_by().values_list('customer_id', flat=True).distinct())
+    user_ids.update(ShopOrder.objects.filter(
+        created_at__gte=since
+    ).order_by().values_list('customer_id', flat=True).distinct())
+    return user_ids
+
+
+class UserInterests:
+    """
+        Products users interacted with (viewed, searched, wished and ordered) and their latest search keywords,
+        loaded for a group of users by one query for each kind of interaction
+    """
+
+    def __init__(self, user_ids, since):
+        self.sources = defaultdict(Counter)
+        self.keywords = defaultdict(list)
+        self.known_products = defaultdict(set)
+
+        for user_id, product_id, count in ShopProductViewLog.objects.filter(
+                user_id__in=user_ids, created_at__gte=since
+        ).order_by().values('user_id', 'product_id').annotate(
+            count=Count('id')
+        ).values_list('user_id', 'product_id', 'count').iterator():
+            self.sources[user_id][product_id] += VIEW_WEIGHT * min(count, VIEWS_CAP)
+
+        for user_id, query_value, product_id in SearchLog.objects.filter(
+                user_id__in=user_ids, created_at__gte=since
+        ).order_by('-created_at').values_list('user_id', 'query_value', 'product_id').iterator():
+            if product_id:
+                self.sources[user_id][product_id] += SEARCH_WEIGHT
+                continue
+            keyword = normalize_persian(query_value)
+            if keyword and keyword not in self.keywords[user_id] and \
+                    len(self.keywords[user_id]) < SEARCH_KEYWORDS_COUNT:
+                self.keywords[user_id].append(keyword)
+
+        for user_id, product_id in WishList.objects.filter(
+                customer_id__in=user_ids
+        ).values_list('customer_id', 'product_id').iterator():
+            self.sources[user_id][product_id] += WISHLIST_WEIGHT
+            self.known_products[user_id].add(product_id)
+
+        for user_id, product_id in ShopOrderItem.objects.filter(
+                shop_order__customer_id__in=user_ids
+        ).values_list('shop_order__customer_id', 'product_id').iterator():
+            self.sources[user_id][product_id] += ORDER_WEIGHT
+            self.known_products[user_id].add(product_id)
+
+    def get_source_product_ids(self):
+        product_ids = set()
+        for sources in self.sources.values():
+            product_ids.update(sources.keys())
+        return product_ids
+
+
+class RecommendationBuilder:
+    """
+        score = similarity of product to each product user interacted with (relative to the most similar one)
+        multiplied by weight of interaction, plus rank of product in results of user latest searches
+
+        Products user already wished or ordered are not recommended
+    """
+
+    def __init__(self):
+        self.keyword_results = {}
+
+    def get_similarities(self, product_ids):
+        similarities = defaultdict(list)
+        for product_id, similar_product_id, score in ProductSimilarity.objects.filter(
+                product_id__in=product_ids
+        ).order_by('product_id', '-score').values_list('product_id', 'similar_product_id', 'score').iterator():
+            similarities[product_id].append((similar_product_id, score))
+        return similarities
+
+    def get_keyword_results(self, keyword):
+        if keyword not in self.keyword_results:
+            self.keyword_results[keyword] = list(search_products(
+                Product.objects.filter(status=Product.PUBLISHED), keyword
+            ).order_by('-search_rank').values_list('id', flat=True)[:SEARCH_RESULTS_COUNT])
+        return self.keyword_results[keyword]
+
+    def get_recommendations(self, user_ids, since):
+        """
+            Returns dict of user id to recommended product ids, best first
+        """
+        interests = UserInterests(user_ids, since)
+        similarities = self.get_similarities(interests.get_source_product_ids())
+
+        recommendations = {}
+        for user_id in user_ids:
+            scores = Counter()
+            for product_id, weight in interests.sources[user_id].items():
+                similar_products = similarities.get(product_id)
+                if not similar_products:
+                    continue
+                top_score = similar_products[0][1] or 1
+                for similar_product_id, score in similar_products:
+                    scores[similar_product_id] += weight * score / top_score
+
+            for keyword in interests.keywords[user_id]:
+                for index, product_id in enumerate(self.get_keyword_results(keyword)):
+                    scores[product_id] += SEARCH_WEIGHT * (1 - index / SEARCH_RESULTS_COUNT)
+
+            for product_id in interests.known_products[user_id]:
+                scores.pop(product_id, None)
+
+            recommendations[user_id] = [
+                product_id for product_id, score in heapq.nlargest(
+                    RECOMMENDED_PRODUCTS_COUNT, scores.items(), key=itemgetter(1)
+                )
+            ]
+        return recommendations
+
+
+@shared_cache('popular_product_ids', timeout=60 * 60, stale_timeout=60 * 10)
+def get_popular_product_ids():
+    return list(ProductViewCount.objects.filter(
+        product__status=Product.PUBLISHED
+    ).order_by('-month', '-total').values_list('product_id', flat=True)[:RECOMMENDED_PRODUCTS_COUNT])
+
+
+def get_recommended_product_ids(user, count=20):
+    """
+        Stored recommendations of user, filled by popular products for new or inactive users
+    """
+    product_ids = UserRecommendation.objects.filter(user=user).values_list('product_ids', flat=True).first() or []
+    product_ids = product_ids[:count]
+    if len(product_ids) < count:
+        recommended_ids = set(product_ids)
+        product_ids.extend(
+            product_id for product_id in get_popular_product_ids() if product_id not in recommended_ids
+        )
+    return product_ids[:count]
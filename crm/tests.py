@@ -1,3 +1,96 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+
+from crm import log_events
+from crm.log_events import flush_log_events, push_log_event, PRODUCT_VIEW_EVENT, SEARCH_EVENT
+from crm.models import ShopProductViewLog, UserRecommendation, SearchLog
+from crm.recommendations import get_recommended_product_ids
+from helpers.test import MTestCase
+from products.models import Product, ProductViewCount, ProductSimilarity
+from users.models import User
+
+
+class ProductViewLogPipelineTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        log_events._local_events.clear()
+        log_events._local_failed_events.clear()
+        self.product = Product.objects.create(product_id='viewed', name='viewed', status=Product.PUBLISHED)
+
+    def test_view_log_is_saved_on_flush(self):
+        response = self.client.get(
+            reverse('products:topViewedProduct', kwargs={'id': self.product.id}),
+            HTTP_USER_AGENT='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                            'Chrome/120.0.0.0 Safari/537.36'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(ShopProductViewLog.objects.exists())
+
+        self.assertEqual(flush_log_events(), 1)
+        log = ShopProductViewLog.objects.get()
+        self.assertEqual(log.product_id, self.product.id)
+        self.assertEqual(log.browser_type, 'Chrome')
+        self.assertEqual(log.device_type, ShopProductViewLog.DESKTOP)
+
+    def test_events_of_deleted_rows_do_not_fail_the_batch(self):
+        user = User.objects.create(username='deleted', mobile_number=self.get_fake_phone_number())
+        push_log_event(PRODUCT_VIEW_EVENT, user_agent='', user_id=user.id, product_id=self.product.id)
+        push_log_event(PRODUCT_VIEW_EVENT, user_agent='', user_id=None, product_id=self.product.id + 1)
+        user.delete()
+
+        self.assertEqual(flush_log_events(), 2)
+        log = ShopProductViewLog.objects.get()
+        self.assertEqual(log.product_id, self.product.id)
+        self.assertIsNone(log.user_id)
+
+    def test_oversized_fields_are_truncated(self):
+        push_log_event(SEARCH_EVENT, user_agent='', user_id=None, query_value='q' * 300)
+        push_log_event(
+            PRODUCT_VIEW_EVENT, user_agent='', user_id=None, product_id=self.product.id,
+            referer='https://example.com/' + 'r' * 300
+        )
+
+        self.assertEqual(flush_log_events(), 2)
+        self.assertEqual(SearchLog.objects.get().query_value, 'q' * 255)
+        self.assertEqual(len(ShopProductViewLog.objects.get().referer), 200)
+
+    def test_failing_event_does_not_fail_the_batch(self):
+        for index in range(5):
+            push_log_event(PRODUCT_VIEW_EVENT, user_agent='', user_id=None, product_id=self.product.id)
+        # an event of an older release with a missing field
+        push_log_event(PRODUCT_VIEW_EVENT, user_agent='', user_id=None)
+
+        self.assertEqual(flush_log_events(), 6)
+        self.assertEqual(ShopProductViewLog.objects.count(), 5)
+        self.assertEqual(len(log_events._local_failed_events), 1)
+        self.assertFalse(log_events._local_events)
+
+
+class UserRecommendationTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create(username='recommended', mobile_number=self.get_fake_phone_number())
+        self.viewed = Product.objects.create(product_id='viewed', name='viewed', status=Product.PUBLISHED)
+        self.similar = Product.objects.create(product_id='similar', name='similar', status=Product.PUBLISHED)
+        self.popular = Product.objects.create(product_id='popular', name='popular', status=Product.PUBLISHED)
+        ProductViewCount.objects.filter(product=self.popular).update(month=10, total=10)
+        ProductSimilarity.objects.create(
+            product=self.viewed, similar_product=self.similar, score=5, last_updated=datetime.datetime.now()
+        )
+
+    def test_recommendations_of_active_user(self):
+        ShopProductViewLog.objects.create(product=self.viewed, user=self.user)
+        UserRecommendation.refresh()
+
+        self.assertEqual(UserRecommendation.objects.get(user=self.user).product_ids, [self.similar.id])
+        self.assertEqual(get_recommended_product_ids(self.user, count=2), [self.similar.id, self.popular.id])
+
+    def test_popular_products_for_new_user(self):
+        self.assertEqual(get_recommended_product_ids(self.user, count=1), [self.popular.id])
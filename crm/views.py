@@ -8,8 +8,9 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
-from crm.functions import save_search_log, get_recommended_products
+from crm.functions import save_search_log
 from crm.models import ShopProductViewLog, SearchLog, Notification, UserNotification
+from crm.recommendations import get_recommended_product_ids
 from crm.serializer import ShopProductViewLogCreateSerializer, NotificationCreateSerializer, \
     UserNotificationRetrieveSerializer
 from crm.throttles import UserFinalSearchLogRateThrottle, AnonFinalSearchLogRateThrottle
@@ -23,6 +24,7 @@ from django.db.models import Count, Q, OuterRef, Exists
 from django.db.models.functions import TruncMonth
 
 from products.serializers import ProductForLogSerializer
+from products.shop.querysets import shop_product_list_queryset
 from products.shop.serializers import ShopProductsListSerializers
 from shop.models import ShopOrderItem, ShopOrder
 from users.models import User
@@ -205,7 +207,9 @@ class RecommendedProductsAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        products = get_recommended_products(request.user)
+        product_ids = get_recommended_product_ids(request.user)
+        products = shop_product_list_queryset(Product.objects.filter(id__in=product_ids, status=Product.PUBLISHED))
+        products = sorted(products, key=lambda product: product_ids.index(product.id))
         serializer = ShopProductsListSerializers(products, many=True)
         return Response(serializer.data)
 
@@ -0,0 +1,180 @@
+import datetime
+from collections import defaultdict
+
+import pandas as pd
+from django.db import transaction
+
+from entrance.models import EntrancePackageItem, EntrancePackageFileColumn, SupplierRemainItem
+from helpers.functions import get_current_user
+from main.models import Currency
+
+ITEM_FIELDS = {
+    EntrancePackageFileColumn.PRODUCT_CODE: 'product_code',
+    EntrancePackageFileColumn.PRODUCT_NAME: 'default_name',
+    EntrancePackageFileColumn.PRODUCT_PRICE: 'default_price',
+    EntrancePackageFileColumn.NUMBER_OF_BOXES: 'number_of_box',
+    EntrancePackageFileColumn.NUMBER_OF_PRODUCTS_PER_BOX: 'number_of_products_per_box',
+    EntrancePackageFileColumn.SIXTEEN_DIGIT_CODE: 'sixteen_digit_code',
+    EntrancePackageFileColumn.PRICE_IN_CASE_OF_SALE: 'price_in_case_of_sale',
+    EntrancePackageFileColumn.BARCODE: 'barcode',
+    EntrancePackageFileColumn.PRICE_SUM: 'price_sum',
+}
+FIELD_TITLES = {ITEM_FIELDS[key]: title for key, title in EntrancePackageFileColumn.KEYS if key in ITEM_FIELDS}
+TEXT_FIELDS = ('product_code', 'default_name', 'sixteen_digit_code', 'barcode')
+INTEGER_FIELDS = ('number_of_box', 'number_of_products_per_box')
+DECIMAL_FIELDS = ('default_price', 'price_in_case_of_sale', 'price_sum')
+
+BULK_CREATE_BATCH_SIZE = 1000
+
+
+class EntrancePackageExcelImport:
+    """
+        Reads items of an entrance package file by its column mapping as whole columns of a data frame,
+        converts and validates each column at once and inserts items by chunked `bulk_create` in one transaction
+
+        Rows are numbered as in excel (header is row 1), `errors` maps row number to its messages
+    """
+
+    def __init__(self, entrance_package, columns):
+        self.entrance_package = entrance_package
+        self.columns = columns
+        self.errors = defaultdict(list)
+
+    def add_errors(self, invalid, message):
+        for index in invalid[invalid].index:
+            self.errors[index + 2].append(message)
+
+    def get_mapping(self):
+        mapping = {}
+        for column in self.columns:
+            field = ITEM_FIELDS.get(column['key'])
+            if field:
+                mapping[field] = int(column['column_number'])
+        return mapping
+
+    def get_text(self, value):
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value).strip()
+
+    def read_frame(self, file):
+        mapping = self.get_mapping()
+        sheet = pd.read_excel(file, skiprows=0)
+        for field, column_number in mapping.items():
+            if not 0 <= column_number < len(sheet.columns):
+                self.errors[1].append("ستون {} در فایل وجود ندارد".format(column_number + 1))
+        if self.errors:
+            return None
+
+        frame = sheet.iloc[:, list(mapping.values())].copy()
+        frame.columns = list(mapping.keys())
+        return frame.dropna(how='all')
+
+    def clean_frame(self, frame):
+        fields = {field.name: field for field in EntrancePackageItem._meta.fields}
+        for name in frame.columns:
+            column = frame[name]
+            title = FIELD_TITLES[name]
+            if name in TEXT_FIELDS:
+                texts = column.map(self.get_text, na_action='ignore')
+                self.add_errors(texts.map(len, na_action='ignore') > fields[name].max_length, "{} طولانی است".format(
+                    title
+                ))
+                frame[name] = texts.astype(object).where(texts.notna() & (texts != ''), None)
+            else:
+                numbers = pd.to_numeric(column, errors='coerce')
+                self.add_errors(numbers.isna() & column.notna(), "{} عدد نیست".format(title))
+                if name in INTEGER_FIELDS:
+                    self.add_errors(numbers.notna() & (numbers % 1 != 0), "{} عدد صحیح نیست".format(title))
+                frame[name] = numbers.fillna(fields[name].get_default())
+
+        for name in INTEGER_FIELDS + DECIMAL_FIELDS:
+            if name not in frame.columns:
+                frame[name] = fields[name].get_default()
+        for name in TEXT_FIELDS:
+            if name not in frame.columns:
+                frame[name] = None
+
+        self.add_errors(
+            frame['default_name'].isna() & frame['product_code'].isna(),
+            'برای ثبت ردیف پکیج ها باید کد یا نام کالا داشته باشند'
+        )
+        # name is not null, rows with only a code are saved without it
+        frame['default_name'] = frame['default_name'].fillna('')
+
+        # as `EntrancePackageItem.save` on initial registration
+        number_of_products = frame['number_of_box'] * frame['number_of_products_per_box']
+        has_price_sum = frame['price_sum'] != 0
+        self.add_errors(has_price_sum & (number_of_products == 0), 'تعداد محصولات برای محاسبه مبلغ صفر است')
+        frame['default_price'] = (frame['price_sum'] / number_of_products).where(
+            has_price_sum, frame['default_price']
+        )
+        frame['price_sum'] = frame['price_sum'].where(has_price_sum, number_of_products * frame['default_price'])
+        # python ints, database adapters do not take numpy integers
+        frame[list(INTEGER_FIELDS)] = frame[list(INTEGER_FIELDS)].astype(int).astype(object)
+        return frame
+
+    def get_items(self, frame):
+        in_case_of_sale_type = next((
+            column.get('in_case_of_sale_type') for column in self.columns
+            if column['key'] == EntrancePackageFileColumn.PRICE_IN_CASE_OF_SALE and column.get('is_in_case_of_sale')
+        ), None) or EntrancePackageItem.WITH_AMOUNT
+
+        # `bulk_create` skips `BaseModel.save`
+        user = get_current_user()
+        now = datetime.datetime.now()
+        items = [
+            EntrancePackageItem(
+                entrance_package=self.entrance_package,
+                in_case_of_sale_type=in_case_of_sale_type,
+                initial_registration=True,
+                created_by=user,
+                created_at=now,
+                **record
+            ) for record in frame.to_dict('records')
+        ]
+        for item in items:
+            item.set_remain_key()
+        return items
+
+    def save_columns(self):
+        user = get_current_user()
+        now = datetime.datetime.now()
+        EntrancePackageFileColumn.objects.filter(entrance_package=self.entrance_package).delete()
+        EntrancePackageFileColumn.objects.bulk_create([
+            EntrancePackageFileColumn(
+                entrance_package=self.entrance_package,
+                key=column['key'],
+                column_number=column['column_number'],
+                in_case_of_sale_type=column['in_case_of_sale_type'] if column['is_in_case_of_sale'] else None,
+                created_by=user,
+                created_at=now,
+            ) for column in self.columns
+        ])
+
+        currency_id = next((column['currency'] for column in reversed(self.columns) if column['currency']), None)
+        if currency_id:
+            self.entrance_package.currency = Currency.objects.get(id=currency_id)
+
+    def run(self, file):
+        """
+            Returns count of inserted items, nothing is inserted when `errors` is not empty
+        """
+        frame = self.read_frame(file)
+        if frame is None:
+            return 0
+        frame = self.clean_frame(frame)
+        if self.errors:
+            return 0
+
+        items = self.get_items(frame)
+        with transaction.atomic():
+            self.save_columns()
+            EntrancePackageItem.objects.filter(entrance_package=self.entrance_package).delete()
+            EntrancePackageItem.objects.bulk_create(items, batch_size=BULK_CREATE_BATCH_SIZE)
+            SupplierRemainItem.refresh_on_commit(
+                self.entrance_package.supplier_id, [item.remain_key for item in items]
+            )
+            self.entrance_package.is_inserted = True
+            self.entrance_package.save()
+        return len(items)
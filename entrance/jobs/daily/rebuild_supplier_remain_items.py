@@ -0,0 +1,10 @@
+from django_extensions.management.jobs import DailyJob
+
+from entrance.models import SupplierRemainItem
+
+
+class Job(DailyJob):
+    help = "Rebuild remain items of every supplier, changes are picked up by signals during the day"
+
+    def execute(self):
+        SupplierRemainItem.refresh()
@@ -0,0 +1,102 @@
+import tempfile
+import time
+
+import pandas as pd
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from entrance.imports import EntrancePackageExcelImport
+from entrance.models import EntrancePackage, EntrancePackageItem, EntrancePackageFileColumn
+
+COLUMNS = [
+    {'key': EntrancePackageFileColumn.PRODUCT_CODE, 'column_number': 0},
+    {'key': EntrancePackageFileColumn.PRODUCT_NAME, 'column_number': 1},
+    {'key': EntrancePackageFileColumn.NUMBER_OF_BOXES, 'column_number': 2},
+    {'key': EntrancePackageFileColumn.NUMBER_OF_PRODUCTS_PER_BOX, 'column_number': 3},
+    {'key': EntrancePackageFileColumn.PRODUCT_PRICE, 'column_number': 4},
+    {'key': EntrancePackageFileColumn.BARCODE, 'column_number': 5},
+    {'key': EntrancePackageFileColumn.PRICE_IN_CASE_OF_SALE, 'column_number': 6, 'is_in_case_of_sale': True,
+     'in_case_of_sale_type': EntrancePackageItem.WITH_PERCENTAGE},
+]
+
+
+def write_fixture(file, rows):
+    pd.DataFrame({
+        'کد': [1000 + i for i in range(rows)],
+        'نام': ['کالای آزمایشی {}'.format(i) for i in range(rows)],
+        'کارتون': [1 + i % 5 for i in range(rows)],
+        'تعداد در کارتون': [12] * rows,
+        'قیمت': [10000 + i * 10 for i in range(rows)],
+        'بارکد': ['626{:010d}'.format(i) for i in range(rows)],
+        'سود': [15] * rows,
+    }).to_excel(file, index=False)
+
+
+def insert_rows(entrance_package, file):
+    # previous `EntrancePackageInsertExcelApiView.post`: an item and a query of columns for each row
+    for row in pd.read_excel(file, skiprows=0).values:
+        item = EntrancePackageItem.objects.create(entrance_package=entrance_package)
+        for column in EntrancePackageFileColumn.objects.filter(entrance_package=entrance_package):
+            if column.key == EntrancePackageFileColumn.PRODUCT_CODE:
+                item.product_code = row[column.column_number]
+            elif column.key == EntrancePackageFileColumn.PRODUCT_NAME:
+                item.default_name = row[column.column_number]
+            elif column.key == EntrancePackageFileColumn.PRODUCT_PRICE:
+                item.default_price = row[column.column_number]
+            elif column.key == EntrancePackageFileColumn.NUMBER_OF_BOXES:
+                item.number_of_box = row[column.column_number]
+            elif column.key == EntrancePackageFileColumn.NUMBER_OF_PRODUCTS_PER_BOX:
+                item.number_of_products_per_box = row[column.column_number]
+            elif column.key == EntrancePackageFileColumn.PRICE_IN_CASE_OF_SALE:
+                item.price_in_case_of_sale = row[column.column_number]
+                item.in_case_of_sale_type = column.in_case_of_sale_type
+            elif column.key == EntrancePackageFileColumn.BARCODE:
+                item.barcode = row[column.column_number]
+        item.initial_registration = True
+        item.save()
+
+
+class Command(BaseCommand):
+    help = 'compare row by row and bulk import of an entrance package excel, imports are rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--package', type=int, help='id of an entrance package to import into')
+        parser.add_argument('--skip-rows-import', action='store_true', help='row by row import takes minutes')
+
+    def run(self, name, method):
+        with transaction.atomic(), CaptureQueriesContext(connection) as context:
+            started_at = time.perf_counter()
+            method()
+            duration = time.perf_counter() - started_at
+            transaction.set_rollback(True)
+        self.stdout.write('{}: {:.2f} s, {} queries'.format(name, duration, len(context)))
+
+    def handle(self, *args, **options):
+        columns = [
+            {'currency': None, 'is_in_case_of_sale': False, 'in_case_of_sale_type': None, **column}
+            for column in COLUMNS
+        ]
+        with tempfile.NamedTemporaryFile(suffix='.xlsx') as file:
+            write_fixture(file.name, options['rows'])
+
+            excel_import = EntrancePackageExcelImport(None, columns)
+            started_at = time.perf_counter()
+            frame = excel_import.clean_frame(excel_import.read_frame(file.name))
+            items = excel_import.get_items(frame)
+            self.stdout.write('read and validate {} rows: {:.2f} s, {} errors'.format(
+                len(items), time.perf_counter() - started_at, len(excel_import.errors)
+            ))
+
+            if not options['package']:
+                return
+
+            entrance_package = EntrancePackage.objects.get(id=options['package'])
+            if not options['skip_rows_import']:
+                def import_rows():
+                    EntrancePackageExcelImport(entrance_package, columns).save_columns()
+                    insert_rows(entrance_package, file.name)
+
+                self.run('row by row', import_rows)
+            self.run('bulk', lambda: EntrancePackageExcelImport(entrance_package, columns).run(file.name))
@@ -0,0 +1,146 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+from decimal import Decimal
+
+WITH_AMOUNT = 'a'
+BOX = 'b'
+
+
+def get_remain_key(default_name, number_of_products_per_box, price):
+    return '{}|{}|{}'.format(default_name, number_of_products_per_box, round(Decimal(str(price or 0))))
+
+
+def get_final_price(item):
+    # as `EntrancePackageItem.final_price_after_discount`
+    number_of_products = item.number_of_box * item.number_of_products_per_box
+    if item.default_price:
+        net_purchase_price = item.default_price
+    elif item.price_sum and number_of_products:
+        net_purchase_price = round(item.price_sum / number_of_products)
+    else:
+        net_purchase_price = 0
+
+    if item.in_case_of_sale_type == WITH_AMOUNT:
+        in_case_of_sale = net_purchase_price + item.price_in_case_of_sale
+    else:
+        in_case_of_sale = net_purchase_price + (net_purchase_price * item.price_in_case_of_sale / 100)
+
+    if item.discount_type == WITH_AMOUNT:
+        return in_case_of_sale - item.discount
+    return in_case_of_sale + (in_case_of_sale * item.discount / 100)
+
+
+def fill_supplier_remain_items(apps, schema_editor):
+    EntrancePackageItem = apps.get_model('entrance', 'EntrancePackageItem')
+    StoreReceiptItem = apps.get_model('entrance', 'StoreReceiptItem')
+    SupplierRemainItem = apps.get_model('entrance', 'SupplierRemainItem')
+
+    package_items = list(EntrancePackageItem.objects.select_related('entrance_package').order_by('-id'))
+    for item in package_items:
+        item.final_price = get_final_price(item)
+        item.remain_key = get_remain_key(item.default_name, item.number_of_products_per_box, item.final_price)
+    EntrancePackageItem.objects.bulk_update(package_items, ['final_price', 'remain_key'], batch_size=500)
+
+    receipt_items = list(StoreReceiptItem.objects.select_related('store_receipt').order_by('-id'))
+    for item in receipt_items:
+        item.remain_key = get_remain_key(item.default_name, item.number_of_products_per_box, item.sale_price)
+    StoreReceiptItem.objects.bulk_update(receipt_items, ['remain_key'], batch_size=500)
+
+    # as `SupplierRemainItem.refresh`
+    remains = {}
+    for item in package_items:
+        supplier_id = item.entrance_package.supplier_id if item.entrance_package_id else None
+        if supplier_id is None:
+            continue
+        remain = remains.get((supplier_id, item.remain_key))
+        if remain is None:
+            remain = remains[(supplier_id, item.remain_key)] = SupplierRemainItem(
+                supplier_id=supplier_id,
+                remain_key=item.remain_key,
+                default_name=item.default_name,
+                product_code=item.product_code,
+                final_price=item.final_price,
+                number_of_products_per_box=item.number_of_products_per_box,
+            )
+        remain.product_code = max(filter(None, (remain.product_code, item.product_code)), default=None)
+        remain.final_price = max(remain.final_price, item.final_price)
+        remain.number_of_box += item.number_of_box
+        remain.number_of_products += item.number_of_box * item.number_of_products_per_box
+
+    received = defaultdict(lambda: [0, 0])
+    for item in receipt_items:
+        supplier_id = item.store_receipt.supplier_id if item.store_receipt_id else None
+        counts = received[(supplier_id, item.remain_key)]
+        counts[0] += item.number_of_box
+        counts[1] += item.number_of_box * item.number_of_products_per_box if item.type == BOX else \
+            item.number_of_products_per_box
+
+    rows = []
+    for key, remain in remains.items():
+        received_boxes, received_products = received.get(key, (0, 0))
+        remain.number_of_box -= received_boxes
+        remain.number_of_products -= received_products
+        if remain.number_of_products and remain.number_of_box > 0:
+            rows.append(remain)
+    SupplierRemainItem.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_alter_currency_exchange_rate_to_toman'),
+        ('entrance', '0028_auto_20241221_1253'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierRemainItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('remain_key', models.CharField(max_length=255)),
+                ('default_name', models.CharField(max_length=150)),
+                ('product_code', models.CharField(blank=True, max_length=150, null=True)),
+                ('final_price', models.DecimalField(decimal_places=6, default=0, max_digits=24)),
+                ('number_of_box', models.IntegerField(default=0)),
+                ('number_of_products_per_box', models.IntegerField(default=0)),
+                ('number_of_products', models.IntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='entrancepackageitem',
+            name='final_price',
+            field=models.DecimalField(decimal_places=6, default=0, max_digits=24),
+        ),
+        migrations.AddField(
+            model_name='entrancepackageitem',
+            name='remain_key',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='storereceiptitem',
+            name='remain_key',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='entrancepackageitem',
+            index=models.Index(fields=['remain_key'], name='package_item_remain_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='storereceiptitem',
+            index=models.Index(fields=['remain_key'], name='receipt_item_remain_key_idx'),
+        ),
+        migrations.AddField(
+            model_name='supplierremainitem',
+            name='supplier',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='remain_items', to='main.supplier'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='supplierremainitem',
+            unique_together={('supplier', 'remain_key')},
+        ),
+        migrations.RunPython(fill_supplier_remain_items, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,12 @@
 import datetime
+from decimal import Decimal
 from dateutil.relativedelta import relativedelta
 from django.core.exceptions import ValidationError
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Sum, Max, F, Case, When
 
+from helpers.db import add_to_commit_batch, get_commit_batch
 from helpers.models import BaseModel, DECIMAL, EXPLANATION
 from main.models import Supplier, Currency, Store
 
@@ -16,6 +19,13 @@ def custom_upload_to(instance, filename):
     return 'images/{filename}'.format(filename=filename)
 
 
+def get_remain_key(default_name, number_of_products_per_box, price):
+    """
+        Items of a supplier packages and receipts with the same key are the same goods in `SupplierRemainItem`
+    """
+    return '{}|{}|{}'.format(default_name, number_of_products_per_box, round(Decimal(str(price or 0))))
+
+
 class EntrancePackage(BaseModel):
     manager = models.ForeignKey('users.User', related_name="entrance_packages",
                                 on_delete=models.SET_NULL, blank=True, null=True)
@@ -102,6 +112,10 @@ class EntrancePackageItem(BaseModel):
 
     initial_registration = models.BooleanField(default=False)
 
+    # stored by `set_remain_key` for grouping items in database
+    final_price = DECIMAL()
+    remain_key = models.CharField(max_length=255, blank=True, null=True)
+
     class Meta(BaseModel.Meta):
         verbose_name = 'EntrancePackageItem'
         permission_basename = 'entrance_package_item'
@@ -115,6 +129,9 @@ class EntrancePackageItem(BaseModel):
             ('updateOwn.entrance_packages', 'ویرایش ردیف پکیج ورودی خود'),
             ('deleteOwn.entrance_packages', 'حذف ردیف پکیج ورودی خود'),
         )
+        indexes = [
+            models.Index(fields=['remain_key'], name='package_item_remain_key_idx'),
+        ]
 
     @property
     def in_case_of_sale(self):
@@ -143,6 +160,10 @@ class EntrancePackageItem(BaseModel):
         else:
             return 0
 
+    def set_remain_key(self):
+        self.final_price = self.final_price_after_discount
+        self.remain_key = get_remain_key(self.default_name, self.number_of_products_per_box, self.final_price)
+
     def save(self, *args, **kwargs):
         if self.initial_registration:
             if not self.default_name and not self.product_code:
@@ -178,6 +199,7 @@ class EntrancePackageItem(BaseModel):
                     self.price_sum += item.price_sum
                     item.delete()
 
+        self.set_remain_key()
         super().save(*args, **kwargs)
 
 
@@ -282,6 +304,9 @@ class StoreReceiptItem(BaseModel):
     failure_count = models.IntegerField(default=0)
     sale_price = DECIMAL()
 
+    # stored by `set_remain_key` for grouping items in database
+    remain_key = models.CharField(max_length=255, blank=True, null=True)
+
     class Meta(BaseModel.Meta):
         verbose_name = 'StoreReceiptItem'
         permission_basename = 'store_receipt_item'
@@ -295,6 +320,9 @@ class StoreReceiptItem(BaseModel):
             ('updateOwn.store_receipt', 'ویرایش ردیف رسید ورود انبار خود'),
             ('deleteOwn.store_receipt', 'حذف ردیف رسید ورود انبار خود'),
         )
+        indexes = [
+            models.Index(fields=['remain_key'], name='receipt_item_remain_key_idx'),
+        ]
 
     @property
     def product_count(self):
@@ -302,3 +330,141 @@ class StoreReceiptItem(BaseModel):
             return self.number_of_box * self.number_of_products_per_box
         else:
             return self.number_of_products_per_box
+
+    def set_remain_key(self):
+        self.remain_key = get_remain_key(self.default_name, self.number_of_products_per_box, self.sale_price)
+
+    def save(self, *args, **kwargs):
+        self.set_remain_key()
+        super().save(*args, **kwargs)
+
+
+class SupplierRemainItem(models.Model):
+    """
+        Goods of supplier packages not received by store receipts yet, one row per remain key
+        Kept by `entrance.signals` on changes of items and rebuilt daily
+    """
+    supplier = models.ForeignKey(Supplier, related_name='remain_items', on_delete=models.CASCADE)
+    remain_key = models.CharField(max_length=255)
+    default_name = models.CharField(max_length=150)
+    product_code = models.CharField(max_length=150, null=True, blank=True)
+    final_price = DECIMAL()
+    number_of_box = models.IntegerField(default=0)
+    number_of_products_per_box = models.IntegerField(default=0)
+    number_of_products = models.IntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('supplier', 'remain_key')
+
+    def __str__(self):
+        return '{} {}'.format(self.default_name, self.number_of_products)
+
+    @classmethod
+    def get_remains(cls, supplier_id, remain_keys=None):
+        """
+            Sums of package items of supplier minus sums of its receipt items, grouped by remain key in database
+        """
+        package_items = EntrancePackageItem.objects.filter(
+            entrance_package__supplier_id=supplier_id, remain_key__isnull=False
+        ).order_by()
+        receipt_items = StoreReceiptItem.objects.filter(
+            store_receipt__supplier_id=supplier_id, remain_key__isnull=False
+        ).order_by()
+        if remain_keys is not None:
+            package_items = package_items.filter(remain_key__in=remain_keys)
+            receipt_items = receipt_items.filter(remain_key__in=remain_keys)
+
+        received = {}
+        for remain_key, boxes, products in receipt_items.values('remain_key').annotate(
+                boxes=Sum('number_of_box'),
+                products=Sum(Case(
+                    When(type=StoreReceiptItem.BOX, then=F('number_of_box') * F('number_of_products_per_box')),
+                    default=F('number_of_products_per_box')
+                )),
+        ).values_list('remain_key', 'boxes', 'products'):
+            received[remain_key] = (boxes, products)
+
+        rows = list(package_items.values('remain_key', 'default_name', 'number_of_products_per_box').annotate(
+            newest_item_id=Max('id'),
+            boxes=Sum('number_of_box'),
+            products=Sum(F('number_of_box') * F('number_of_products_per_box')),
+        ))
+        # items of a key may differ in product code and unrounded price, the newest item is shown
+        newest_items = {
+            item_id: (product_code, final_price) for item_id, product_code, final_price in
+            EntrancePackageItem.objects.filter(
+                id__in=[row['newest_item_id'] for row in rows]
+            ).order_by().values_list('id', 'product_code', 'final_price')
+        }
+
+        remains = []
+        for row in rows:
+            received_boxes, received_products = received.get(row['remain_key'], (0, 0))
+            number_of_box = row['boxes'] - received_boxes
+            number_of_products = row['products'] - received_products
+            if number_of_products and number_of_box > 0:
+                product_code, final_price = newest_items[row['newest_item_id']]
+                remains.append(cls(
+                    supplier_id=supplier_id,
+                    remain_key=row['remain_key'],
+                    default_name=row['default_name'],
+                    product_code=product_code,
+                    final_price=final_price,
+                    number_of_box=number_of_box,
+                    number_of_products_per_box=row['number_of_products_per_box'],
+                    number_of_products=number_of_products,
+                ))
+        return remains
+
+    @classmethod
+    def refresh(cls, supplier_id=None, remain_keys=None):
+        """
+            Recompute remain items of supplier (of keys, all by default), pass None to rebuild every supplier
+            Supplier row is locked while its items are replaced
+        """
+        if supplier_id is None:
+            supplier_ids = set(EntrancePackage.objects.filter(
+                supplier__isnull=False
+            ).order_by().values_list('supplier_id', flat=True).distinct())
+            with transaction.atomic():
+                cls.objects.exclude(supplier_id__in=supplier_ids).delete()
+                for supplier_id in sorted(supplier_ids):
+                    cls.refresh(supplier_id)
+            return
+
+        rows = cls.objects.filter(supplier_id=supplier_id)
+        if remain_keys is not None:
+            rows = rows.filter(remain_key__in=remain_keys)
+
+        with transaction.atomic():
+            # refreshes of a supplier wait for each other, so rows of a key are not inserted twice and each one
+            # reads items committed before it
+            list(Supplier.objects.select_for_update().filter(id=supplier_id).values_list('id', flat=True))
+            remains = cls.get_remains(supplier_id, remain_keys)
+            rows.delete()
+            cls.objects.bulk_create(remains, batch_size=500)
+
+    @classmethod
+    def refresh_on_commit(cls, supplier_id, remain_keys):
+        """
+            Refreshes keys changed in the running transaction once for each supplier after commit
+        """
+        if supplier_id is not None:
+            add_to_commit_batch(
+                'supplier_remain_items', cls.refresh, supplier_id, (key for key in remain_keys if key)
+            )
+
+    @classmethod
+    def get_supplier_id(cls, model, pk):
+        """
+            Supplier of package or receipt, remembered for the running transaction (items are deleted one by one)
+        """
+        batch = get_commit_batch('supplier_remain_items')
+        key = (model, pk)
+        if batch is not None and key in batch.cache:
+            return batch.cache[key]
+        supplier_id = model.objects.filter(pk=pk).values_list('supplier_id', flat=True).first()
+        if batch is not None:
+            batch.cache[key] = supplier_id
+        return supplier_id
@@ -0,0 +1,159 @@
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, When, F
+
+from entrance.models import StoreReceiptItem, SupplierRemainItem
+from helpers.cache import invalidate_cache_tags
+from helpers.functions import get_current_user
+from products.models import Product, ProductInventory, ProductPrice, ProductViewCount, ProductSearchDocument, \
+    ProductInventoryHistory
+from products.signals import PRODUCTS_CACHE_TAG
+
+BULK_CREATE_BATCH_SIZE = 1000
+INVENTORY_UPDATE_CHUNK_SIZE = 500
+
+
+class StoreReceiptItemsRegistration:
+    """
+        Registers items of a store receipt by barcode in a constant number of queries: products of all barcodes are
+        resolved by one `IN` query, missing products (with their inventory and price rows) and receipt items are
+        inserted by `bulk_create` and inventories are increased once per product with history rows inserted in bulk
+
+        Items are numbered from 1 as sent, `errors` maps item number to its messages
+    """
+
+    def __init__(self, store_receipt, items):
+        self.store_receipt = store_receipt
+        # as before, items without input boxes are not received
+        self.items = [item for item in items if 'input_box' in item]
+        self.errors = defaultdict(list)
+        self.user = get_current_user()
+        self.now = datetime.datetime.now()
+
+    def get_products(self):
+        barcodes = {item['barcode'] for item in self.items if item.get('barcode')}
+        # the first registered product of a repeated barcode
+        return {product.barcode: product for product in Product.objects.filter(barcode__in=barcodes).order_by('-id')}
+
+    def validate(self, products):
+        for number, item in enumerate(self.items, start=1):
+            if not item.get('barcode'):
+                self.errors[number].append('بارکد الزامیست')
+            elif item['barcode'] not in products and 'new_product_shelf_code' not in item:
+                self.errors[number].append('کد قفسه کالا جدید الزامیست')
+            if not item.get('default_name'):
+                self.errors[number].append('نام کالا الزامیست')
+
+    def create_products(self, products):
+        new_products = {}
+        for item in self.items:
+            if item['barcode'] not in products and item['barcode'] not in new_products:
+                # `bulk_create` skips `BaseModel.save`
+                new_products[item['barcode']] = Product(
+                    barcode=item['barcode'],
+                    product_id=item.get('product_code'),
+                    name=item.get('default_name'),
+                    sale_price=item['final_price'],
+                    created_by=self.user,
+                    created_at=self.now,
+                )
+        if not new_products:
+            return
+
+        created = Product.objects.bulk_create(new_products.values(), batch_size=BULK_CREATE_BATCH_SIZE)
+        # as `Product.save` and post save signals of products
+        ProductInventory.objects.bulk_create(
+            [ProductInventory(product=product, inventory=0) for product in created], batch_size=BULK_CREATE_BATCH_SIZE
+        )
+        ProductPrice.objects.bulk_create(
+            [ProductPrice(product=product, price=0) for product in created], batch_size=BULK_CREATE_BATCH_SIZE
+        )
+        ProductViewCount.objects.bulk_create(
+            [ProductViewCount(product=product) for product in created], batch_size=BULK_CREATE_BATCH_SIZE
+        )
+        ProductSearchDocument.refresh([product.id for product in created])
+        invalidate_cache_tags(PRODUCTS_CACHE_TAG)
+        products.update(new_products)
+
+    def create_receipt_items(self, products):
+        receipt_items = [
+            StoreReceiptItem(
+                product=products[item['barcode']],
+                store_receipt=self.store_receipt,
+                product_code=item.get('product_code'),
+                default_name=item['default_name'],
+                number_of_products_per_box=item['input_product_per_box'],
+                number_of_box=item['input_box'],
+                new_product_shelf_code=item.get('new_product_shelf_code', 0),
+                content_production_count=item.get('content_production_count', 0),
+                failure_count=item.get('failure_count', 0),
+                barcode=item['barcode'],
+                sale_price=item['final_price'],
+                created_by=self.user,
+                created_at=self.now,
+            ) for item in self.items
+        ]
+        for receipt_item in receipt_items:
+            receipt_item.set_remain_key()
+        StoreReceiptItem.objects.bulk_create(receipt_items, batch_size=BULK_CREATE_BATCH_SIZE)
+        SupplierRemainItem.refresh_on_commit(
+            self.store_receipt.supplier_id, [receipt_item.remain_key for receipt_item in receipt_items]
+        )
+        return receipt_items
+
+    def increase_inventories(self, receipt_items):
+        amounts = defaultdict(int)
+        for receipt_item in receipt_items:
+            amounts[receipt_item.product_id] += receipt_item.product_count
+        amounts = {product_id: amount for product_id, amount in amounts.items() if amount > 0}
+
+        inventories = {
+            inventory.product_id: inventory for inventory in ProductInventory.objects.select_for_update().filter(
+                product_id__in=amounts.keys()
+            ).order_by('id')
+        }
+        missing_ids = amounts.keys() - inventories.keys()
+        if missing_ids:
+            for inventory in ProductInventory.objects.bulk_create([
+                ProductInventory(product_id=product_id, inventory=0) for product_id in missing_ids
+            ]):
+                inventories[inventory.product_id] = inventory
+
+        product_ids = sorted(amounts)
+        for start in range(0, len(product_ids), INVENTORY_UPDATE_CHUNK_SIZE):
+            chunk_ids = product_ids[start:start + INVENTORY_UPDATE_CHUNK_SIZE]
+            ProductInventory.objects.filter(product_id__in=chunk_ids).update(
+                inventory=Case(*[
+                    When(product_id=product_id, then=F('inventory') + amounts[product_id]) for product_id in chunk_ids
+                ], default=F('inventory')),
+                last_updated=self.now,
+            )
+
+        # rows are locked, quantities read above are the ones updated
+        ProductInventoryHistory.objects.bulk_create([
+            ProductInventoryHistory(
+                inventory=inventories[product_id],
+                action=ProductInventoryHistory.INCREASE,
+                amount=amounts[product_id],
+                previous_quantity=inventories[product_id].inventory,
+                new_quantity=inventories[product_id].inventory + amounts[product_id],
+                changed_by=self.user,
+            ) for product_id in product_ids
+        ], batch_size=BULK_CREATE_BATCH_SIZE)
+
+    def run(self):
+        """
+            Returns count of registered items, nothing is registered when `errors` is not empty
+        """
+        products = self.get_products()
+        self.validate(products)
+        if self.errors:
+            return 0
+
+        with transaction.atomic():
+            self.create_products(products)
+            receipt_items = self.create_receipt_items(products)
+            self.increase_inventories(receipt_items)
+        return len(receipt_items)
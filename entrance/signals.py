@@ -0,0 +1,63 @@
+from django.db.models.signals import pre_save, post_save, pre_delete
+from django.dispatch import receiver
+
+from entrance.models import EntrancePackage, EntrancePackageItem, StoreReceipt, StoreReceiptItem, SupplierRemainItem
+from helpers.db import get_commit_batch
+
+
+def get_item_supplier_id(instance):
+    if isinstance(instance, EntrancePackageItem):
+        return SupplierRemainItem.get_supplier_id(EntrancePackage, instance.entrance_package_id)
+    return SupplierRemainItem.get_supplier_id(StoreReceipt, instance.store_receipt_id)
+
+
+@receiver(pre_save, sender=EntrancePackageItem)
+@receiver(pre_save, sender=StoreReceiptItem)
+def keep_previous_remain_key(sender, instance, **kwargs):
+    instance.previous_remain_key = None
+    if instance.pk:
+        supplier_path = 'entrance_package__supplier_id' if sender is EntrancePackageItem else \
+            'store_receipt__supplier_id'
+        instance.previous_remain_key = sender.objects.filter(pk=instance.pk).values_list(
+            supplier_path, 'remain_key'
+        ).first()
+
+
+@receiver(post_save, sender=EntrancePackageItem)
+@receiver(post_save, sender=StoreReceiptItem)
+def refresh_supplier_remain_item(sender, instance, **kwargs):
+    if instance.previous_remain_key:
+        supplier_id, remain_key = instance.previous_remain_key
+        SupplierRemainItem.refresh_on_commit(supplier_id, [remain_key])
+    SupplierRemainItem.refresh_on_commit(get_item_supplier_id(instance), [instance.remain_key])
+
+
+# deletes run in a transaction, supplier is read before the package or receipt goes and refreshed after commit
+@receiver(pre_delete, sender=EntrancePackageItem)
+@receiver(pre_delete, sender=StoreReceiptItem)
+def refresh_deleted_supplier_remain_item(sender, instance, **kwargs):
+    SupplierRemainItem.refresh_on_commit(get_item_supplier_id(instance), [instance.remain_key])
+
+
+@receiver(pre_save, sender=EntrancePackage)
+@receiver(pre_save, sender=StoreReceipt)
+def keep_previous_supplier(sender, instance, **kwargs):
+    instance.previous_supplier_id = None
+    if instance.pk:
+        instance.previous_supplier_id = sender.objects.filter(pk=instance.pk).values_list(
+            'supplier_id', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=EntrancePackage)
+@receiver(post_save, sender=StoreReceipt)
+def refresh_changed_supplier_remain_items(sender, instance, created, **kwargs):
+    if created or instance.previous_supplier_id == instance.supplier_id:
+        return
+    batch = get_commit_batch('supplier_remain_items')
+    if batch is not None:
+        batch.cache.pop((sender, instance.pk), None)
+
+    remain_keys = list(instance.items.order_by().values_list('remain_key', flat=True).distinct())
+    SupplierRemainItem.refresh_on_commit(instance.previous_supplier_id, remain_keys)
+    SupplierRemainItem.refresh_on_commit(instance.supplier_id, remain_keys)
@@ -0,0 +1,182 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+TABLE_CACHE_SUFFIX = '.table'
+META_FILE_NAME = 'meta.json'
+# caches of other versions are rebuilt on read
+TABLE_CACHE_VERSION = 2
+
+NUMBER_COLUMN = 'number'
+TEXT_COLUMN = 'text'
+
+
+class UnreadableFileError(ValueError):
+    pass
+
+
+class EntranceFileTable:
+    """
+        Columnar cache of the sheet of an entrance package file, kept in a directory next to the media file
+        Number columns are numpy files (blank cells as NaN), text columns are a numpy file of offsets into a file
+        of utf-8 texts. Both are read by range, so a range of rows of some columns is served without parsing the
+        workbook again or loading whole columns
+
+        The cache records size and modification time of the file it is built from and is rebuilt when they change
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.path = file_path + TABLE_CACHE_SUFFIX
+
+    def get_source_stat(self):
+        stat = os.stat(self.file_path)
+        return {'size': stat.st_size, 'modified': stat.st_mtime_ns}
+
+    def get_meta(self):
+        try:
+            with open(os.path.join(self.path, META_FILE_NAME)) as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+
+    def get_valid_meta(self):
+        meta = self.get_meta()
+        if meta is None or meta.get('version') != TABLE_CACHE_VERSION or meta['source'] != self.get_source_stat():
+            return None
+        return meta
+
+    def get_column_path(self, path, column, suffix):
+        return os.path.join(path, '{}.{}'.format(column, suffix))
+
+    def get_number_column(self, column):
+        """
+            Returns array of a column of numbers and whether its numbers are integers, None for other columns
+            Blank cells of number columns are read as texts, they are kept as NaN
+        """
+        if column.dtype.kind in 'iubf':
+            return column.to_numpy(), False
+        if column.dtype.kind != 'O':
+            return None
+
+        numbers = [value for value in column if value != '']
+        if not numbers or not all(
+                isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_))
+                for value in numbers
+        ):
+            return None
+        integer = all(isinstance(value, (int, np.integer)) for value in numbers)
+        return np.array([np.nan if value == '' else value for value in column], dtype=float), integer
+
+    def get_column_texts(self, column):
+        if column.dtype.kind == 'M':
+            column = column.map(lambda value: value.isoformat(), na_action='ignore')
+        return ['' if pd.isna(value) else str(value) for value in column]
+
+    def save_column(self, path, index, column):
+        number_column = self.get_number_column(column)
+        if number_column is not None:
+            numbers, integer = number_column
+            np.save(self.get_column_path(path, index, 'npy'), numbers)
+            return {'type': NUMBER_COLUMN, 'integer': integer}
+
+        texts = [text.encode() for text in self.get_column_texts(column)]
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in texts], out=offsets[1:])
+        np.save(self.get_column_path(path, index, 'offsets.npy'), offsets)
+        with open(self.get_column_path(path, index, 'texts'), 'wb') as texts_file:
+            texts_file.write(b''.join(texts))
+        return {'type': TEXT_COLUMN}
+
+    def build(self):
+        source = self.get_source_stat()
+        try:
+            sheet = pd.read_excel(self.file_path, keep_default_na=False)
+        except Exception as e:
+            # engines raise their own errors on files that are not workbooks
+            raise UnreadableFileError('file is not a readable excel workbook') from e
+
+        # written aside and renamed, readers never see a partial cache
+        building_path = '{}.{}'.format(self.path, os.getpid())
+        shutil.rmtree(building_path, ignore_errors=True)
+        os.makedirs(building_path)
+        columns = [self.save_column(building_path, index, sheet[name]) for index, name in enumerate(sheet.columns)]
+        with open(os.path.join(building_path, META_FILE_NAME), 'w') as meta_file:
+            json.dump({
+                'version': TABLE_CACHE_VERSION,
+                'source': source,
+                'headers': [str(name) for name in sheet.columns],
+                'columns': columns,
+                'count': len(sheet.index),
+            }, meta_file)
+
+        # previous cache is moved aside before the new one is moved in, readers retry if it goes while they read
+        old_path = '{}.old.{}'.format(self.path, os.getpid())
+        try:
+            os.rename(self.path, old_path)
+        except OSError:
+            old_path = None
+        try:
+            os.rename(building_path, self.path)
+        except OSError:
+            # built by another request at the same time
+            shutil.rmtree(building_path, ignore_errors=True)
+        if old_path:
+            shutil.rmtree(old_path, ignore_errors=True)
+        return self.get_meta()
+
+    def delete(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def read_numbers(self, column, integer, start, stop):
+        numbers = np.load(self.get_column_path(self.path, column, 'npy'), mmap_mode='r')[start:stop]
+        if numbers.dtype.kind != 'f':
+            return numbers.tolist()
+        return [None if np.isnan(number) else int(number) if integer else number for number in numbers.tolist()]
+
+    def read_texts(self, column, start, stop):
+        offsets = np.load(self.get_column_path(self.path, column, 'offsets.npy'), mmap_mode='r')[
+            start:None if stop is None else stop + 1
+        ].tolist()
+        if len(offsets) < 2:
+            return []
+        with open(self.get_column_path(self.path, column, 'texts'), 'rb') as texts_file:
+            texts_file.seek(offsets[0])
+            texts = texts_file.read(offsets[-1] - offsets[0])
+        return [
+            texts[text_start - offsets[0]:text_stop - offsets[0]].decode()
+            for text_start, text_stop in zip(offsets, offsets[1:])
+        ]
+
+    def read_columns(self, start, stop, columns):
+        meta = self.get_valid_meta() or self.build()
+        columns = range(len(meta['headers'])) if columns is None else [
+            column for column in columns if 0 <= column < len(meta['headers'])
+        ]
+
+        values = []
+        for column in columns:
+            column_meta = meta['columns'][column]
+            if column_meta['type'] == NUMBER_COLUMN:
+                values.append(self.read_numbers(column, column_meta['integer'], start, stop))
+            else:
+                values.append(self.read_texts(column, start, stop))
+        return meta, columns, values
+
+    def get_table(self, start=0, stop=None, columns=None):
+        """
+            Returns headers, count of rows and rows in [start, stop) of columns (indexes, all by default)
+        """
+        try:
+            meta, columns, values = self.read_columns(start, stop, columns)
+        except FileNotFoundError:
+            # cache was replaced while reading
+            meta, columns, values = self.read_columns(start, stop, columns)
+        return {
+            'headers': [meta['headers'][column] for column in columns],
+            'count': meta['count'],
+            'result': [list(row) for row in zip(*values)],
+        }
@@ -1,3 +1,283 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from decimal import Decimal
 
-# Create your tests here.
+import pandas as pd
+
+from entrance.imports import EntrancePackageExcelImport
+from entrance.models import EntrancePackage, EntrancePackageFileColumn, StoreReceipt, EntrancePackageItem, \
+    StoreReceiptItem, SupplierRemainItem
+from entrance.receipts import StoreReceiptItemsRegistration
+from entrance.tables import EntranceFileTable, UnreadableFileError
+from helpers.test import MTestCase
+from main.models import Supplier
+from products.models import Product, ProductInventory, ProductInventoryHistory
+
+
+class EntrancePackageExcelImportTest(MTestCase):
+    COLUMNS = [
+        {'key': EntrancePackageFileColumn.PRODUCT_CODE, 'column_number': 0},
+        {'key': EntrancePackageFileColumn.PRODUCT_NAME, 'column_number': 1},
+        {'key': EntrancePackageFileColumn.PRODUCT_PRICE, 'column_number': 2},
+        {'key': EntrancePackageFileColumn.NUMBER_OF_BOXES, 'column_number': 3},
+        {'key': EntrancePackageFileColumn.NUMBER_OF_PRODUCTS_PER_BOX, 'column_number': 4},
+        {'key': EntrancePackageFileColumn.PRICE_SUM, 'column_number': 5},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.entrance_package = EntrancePackage.objects.create(name='package')
+
+    def get_file(self, rows):
+        file = io.BytesIO()
+        pd.DataFrame(rows, columns=['code', 'name', 'price', 'boxes', 'per box', 'sum']).to_excel(file, index=False)
+        file.seek(0)
+        return file
+
+    def run_import(self, rows):
+        columns = [
+            {'in_case_of_sale_type': None, 'is_in_case_of_sale': False, 'currency': None, **column}
+            for column in self.COLUMNS
+        ]
+        excel_import = EntrancePackageExcelImport(self.entrance_package, columns)
+        return excel_import, excel_import.run(self.get_file(rows))
+
+    def test_items_are_imported(self):
+        excel_import, count = self.run_import([
+            ['A1', None, 10, 2, 3, None],
+            [None, 'named', None, 2, 3, 120],
+        ])
+
+        self.assertEqual(dict(excel_import.errors), {})
+        self.assertEqual(count, 2)
+        self.assertEqual(list(self.entrance_package.items.order_by('id').values_list(
+            'product_code', 'default_name', 'default_price', 'price_sum'
+        )), [('A1', '', Decimal('10'), Decimal('60')), (None, 'named', Decimal('20'), Decimal('120'))])
+        self.assertEqual(self.entrance_package.file_columns.count(), len(self.COLUMNS))
+
+    def test_invalid_rows_are_not_imported(self):
+        excel_import, count = self.run_import([
+            ['A1', 'valid', 10, 2, 3, None],
+            ['A2', 'text price', 'ten', 2, 3, None],
+            [None, None, 10, 1, 1, None],
+        ])
+
+        self.assertEqual(count, 0)
+        self.assertEqual(sorted(excel_import.errors), [3, 4])
+        self.assertFalse(self.entrance_package.items.exists())
+
+
+class EntranceFileTableTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.directory.name, 'package.xlsx')
+
+    def tearDown(self):
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_table_is_rebuilt_in_place(self):
+        pd.DataFrame({'code': ['A1', 'A2'], 'count': [1, 2]}).to_excel(self.file_path, index=False)
+        table = EntranceFileTable(self.file_path)
+        self.assertEqual(table.get_table(start=1), {'headers': ['code', 'count'], 'count': 2, 'result': [['A2', 2]]})
+
+        pd.DataFrame({'code': ['B1'], 'count': [3]}).to_excel(self.file_path, index=False)
+        table.build()
+        self.assertEqual(table.get_table()['result'], [['B1', 3]])
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['package.xlsx', 'package.xlsx.table'])
+
+    def test_blank_numbers_and_texts(self):
+        pd.DataFrame({
+            'code': ['A1', 'کالای با نام بلند ' * 20, '', 'B'],
+            'count': [1, None, 3, 4],
+            'price': [1.5, 2.5, None, 4.0],
+        }).to_excel(self.file_path, index=False)
+        table = EntranceFileTable(self.file_path)
+
+        self.assertEqual(table.get_table()['result'], [
+            ['A1', 1, 1.5], ['کالای با نام بلند ' * 20, None, 2.5], ['', 3, None], ['B', 4, 4.0]
+        ])
+        self.assertEqual(table.get_table(start=1, stop=3, columns=[1, 0])['result'], [
+            [None, 'کالای با نام بلند ' * 20], [3, '']
+        ])
+        self.assertIsInstance(table.get_table(stop=1)['result'][0][1], int)
+        self.assertEqual(table.get_table(start=4)['result'], [])
+
+    def test_unreadable_file(self):
+        with open(self.file_path, 'w') as file:
+            file.write('not a workbook')
+
+        with self.assertRaises(UnreadableFileError):
+            EntranceFileTable(self.file_path).get_table()
+
+
+class StoreReceiptItemsRegistrationTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.store_receipt = StoreReceipt.objects.create(name='receipt')
+        self.product = Product.objects.create(product_id='registered', name='registered', barcode='111')
+
+    def get_item(self, barcode, boxes, per_box, **item):
+        return {
+            'barcode': barcode, 'default_name': 'item', 'input_box': boxes, 'input_product_per_box': per_box,
+            'final_price': 1000, **item
+        }
+
+    def test_items_are_registered(self):
+        registration = StoreReceiptItemsRegistration(self.store_receipt, [
+            self.get_item('111', 2, 3),
+            self.get_item('222', 1, 5, new_product_shelf_code=7, product_code='new'),
+            self.get_item('111', 1, 4),
+        ])
+
+        self.assertEqual(registration.run(), 3)
+        self.assertEqual(dict(registration.errors), {})
+        new_product = Product.objects.get(barcode='222')
+        self.assertEqual(list(self.store_receipt.items.order_by('id').values_list('product_id', flat=True)), [
+            self.product.id, new_product.id, self.product.id
+        ])
+        self.assertEqual(ProductInventory.objects.get(product=self.product).inventory, 10)
+        self.assertEqual(ProductInventory.objects.get(product=new_product).inventory, 5)
+        self.assertEqual(list(ProductInventoryHistory.objects.filter(
+            action=ProductInventoryHistory.INCREASE
+        ).order_by('inventory__product_id').values_list(
+            'inventory__product_id', 'amount', 'previous_quantity', 'new_quantity'
+        )), [(self.product.id, 10, 0, 10), (new_product.id, 5, 0, 5)])
+
+    def test_invalid_items_are_not_registered(self):
+        registration = StoreReceiptItemsRegistration(self.store_receipt, [
+            self.get_item('111', 1, 1),
+            self.get_item('333', 1, 1),
+            self.get_item('', 1, 1),
+        ])
+
+        self.assertEqual(registration.run(), 0)
+        self.assertEqual(sorted(registration.errors), [2, 3])
+        self.assertFalse(self.store_receipt.items.exists())
+        self.assertFalse(Product.objects.filter(barcode='333').exists())
+
+
+class SupplierRemainItemTest(MTestCase):
+    FIELDS = ('default_name', 'product_code', 'final_price', 'number_of_box', 'number_of_products_per_box',
+              'number_of_products')
+
+    def setUp(self):
+        super().setUp()
+        self.supplier = Supplier.objects.create(name='supplier')
+        self.other_supplier = Supplier.objects.create(name='other supplier')
+        self.package = EntrancePackage.objects.create(name='package', supplier=self.supplier)
+        self.receipt = StoreReceipt.objects.create(name='receipt', supplier=self.supplier)
+
+    def get_baseline_remains(self, supplier):
+        # remains as computed by `SupplierRemainItems` view before the ledger
+        result = {}
+        for item in EntrancePackageItem.objects.filter(entrance_package__supplier=supplier):
+            price = item.final_price_after_discount
+            key = item.default_name + str(item.number_of_products_per_box) + str(round(price))
+            if key in result:
+                result[key]['number_of_products'] += item.number_of_box * item.number_of_products_per_box
+                result[key]['number_of_box'] += item.number_of_box
+            else:
+                result[key] = {
+                    'final_price': price,
+                    'default_name': item.default_name,
+                    'product_code': item.product_code,
+                    'number_of_box': item.number_of_box,
+                    'number_of_products_per_box': item.number_of_products_per_box,
+                    'number_of_products': item.number_of_box * item.number_of_products_per_box,
+                }
+        for row in StoreReceiptItem.objects.filter(store_receipt__supplier=supplier):
+            key = row.default_name + str(row.number_of_products_per_box) + str(round(row.sale_price))
+            if key in result:
+                result[key]['number_of_products'] -= row.product_count
+                result[key]['number_of_box'] -= row.number_of_box
+        return sorted(
+            (item for item in result.values() if item['number_of_products'] and item['number_of_box'] > 0),
+            key=lambda item: item['default_name']
+        )
+
+    def assert_baseline_remains(self, *counts):
+        for supplier, count in zip((self.supplier, self.other_supplier), counts):
+            remains = list(SupplierRemainItem.objects.filter(supplier=supplier).order_by('default_name').values(
+                *self.FIELDS
+            ))
+            self.assertEqual(len(remains), count)
+            self.assertEqual(remains, self.get_baseline_remains(supplier))
+
+    def create_package_item(self, name, per_box, boxes, price, code=None):
+        return EntrancePackageItem.objects.create(
+            entrance_package=self.package, default_name=name, number_of_products_per_box=per_box,
+            number_of_box=boxes, default_price=price, product_code=code
+        )
+
+    def create_receipt_item(self, name, per_box, boxes, price, item_type=StoreReceiptItem.BOX):
+        return StoreReceiptItem.objects.create(
+            store_receipt=self.receipt, default_name=name, number_of_products_per_box=per_box, number_of_box=boxes,
+            sale_price=price, type=item_type
+        )
+
+    def test_package_item_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_package_item('a', 10, 2, Decimal('1000.40'), code='A2')
+            # same goods, newest item code and price are shown
+            newest = self.create_package_item('a', 10, 3, 1000, code='A1')
+            other = self.create_package_item('b', 5, 1, 2000, code='B1')
+        self.assert_baseline_remains(2, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.number_of_box = 4
+            other.save()
+        self.assert_baseline_remains(2, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.default_price = 3000
+            other.save()
+        self.assert_baseline_remains(2, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            newest.delete()
+        self.assert_baseline_remains(2, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assert_baseline_remains(1, 0)
+
+    def test_receipt_items(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_package_item('a', 10, 3, 1000)
+            self.create_package_item('b', 5, 2, 2000)
+        self.assert_baseline_remains(2, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_receipt_item('a', 10, 1, 1000)
+            self.create_receipt_item('a', 10, 1, 1000, item_type=StoreReceiptItem.WITHOUT_BOX)
+            self.create_receipt_item('c', 10, 1, 1000)
+        self.assert_baseline_remains(2, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            box_item = self.create_receipt_item('b', 5, 2, 2000)
+        self.assert_baseline_remains(1, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            box_item.delete()
+        self.assert_baseline_remains(2, 0)
+
+    def test_package_supplier_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_package_item('a', 10, 3, 1000)
+            self.create_package_item('b', 5, 2, 2000)
+            self.create_receipt_item('a', 10, 1, 1000)
+        self.assert_baseline_remains(2, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.package.supplier = self.other_supplier
+            self.package.save()
+        self.assert_baseline_remains(0, 2)
+
+        SupplierRemainItem.objects.all().delete()
+        SupplierRemainItem.refresh()
+        self.assert_baseline_remains(0, 2)
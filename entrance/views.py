@@ -1,4 +1,3 @@
-from django.core.exceptions import ValidationError
 from django.db.models import QuerySet, Q
 from django.http import Http404
 from django.utils.decorators import method_decorator
@@ -11,20 +10,20 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from entrance.imports import EntrancePackageExcelImport
+from entrance.receipts import StoreReceiptItemsRegistration
 from entrance.models import EntrancePackage, EntrancePackageItem, StoreReceipt, EntrancePackageFileColumn, \
-    StoreReceiptItem
+    SupplierRemainItem
 from entrance.serializers import EntrancePackageSerializer, EntrancePackageRetrieveSerializer, StoreReceiptSerializer, \
     StoreReceiptItemSerializer, StoreReceiptRetrieveSerializer, EntrancePackageItemSerializer, \
     EntrancePackageFileUploadSerializer
+from entrance.tables import EntranceFileTable, UnreadableFileError
 from helpers.auth import BasicCRUDPermission, BasicObjectPermission
 from helpers.models import manage_files
 from helpers.views.MassRelatedCUD import MassRelatedCUD
 from rest_framework.parsers import FileUploadParser, MultiPartParser, FormParser
 
-from main.models import Currency
-from products.models import Product, ProductInventory
 from server.settings import BASE_DIR
-import pandas as pd
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -242,9 +241,22 @@ class EntrancePackageFileUpdateView(generics.UpdateAPIView):
         return EntrancePackage.objects.filter(id=self.request.data['id'])
 
     def perform_update(self, serializer: EntrancePackageFileUploadSerializer) -> None:
+        previous_file = serializer.instance.entrance_file
+        previous_path = previous_file.path if previous_file else None
+
         manage_files(serializer.instance, self.request.data, ['entrance_file'])
         serializer.save()
 
+        entrance_file = serializer.instance.entrance_file
+        if previous_path and (not entrance_file or entrance_file.path != previous_path):
+            EntranceFileTable(previous_path).delete()
+        if entrance_file:
+            try:
+                EntranceFileTable(entrance_file.path).build()
+            except UnreadableFileError:
+                # the file is kept as before, its table is built (or reported unreadable) on read
+                pass
+
 
 class EntrancePackageInsertExcelApiView(APIView):
     permission_classes = (IsAuthenticated, BasicObjectPermission)
@@ -252,59 +264,16 @@ class EntrancePackageInsertExcelApiView(APIView):
 
     def post(self, request):
         data = request.data
-        entrance_packages_columns = data.get('packages_columns')
-        entrance_package = data.get('entrance_package')
-        entrance_package = EntrancePackage.objects.get(id=entrance_package)
-
-        EntrancePackageFileColumn.objects.filter(entrance_package=entrance_package).delete()
-        for column in entrance_packages_columns:
-            if column['currency']:
-                entrance_package.currency = Currency.objects.get(id=column['currency'])
-                entrance_package.save()
-            if column['is_in_case_of_sale']:
-                EntrancePackageFileColumn.objects.create(
-                    entrance_package=entrance_package,
-                    key=column['key'],
-                    column_number=column['column_number'],
-                    in_case_of_sale_type=column['in_case_of_sale_type']
-                )
-            else:
-                EntrancePackageFileColumn.objects.create(
-                    entrance_package=entrance_package,
-                    key=column['key'],
-                    column_number=column['column_number']
-                )
-
-        file_path = entrance_package.entrance_file
-        EntrancePackageItem.objects.filter(entrance_package=entrance_package).delete()
-        data = pd.read_excel(file_path, skiprows=0).values
-        for row in data:
-            entrance_package_item = EntrancePackageItem.objects.create(entrance_package=entrance_package)
-            for item in EntrancePackageFileColumn.objects.filter(entrance_package=entrance_package):
-                if item.key == EntrancePackageFileColumn.PRODUCT_CODE:
-                    entrance_package_item.product_code = row[item.column_number]
-                elif item.key == EntrancePackageFileColumn.PRODUCT_NAME:
-                    entrance_package_item.default_name = row[item.column_number]
-                elif item.key == EntrancePackageFileColumn.PRODUCT_PRICE:
-                    entrance_package_item.default_price = row[item.column_number]
-                elif item.key == EntrancePackageFileColumn.NUMBER_OF_BOXES:
-                    entrance_package_item.number_of_box = row[item.column_number]
-                elif item.key == EntrancePackageFileColumn.NUMBER_OF_PRODUCTS_PER_BOX:
-                    entrance_package_item.number_of_products_per_box = row[item.column_number]
-                elif item.key == EntrancePackageFileColumn.SIXTEEN_DIGIT_CODE:
-                    entrance_package_item.sixteen_digit_code = row[item.column_number]
-                elif item.key == EntrancePackageFileColumn.PRICE_IN_CASE_OF_SALE:
-                    entrance_package_item.price_in_case_of_sale = row[item.column_number]
-                    entrance_package_item.in_case_of_sale_type = item.in_case_of_sale_type
-                elif item.key == EntrancePackageFileColumn.BARCODE:
-                    entrance_package_item.barcode = row[item.column_number]
-                elif item.key == EntrancePackageFileColumn.PRICE_SUM:
-                    entrance_package_item.price_sum = row[item.column_number]
-            entrance_package_item.initial_registration = True
-            entrance_package_item.save()
+        entrance_package = get_object_or_404(EntrancePackage, id=data.get('entrance_package'))
 
-        entrance_package.is_inserted = True
-        entrance_package.save()
+        excel_import = EntrancePackageExcelImport(entrance_package, data.get('packages_columns'))
+        excel_import.run(entrance_package.entrance_file)
+        if excel_import.errors:
+            return Response({
+                'errors': [
+                    {'row': row, 'messages': messages} for row, messages in sorted(excel_import.errors.items())
+                ]
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({'msg': 'success'}, status=status.HTTP_201_CREATED)
 
@@ -325,10 +294,26 @@ class GetTableOfPackageApiView(APIView):
         if not package.entrance_file:
             return Response({'message': 'package file is not available'}, status=status.HTTP_204_NO_CONTENT)
 
-        file_path = package.entrance_file
-        data = pd.read_excel(file_path, keep_default_na='').values
-        response = {'result': data}
-        return Response(response, status=status.HTTP_200_OK)
+        try:
+            start = int(request.GET.get('start', 0))
+            limit = request.GET.get('limit')
+            stop = start + int(limit) if limit else None
+            columns = request.GET.get('columns')
+            columns = [int(column) for column in columns.split(',')] if columns else None
+        except ValueError:
+            return Response(
+                {'message': 'start, limit and columns must be numbers'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if start < 0 or stop is not None and stop < start:
+            return Response(
+                {'message': 'start and limit can not be negative'}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            table = EntranceFileTable(package.entrance_file.path).get_table(start=start, stop=stop, columns=columns)
+        except UnreadableFileError:
+            return Response({'message': 'package file is not an excel file'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(table, status=status.HTTP_200_OK)
 
 
 class PackageDetailView(APIView):
@@ -410,6 +395,8 @@ class RemoveExcelView(APIView):
         query = self.get_object(pk)
         EntrancePackageItem.objects.filter(entrance_package=query).delete()
         EntrancePackageFileColumn.objects.filter(entrance_package=query).delete()
+        if query.entrance_file:
+            EntranceFileTable(query.entrance_file.path).delete()
         query.is_inserted = False
         query.entrance_file = None
         query.save()
@@ -488,45 +475,14 @@ class CreateReceiptsItemsView(APIView):
 
     def post(self, request):
         data = request.data
-        store_receipt = data.get('store_receipt')
-        store_receipt = StoreReceipt.objects.get(id=store_receipt)
-        items = data.get('items')
-
-        for item in items:
-            if 'input_box' in item.keys():
-                if 'barcode' not in item.keys():
-                    raise ValidationError('بارکد الزامیست')
-
-                if 'new_product_shelf_code' not in item.keys() and \
-                        not Product.objects.filter(barcode=item['barcode']).exists():
-                    raise ValidationError('کد قفسه کالا جدید الزامیست الزامیست')
-
-                product = Product.objects.get(barcode=item['barcode']) if \
-                    Product.objects.filter(barcode=item['barcode']).exists() else None
-                if not product:
-                    product = Product.objects.create(
-                        barcode=item['barcode'],
-                        product_id=item['product_code'] if 'product_code' in item.keys() else None,
-                        name=item['default_name'] if 'default_name' in item.keys() else None,
-                        sale_price=item['final_price']
-                    )
-                receipt_item = StoreReceiptItem.objects.create(
-                    product=product,
-                    store_receipt=store_receipt,
-                    product_code=item['product_code'],
-                    default_name=item['default_name'],
-                    number_of_products_per_box=item['input_product_per_box'],
-                    number_of_box=item['input_box'] if 'input_box' in item.keys() else 1,
-                    new_product_shelf_code=item['new_product_shelf_code'] if 'new_product_shelf_code' in item.keys() else 0,
-                    content_production_count=item['content_production_count'] if 'content_production_count' in item.keys() else 0,
-                    failure_count=item['failure_count'] if 'failure_count' in item.keys() else 0,
-                    barcode=item['barcode'],
-                    sale_price=item['final_price']
-                )
-                product_inventory = ProductInventory.objects.get(product=product)
-                product_inventory.add_to_inventory(receipt_item.product_count)
-                product_inventory.price = receipt_item.sale_price
-                product_inventory.save()
+        store_receipt = get_object_or_404(StoreReceipt, id=data.get('store_receipt'))
+
+        registration = StoreReceiptItemsRegistration(store_receipt, data.get('items') or [])
+        registration.run()
+        if registration.errors:
+            return Response({'errors': [
+                {'row': number, 'messages': messages} for number, messages in sorted(registration.errors.items())
+            ]}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({'msg': 'success'}, status=status.HTTP_200_OK)
 
@@ -535,40 +491,12 @@ class SupplierRemainItems(APIView):
     permission_classes = (IsAuthenticated, BasicObjectPermission)
     permission_basename = 'entrance_package_item'
 
-    def get_objects(self, pk):
-        result = {}
-        items = EntrancePackageItem.objects.filter(entrance_package__supplier_id=pk)
-        for item in items:
-            item_key = item.default_name + str(item.number_of_products_per_box) + str(round(item.final_price_after_discount))
-            if item_key in result.keys():
-                result[item_key]['number_of_products'] +=\
-                    (item.number_of_box * item.number_of_products_per_box)
-                result[item_key]['number_of_box'] += item.number_of_box
-            else:
-                result[item_key] = {
-                    'final_price': item.final_price_after_discount,
-                    'default_name': item.default_name,
-                    'product_code': item.product_code,
-                    'number_of_box': item.number_of_box,
-                    'number_of_products_per_box': item.number_of_products_per_box,
-                    'number_of_products': item.number_of_box * item.number_of_products_per_box,
-                }
-        return result
-
     def get(self, request, pk):
-        items = self.get_objects(pk)
-        store_receipt_items = StoreReceiptItem.objects.filter(store_receipt__supplier_id=pk)
-        for row in store_receipt_items:
-            row_key = row.default_name + str(row.number_of_products_per_box) + str(round(row.sale_price))
-            if row_key in items.keys():
-                items[row_key]['number_of_products'] -= row.product_count
-                items[row_key]['number_of_box'] -= row.number_of_box
-        result = []
-        for key in items:
-            if items[key]['number_of_products'] and items[key]['number_of_box'] > 0:
-                result.append(items[key])
-
-        return Response(result, status=status.HTTP_200_OK)
+        result = SupplierRemainItem.objects.filter(supplier_id=pk).order_by('default_name', 'id').values(
+            'final_price', 'default_name', 'product_code', 'number_of_box', 'number_of_products_per_box',
+            'number_of_products'
+        )
+        return Response(list(result), status=status.HTTP_200_OK)
 
 
 class SupplierStoreReceiptsView(APIView):
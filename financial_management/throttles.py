@@ -1,4 +1,4 @@
-from rest_framework.throttling import UserRateThrottle
+from helpers.throttling import UserRateThrottle
 
 
 class PaymentRateThrottle(UserRateThrottle):
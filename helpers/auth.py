@@ -1,10 +1,14 @@
 from django.contrib.auth.models import Permission
+from django.utils.translation import gettext_lazy as _
 from django.views.generic.base import View
+from rest_framework import exceptions
 from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
 from rest_framework.permissions import BasePermission
 from rest_framework.request import Request
 
 from helpers.models import BaseModel
+from helpers.token_sessions import get_request_token_user
 
 
 def get_codenames(request, view):
@@ -91,8 +95,12 @@ class BasicCRUDPermission(BasicObjectPermission):
 
 
 class TokenAuthSupportQueryString(TokenAuthentication):
+    """
+        Token lookups go through `helpers.token_sessions` and are shared with `ModifyRequestMiddleware`
+    """
 
     def authenticate(self, request):
+        self.request = request._request
         token = request.query_params.get("token", None)
 
         if token:
@@ -102,6 +110,17 @@ class TokenAuthSupportQueryString(TokenAuthentication):
 
         return result
 
+    def authenticate_credentials(self, key):
+        user = get_request_token_user(self.request, key)
+
+        if user is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return user, Token(key=key, user=user)
+
 
 class DefinedItemUDPermission(BasePermission):
     """
@@ -0,0 +1,163 @@
+import re
+import time
+from collections import Counter
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache as BaseLocMemCache
+from django_redis.cache import RedisCache as BaseRedisCache
+
+CACHE_GENERATION_KEY = 'cache_generation'
+CACHE_STATS_KEY = 'cache_stats'
+CACHE_STATS_PREFIXES_KEY = 'cache_stats_prefixes'
+
+GENERATION_CHECK_INTERVAL = 5
+STATS_FLUSH_INTERVAL = 60
+
+_MISSING = object()
+_generation = {'value': None, 'checked_at': 0}
+
+
+def is_global_key(key):
+    """
+        Global keys are not namespaced by cache generation, so they survive `bump_cache_generation`
+    """
+    return key == CACHE_GENERATION_KEY or str(key).startswith(CACHE_STATS_KEY)
+
+
+def get_key_prefix(key):
+    """
+        Leading words of the key before the first `:`, up to the first part that is not a word (ids, hashes, tokens)
+        Ex: `related_products_12` -> `related_products` , `viewed:user:1:product:2` -> `viewed` ,
+            `token_session_9944b09199c62bcf` -> `token_session`
+    """
+    words = []
+    for part in str(key).split(':', 1)[0].split('_'):
+        if not re.fullmatch(r'[a-zA-Z]+', part):
+            break
+        words.append(part)
+    return '_'.join(words) or 'other'
+
+
+def get_cache_generation():
+    now = time.monotonic()
+    if _generation['value'] is None or now - _generation['checked_at'] > GENERATION_CHECK_INTERVAL:
+        _generation['value'] = caches['default'].get(CACHE_GENERATION_KEY) or 0
+        _generation['checked_at'] = now
+    return _generation['value']
+
+
+def bump_cache_generation():
+    """
+        Invalidates every cached key at once (used after deploys and bulk imports)
+    """
+    cache = caches['default']
+    cache.add(CACHE_GENERATION_KEY, 0, timeout=None)
+    generation = cache.incr(CACHE_GENERATION_KEY)
+    _generation['value'] = generation
+    _generation['checked_at'] = time.monotonic()
+    return generation
+
+
+def make_key(key, key_prefix, version):
+    """
+        Used as `KEY_FUNCTION` of caches, keys are namespaced as `prefix:generation:version:key`
+    """
+    if is_global_key(key):
+        return '%s:%s' % (key_prefix, key)
+    return '%s:%s:%s:%s' % (key_prefix, get_cache_generation(), version, key)
+
+
+def get_cache_stats():
+    """
+        Returns hit and miss counters of every key prefix, counters are flushed by workers each `STATS_FLUSH_INTERVAL`
+    """
+    cache = caches['default']
+    prefixes = cache.get(CACHE_STATS_PREFIXES_KEY) or []
+    counters = cache.get_many([
+        '{}:{}:{}'.format(CACHE_STATS_KEY, prefix, result) for prefix in prefixes for result in ('hits', 'misses')
+    ])
+
+    stats = {}
+    for prefix in sorted(prefixes):
+        hits = counters.get('{}:{}:hits'.format(CACHE_STATS_KEY, prefix), 0)
+        misses = counters.get('{}:{}:misses'.format(CACHE_STATS_KEY, prefix), 0)
+        stats[prefix] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+    return stats
+
+
+class MeteredCacheMixin:
+    """
+        Counts hits and misses per key prefix in process and adds them to shared counters periodically
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats = Counter()
+        self._stats_flushed_at = time.monotonic()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        if not is_global_key(key):
+            self.count(key, value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def count(self, key, hit):
+        self._stats[(get_key_prefix(key), 'hits' if hit else 'misses')] += 1
+        if time.monotonic() - self._stats_flushed_at > STATS_FLUSH_INTERVAL:
+            self.flush_stats()
+
+    def flush_stats(self):
+        stats, self._stats = self._stats, Counter()
+        self._stats_flushed_at = time.monotonic()
+        if not stats:
+            return
+
+        prefixes = set(super().get(CACHE_STATS_PREFIXES_KEY) or [])
+        new_prefixes = {prefix for prefix, result in stats.keys()} - prefixes
+        if new_prefixes:
+            super().set(CACHE_STATS_PREFIXES_KEY, list(prefixes | new_prefixes), timeout=None)
+
+        for (prefix, result), count in stats.items():
+            key = '{}:{}:{}'.format(CACHE_STATS_KEY, prefix, result)
+            super().add(key, 0, timeout=None)
+            super().incr(key, count)
+
+
+class RedisCache(MeteredCacheMixin, BaseRedisCache):
+
+    def get_many(self, keys, version=None):
+        values = super().get_many(keys, version=version)
+        for key in keys:
+            if not is_global_key(key):
+                self.count(key, key in values)
+        return values
+
+
+class LocMemCache(MeteredCacheMixin, BaseLocMemCache):
+    """
+        Local stand-in of `RedisCache` for tests, `get_many` of LocMemCache calls `get` so it is metered too
+    """
+
+
+def get_cache_tags_version(tags):
+    """
+        Returns a combined version of tags, any `invalidate_cache_tags` on one of them changes it
+    """
+    if not tags:
+        return '0'
+    cache = caches['default']
+    keys = ['cache_tag:{}'.format(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    return '.'.join(str(versions.get(key, 0)) for key in keys)
+
+
+def invalidate_cache_tags(*tags):
+    cache = caches['default']
+    for tag in tags:
+        key = 'cache_tag:{}'.format(tag)
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
@@ -1,8 +1,7 @@
-import gc
 from abc import ABC
 
-from django.db import connection, models
-from django.db.models import Func
+from django.db import connection, models, transaction
+from django.db.models import Func, QuerySet, Min, Max
 
 
 def bulk_create(model_class, model_array, chunk=50):
@@ -10,21 +9,174 @@ def bulk_create(model_class, model_array, chunk=50):
         model_class.objects.bulk_create(model_array[i: i + chunk])
 
 
-def queryset_iterator(queryset, chunk_size=100, key=None):
+def queryset_chunks(queryset, chunk_size=1000, key='pk', values=None, start=None, end=None):
+    """
+        Yields lists of `chunk_size` rows of queryset ordered by `key` (a unique and indexed field, `-` prefixed
+        for descending order), each chunk is fetched by keyset (`key > last key LIMIT chunk_size`) in the same time
+        wherever it is in the table, prefetched relations are loaded for each chunk
+
+        values: field names to yield tuples of instead of model instances, as `values_list`
+        start, end: only rows of `start <= key < end`, see `get_key_ranges`
+    """
+    key_name = key.lstrip('-')
+    lookup = '{}__{}'.format(key_name, 'lt' if key.startswith('-') else 'gt')
+
+    queryset = queryset.order_by(key)
+    if start is not None:
+        queryset = queryset.filter(**{key_name + '__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{key_name + '__lt': end})
+
+    strip_key = False
+    if values:
+        values = list(values)
+        if key_name not in values:
+            values.append(key_name)
+            strip_key = True
+        key_index = values.index(key_name)
+        queryset = queryset.values_list(*values)
+
+    last_key = None
+    while True:
+        chunk = queryset
+        if last_key is not None:
+            chunk = chunk.filter(**{lookup: last_key})
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+
+        last_key = chunk[-1][key_index] if values else getattr(chunk[-1], key_name)
+        yield [row[:-1] for row in chunk] if strip_key else chunk
+        if len(chunk) < chunk_size:
+            return
+
+
+def queryset_iterator(queryset, chunk_size=1000, key='pk', values=None, server_side=False, start=None, end=None):
+    """
+        Iterates rows of queryset ordered by `key` in constant memory, by chunks of `queryset_chunks` or with
+        `server_side` through one server side cursor (`QuerySet.iterator`), which streams rows of a single query
+        but ignores `prefetch_related` and keeps the query open until iteration ends
+
+        Ex, a table split between 4 processes:
+            for start, end in get_key_ranges(queryset, 4):
+                ... queryset_iterator(queryset, values=('id', 'name'), start=start, end=end)
+    """
     if isinstance(queryset, list):
-        return queryset
-
-    key = [key] if isinstance(key, str) else (key or ['pk'])
-    counter = 0
-    count = chunk_size
-    while count == chunk_size:
-        offset = counter - counter % chunk_size
-        count = 0
-        for item in queryset.all().order_by(*key)[offset:offset + chunk_size]:
-            count += 1
-            yield item
-        counter += count
-        gc.collect()
+        yield from queryset
+        return
+
+    if not server_side:
+        for chunk in queryset_chunks(queryset, chunk_size, key, values, start, end):
+            yield from chunk
+        return
+
+    key_name = key.lstrip('-')
+    queryset = queryset.order_by(key)
+    if start is not None:
+        queryset = queryset.filter(**{key_name + '__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{key_name + '__lt': end})
+    if values:
+        queryset = queryset.values_list(*values)
+    yield from queryset.iterator(chunk_size=chunk_size)
+
+
+def get_key_ranges(queryset, count, key='pk'):
+    """
+        Splits values of integer `key` in queryset to `count` [start, end) ranges of the same width, for parallel
+        `queryset_iterator` of batch jobs. Ranges have near equal rows when keys are dense, as auto increment ids
+    """
+    bounds = queryset.aggregate(min_key=Min(key), max_key=Max(key))
+    min_key, max_key = bounds['min_key'], bounds['max_key']
+    if min_key is None:
+        return []
+
+    width = -(-(max_key - min_key + 1) // count)
+    return [
+        (start, min(start + width, max_key + 1)) for start in range(min_key, max_key + 1, width)
+    ]
+
+
+def ordered_queryset_iterator(queryset, chunk_size=1000):
+    """
+        Yields objects of queryset in its order, `chunk_size` rows (and their prefetched relations) at a time
+        Querysets ordered by pk are paged by keyset (`pk > last pk`), others by chunks of their ordered pks
+    """
+    if not isinstance(queryset, QuerySet) or queryset.query.is_sliced:
+        yield from queryset
+        return
+
+    query = queryset.query
+    ordering = tuple(query.order_by or (query.get_meta().ordering if query.default_ordering else ()))
+    pk_name = query.get_meta().pk.name
+    if ordering in ((), ('pk',), (pk_name,), ('-pk',), ('-' + pk_name,)):
+        descending = ordering[:1] in (('-pk',), ('-' + pk_name,))
+        yield from queryset_iterator(queryset, chunk_size, key='-pk' if descending else 'pk')
+        return
+
+    pks = list(dict.fromkeys(queryset.values_list('pk', flat=True)))
+    for offset in range(0, len(pks), chunk_size):
+        chunk_pks = pks[offset:offset + chunk_size]
+        objects = {obj.pk: obj for obj in queryset.order_by().filter(pk__in=chunk_pks)}
+        yield from (objects[pk] for pk in chunk_pks if pk in objects)
+
+
+class CommitBatch:
+    """
+        Values collected during a transaction by key, passed to `func(key, values)` for each key after commit
+        `cache` keeps lookups made for the same transaction
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.values = {}
+        self.cache = {}
+        self.called = False
+
+    def add(self, key, values):
+        self.values.setdefault(key, set()).update(values)
+
+    def __call__(self):
+        self.called = True
+        for key, values in self.values.items():
+            if values:
+                self.func(key, values)
+
+
+def get_commit_batch(name):
+    """
+        Batch `name` of the running transaction, None when there is none
+    """
+    batches = getattr(transaction.get_connection(), 'commit_batches', {})
+    batch = batches.get(name)
+    # callbacks of committed or rolled back transactions are dropped from `run_on_commit`, callbacks run by
+    # `TestCase.captureOnCommitCallbacks` are kept there
+    if batch is None or batch.called or not any(
+            func is batch for savepoint_ids, func in transaction.get_connection().run_on_commit
+    ):
+        return None
+    return batch
+
+
+def add_to_commit_batch(name, func, key, values):
+    """
+        Calls `func(key, values)` once per key after the running transaction commits, with values of every call
+        made during it, at once out of transactions
+
+        Ex:
+            add_to_commit_batch('product_documents', refresh_documents, category_id, [product_id])
+    """
+    batch = get_commit_batch(name)
+    if batch is None:
+        connection = transaction.get_connection()
+        batch = CommitBatch(func)
+        batch.add(key, values)
+        if not hasattr(connection, 'commit_batches'):
+            connection.commit_batches = {}
+        connection.commit_batches[name] = batch
+        transaction.on_commit(batch)
+    else:
+        batch.add(key, values)
 
 
 class DateAdd(Func, ABC):
@@ -1,12 +1,18 @@
-from io import BytesIO
+import csv
+import datetime
+import itertools
+import tempfile
+from decimal import Decimal
 from typing import Any, Dict
 
-import pandas
 import xlsxwriter
-from django.http.response import HttpResponse
+from django.http.response import FileResponse, StreamingHttpResponse
 from django.shortcuts import render
 from wkhtmltopdf.views import PDFTemplateView
 
+XLSX_CONTENT_TYPE = 'application/vnd.ms-excel'
+CELL_VALUE_TYPES = (str, int, float, Decimal, datetime.date, datetime.time)
+
 
 class MPDFTemplateView(PDFTemplateView):
     cmd_options = {
@@ -25,35 +31,95 @@ class MPDFTemplateView(PDFTemplateView):
         return render(request, self.template_name, context=self.get_context_data(request=request))
 
 
+def get_cell_value(value):
+    if value is None or isinstance(value, CELL_VALUE_TYPES):
+        return value
+    return str(value)
+
+
+class XlsxStreamWriter:
+    """
+        Writes rows of a right to left sheet to a temporary file in constant memory mode of xlsxwriter: each row is
+        flushed to disk when the next one starts, so memory does not grow with count of rows
+    """
+
+    def __init__(self, sheet_name='Sheet1', column_formats=None):
+        self.file = tempfile.TemporaryFile()
+        self.workbook = xlsxwriter.Workbook(self.file, {
+            'constant_memory': True,
+            'remove_timezone': True,
+            'default_date_format': 'yyyy/mm/dd hh:mm',
+        })
+        self.worksheet = self.workbook.add_worksheet(sheet_name[:31])
+        self.worksheet.right_to_left()
+        for columns, cell_format in (column_formats or {}).items():
+            self.worksheet.set_column(columns, None, self.workbook.add_format(cell_format))
+
+        self.row = 0
+        self.columns_count = 0
+        self.bordered_rows = []
+
+    def write_row(self, values):
+        self.worksheet.write_row(self.row, 0, [get_cell_value(value) for value in values])
+        self.columns_count = max(self.columns_count, len(values))
+        self.row += 1
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write_row(row)
+
+    def skip_rows(self, count):
+        self.row += count
+
+    def add_border(self, first_row, last_row):
+        if last_row >= first_row:
+            self.bordered_rows.append((first_row, last_row))
+
+    def get_response(self, file_name):
+        """
+            Closes workbook and streams the file in blocks, the temporary file is removed after response is sent
+        """
+        border_format = self.workbook.add_format({'bottom': 1, 'top': 1, 'left': 1, 'right': 1})
+        for first_row, last_row in self.bordered_rows:
+            self.worksheet.conditional_format(first_row, 0, last_row, max(self.columns_count - 1, 0), {
+                'type': 'no_errors',
+                'format': border_format
+            })
+        self.workbook.close()
+        self.file.seek(0)
+        return FileResponse(self.file, as_attachment=True, filename=file_name, content_type=XLSX_CONTENT_TYPE)
+
+
+class Echo:
+    """
+        File like object of `csv.writer` that returns written lines instead of keeping them
+    """
+
+    def write(self, value):
+        return value
+
+
+def get_csv_response(file_name, rows):
+    """
+        Streams rows as csv while they are generated, rows must not depend on state of request that is cleared
+        after view returns
+    """
+    if not file_name.endswith('.csv'):
+        file_name = "{}.csv".format(file_name)
+
+    writer = csv.writer(Echo())
+    # byte order mark makes excel read persian texts as utf-8
+    lines = itertools.chain(['\ufeff'], (writer.writerow(row) for row in rows))
+    response = StreamingHttpResponse(lines, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(file_name)
+    return response
+
+
 def get_xlsx_response(file_name, data):
-    with BytesIO() as b:
-        writer = pandas.ExcelWriter(b, engine='xlsxwriter')
-
-        if not file_name.endswith('.xlsx'):
-            file_name = "{}.xlsx".format(file_name)
-
-        sheet_name = 'Sheet1'
-
-        df = pandas.DataFrame(data)
-        df.to_excel(
-            writer,
-            sheet_name=sheet_name,
-            index=False,
-            header=False
-        )
-        workbook = writer.book
-        worksheet = writer.sheets[sheet_name]
-        worksheet.right_to_left()
-
-        cell_format = writer.book.add_format({'num_format': '#,##0.00', 'align': 'center'})
-        writer.sheets[sheet_name].set_column('B:Z', None, cell_format)
-
-        border_fmt = workbook.add_format({'bottom': 1, 'top': 1, 'left': 1, 'right': 1})
-        worksheet.conditional_format(xlsxwriter.utility.xl_range(
-            0, 0, len(data) - 1, len(df.columns) - 1
-        ), {'type': 'no_errors', 'format': border_fmt})
-        writer.save()
-
-        response = HttpResponse(b.getvalue(), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="{}"'.format(file_name)
-        return response
+    if not file_name.endswith('.xlsx'):
+        file_name = "{}.xlsx".format(file_name)
+
+    writer = XlsxStreamWriter(column_formats={'B:Z': {'num_format': '#,##0.00', 'align': 'center'}})
+    writer.write_rows(data)
+    writer.add_border(0, writer.row - 1)
+    return writer.get_response(file_name)
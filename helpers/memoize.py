@@ -0,0 +1,182 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict, Counter
+
+from django.core.cache import cache
+
+from helpers.cache import get_cache_tags_version
+
+LOCK_TIMEOUT = 30
+LOCK_WAIT_INTERVAL = 0.05
+
+_local_cache_stats = Counter()
+
+
+def make_arguments_key(*args, **kwargs):
+    """
+        Default key of memoized calls, arguments must have a stable `repr` (ids instead of model instances)
+    """
+    return hashlib.md5(repr((args, sorted(kwargs.items()))).encode()).hexdigest()
+
+
+def get_or_compute(key, compute, timeout, stale_timeout=0, lock_timeout=LOCK_TIMEOUT):
+    """
+        Returns value of key from shared cache, computes and caches it on miss
+
+        Only one worker computes a missing key (single-flight), others wait for its value. After `timeout` the value
+        is stale, for `stale_timeout` more seconds it is served to everyone while one worker recomputes it
+    """
+    lock_key = '{}:lock'.format(key)
+    entry = cache.get(key)
+
+    if entry is not None:
+        value, fresh_until = entry
+        if fresh_until > time.time() or not cache.add(lock_key, 1, lock_timeout):
+            return value
+    elif not cache.add(lock_key, 1, lock_timeout):
+        deadline = time.monotonic() + lock_timeout
+        while cache.has_key(lock_key) and time.monotonic() < deadline:
+            time.sleep(LOCK_WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        # computing worker failed, compute without lock
+        value = compute()
+        cache.set(key, (value, time.time() + timeout), timeout + stale_timeout)
+        return value
+
+    try:
+        value = compute()
+        cache.set(key, (value, time.time() + timeout), timeout + stale_timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def shared_cache(key_prefix, timeout, stale_timeout=0, tags=(), key_func=make_arguments_key):
+    """
+        Memoizes function in the default cache (shared by workers) with `get_or_compute`
+        Entries are dropped by `helpers.cache.invalidate_cache_tags` on one of `tags`, hits and misses are counted
+        under `key_prefix` in `helpers.cache.get_cache_stats`
+
+        Ex:
+            @shared_cache('popular_products', timeout=60 * 60, stale_timeout=60 * 10, tags=('products',))
+            def get_popular_products(count):
+    """
+
+    def decorator(func):
+        def get_key(*args, **kwargs):
+            return '{}:{}:{}'.format(key_prefix, get_cache_tags_version(tags), key_func(*args, **kwargs))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return get_or_compute(
+                get_key(*args, **kwargs),
+                lambda: func(*args, **kwargs),
+                timeout,
+                stale_timeout
+            )
+
+        wrapper.invalidate = lambda *args, **kwargs: cache.delete(get_key(*args, **kwargs))
+        return wrapper
+
+    return decorator
+
+
+class LocalCache:
+    """
+        Process local TTL cache bounded to `maxsize` entries, least recently used entries are evicted in O(1)
+        Threads computing the same key wait for the first one
+    """
+
+    def __init__(self, name, timeout, maxsize):
+        self.name = name
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    def get_entry(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def get_or_compute(self, key, compute):
+        with self.lock:
+            entry = self.get_entry(key)
+            _local_cache_stats[(self.name, 'hits' if entry else 'misses')] += 1
+            if entry:
+                return entry[0]
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self.lock:
+                entry = self.get_entry(key)
+            if entry:
+                return entry[0]
+
+            try:
+                value = compute()
+                with self.lock:
+                    self.entries[key] = (value, time.monotonic() + self.timeout)
+                    self.entries.move_to_end(key)
+                    if len(self.entries) > self.maxsize:
+                        self.entries.popitem(last=False)
+                return value
+            finally:
+                with self.lock:
+                    self.key_locks.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def local_cache(timeout, maxsize=1000, key_func=make_arguments_key):
+    """
+        Memoizes function in process memory with `LocalCache`, for small hot values read on most requests
+        Values are not shared and not invalidated by workers, keep `timeout` short for values that change
+
+        Ex:
+            @local_cache(timeout=30, maxsize=100)
+            def get_settings_value(name):
+    """
+
+    def decorator(func):
+        local = LocalCache('{}.{}'.format(func.__module__, func.__qualname__), timeout, maxsize)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return local.get_or_compute(key_func(*args, **kwargs), lambda: func(*args, **kwargs))
+
+        wrapper.cache = local
+        return wrapper
+
+    return decorator
+
+
+def get_local_cache_stats():
+    """
+        Hit and miss counters of `local_cache` functions in this process
+    """
+    stats = {}
+    for name in sorted({name for name, result in _local_cache_stats}):
+        hits = _local_cache_stats[(name, 'hits')]
+        misses = _local_cache_stats[(name, 'misses')]
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+    return stats
@@ -1,11 +1,11 @@
 import threading
-from re import sub
 
 from django.contrib.auth.middleware import get_user
 from django.utils.functional import SimpleLazyObject
-from rest_framework.authtoken.models import Token
 from rest_framework_jwt.authentication import JSONWebTokenAuthentication
 
+from helpers.token_sessions import get_request_token_user, get_request_token_key
+
 
 class ModifyRequestMiddleware:
     user = None
@@ -21,17 +21,9 @@ class ModifyRequestMiddleware:
     def process_request(self, request):
         user = SimpleLazyObject(lambda: self.get_actual_value(request))
 
-        header_token = request.META.get('HTTP_AUTHORIZATION', None)
-        if header_token:
-            token = sub('Token ', '', request.META.get('HTTP_AUTHORIZATION', None))
-        else:
-            token = request.GET.get('token', None)
-
-        try:
-            token_obj = Token.objects.get(key=token)
-            request.user = token_obj.user
-        except Token.DoesNotExist:
-            pass
+        token_user = get_request_token_user(request, get_request_token_key(request))
+        if token_user:
+            request.user = token_user
 
         if user.is_authenticated:
             self.thread_local.user = user
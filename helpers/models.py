@@ -116,7 +116,7 @@ class BaseModel(models.Model):
 
 
 class TimeStampedModel(models.Model):
-    created_at = models.DateTimeField(auto_now=True, db_index=True)
+    created_at = models.DateTimeField(default=datetime.now, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -0,0 +1,125 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPaginationMixin:
+    """
+        Pages by the last (key, id) of previous page instead of an offset, requested by passing `cursor`
+        (empty for the first page), without it the base pagination is used
+
+        Keys are whitelisted by `keyset_ordering_fields` of view, a dict of `ordering` param name to field, ex:
+        `{'price': 'price', 'view_count': 'view_counter__total'}`, every key needs an index on (key, id)
+        to fetch pages in constant time. `keyset_ordering` of view is used when `ordering` is not passed
+    """
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def is_keyset_request(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def get_keyset_page_size(self, request):
+        raise NotImplementedError
+
+    def get_keyset_ordering(self, request, view):
+        fields = getattr(view, 'keyset_ordering_fields', {'id': 'id'})
+        ordering = request.query_params.get(self.ordering_query_param, getattr(view, 'keyset_ordering', '-id'))
+        name = ordering.lstrip('-')
+        if name not in fields:
+            ordering = getattr(view, 'keyset_ordering', '-id')
+            name = ordering.lstrip('-')
+        return fields[name], ordering.startswith('-')
+
+    def encode_cursor(self, value, last_id):
+        # str keeps microseconds of datetimes, lookups convert it back
+        if value is not None and not isinstance(value, (int, float)):
+            value = str(value)
+        return base64.urlsafe_b64encode(json.dumps([value, last_id]).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, last_id = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return value, int(last_id)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_after_position_filter(self, field, descending, value, last_id):
+        """
+            Rows after (value, last_id), nulls are last in ascending and first in descending order (as in postgres
+            and its indexes)
+        """
+        if descending:
+            if value is None:
+                return Q(**{field + '__isnull': True, 'id__lt': last_id}) | Q(**{field + '__isnull': False})
+            return Q(**{field + '__lt': value}) | Q(**{field: value, 'id__lt': last_id})
+
+        if value is None:
+            return Q(**{field + '__isnull': True, 'id__gt': last_id})
+        return Q(**{field + '__gt': value}) | Q(**{field: value, 'id__gt': last_id}) | Q(**{field + '__isnull': True})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_keyset_request(request):
+            self.keyset_request = None
+            return super().paginate_queryset(queryset, request, view)
+
+        self.keyset_request = request
+        page_size = self.get_keyset_page_size(request)
+        field, descending = self.get_keyset_ordering(request, view)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.get_after_position_filter(field, descending, *position))
+            except (ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+
+        if descending:
+            queryset = queryset.order_by(F(field).desc(), '-id')
+        else:
+            queryset = queryset.order_by(F(field).asc(), 'id')
+
+        rows = list(queryset.annotate(keyset_value=F(field))[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.keyset_page = rows[:page_size]
+        return self.keyset_page
+
+    def get_next_link(self):
+        if self.keyset_request is None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        last_row = self.keyset_page[-1]
+        url = self.keyset_request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(
+            last_row.keyset_value, last_row.id
+        ))
+
+    def get_paginated_response(self, data):
+        if self.keyset_request is None:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class KeysetLimitOffsetPagination(KeysetPaginationMixin, LimitOffsetPagination):
+
+    def get_keyset_page_size(self, request):
+        return self.get_limit(request) or 20
+
+
+class KeysetPageNumberPagination(KeysetPaginationMixin, PageNumberPagination):
+
+    def get_keyset_page_size(self, request):
+        return self.get_page_size(request) or 20
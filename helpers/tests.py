@@ -0,0 +1,318 @@
+import csv
+import datetime
+import io
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
+
+import openpyxl
+from django.conf import settings
+from django.core.cache import cache
+from django.test import RequestFactory
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from helpers.auth import TokenAuthSupportQueryString
+from helpers.cache import (
+    get_key_prefix, make_key, bump_cache_generation, get_cache_generation, get_cache_stats, CACHE_GENERATION_KEY
+)
+from helpers.db import queryset_iterator, get_key_ranges, add_to_commit_batch
+from helpers.exports import get_xlsx_response, get_csv_response
+from helpers.memoize import get_or_compute, local_cache, get_local_cache_stats
+from helpers.test import MTestCase
+from helpers.throttling import LocalThrottleBackend
+from helpers.token_sessions import get_token_session_user, TOKEN_SESSION_CACHE_KEY
+from products.models import Product
+from users.models import User
+
+
+class CacheTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.flush_stats()
+        cache.clear()
+
+    def test_key_prefix(self):
+        self.assertEqual(get_key_prefix('related_products_12'), 'related_products')
+        self.assertEqual(get_key_prefix('viewed:user:1:product:2'), 'viewed')
+        self.assertEqual(get_key_prefix('token_session_9944b09199c62bcfabc'), 'token_session')
+        self.assertEqual(get_key_prefix('token_session_{}'.format(Token.generate_key())), 'token_session')
+        self.assertEqual(get_key_prefix('dynamic_throttle_anon_127.0.0.1_GET'), 'dynamic_throttle_anon')
+        self.assertEqual(get_key_prefix(12), 'other')
+
+    def test_make_key(self):
+        self.assertEqual(make_key('key', 'prefix', 1), 'prefix:{}:1:key'.format(get_cache_generation()))
+        self.assertEqual(make_key(CACHE_GENERATION_KEY, 'prefix', 1), 'prefix:{}'.format(CACHE_GENERATION_KEY))
+
+    def test_generation_bump_invalidates_keys(self):
+        cache.set('key', 'value')
+        generation = bump_cache_generation()
+        self.assertEqual(get_cache_generation(), generation)
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(bump_cache_generation(), generation + 1)
+
+    def test_stats_are_counted_per_prefix(self):
+        cache.set('token_session_a1', 'session')
+        cache.get('token_session_a1')
+        cache.get('token_session_b2')
+        cache.get_many(['related_products_1', 'related_products_2'])
+        cache.get(CACHE_GENERATION_KEY)
+        cache.flush_stats()
+
+        self.assertEqual(get_cache_stats(), {
+            'related_products': {'hits': 0, 'misses': 2, 'hit_rate': 0.0},
+            'token_session': {'hits': 1, 'misses': 1, 'hit_rate': 0.5},
+        })
+
+
+class GetOrComputeTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.computed = []
+
+    def compute(self, value):
+        def func():
+            self.computed.append(value)
+            return value
+        return func
+
+    def test_missing_value_is_computed_once(self):
+        self.assertEqual(get_or_compute('key', self.compute('value'), 60), 'value')
+        self.assertEqual(get_or_compute('key', self.compute('other value'), 60), 'value')
+        self.assertEqual(self.computed, ['value'])
+        self.assertFalse(cache.has_key('key:lock'))
+
+    def test_locked_key_waits_for_computing_worker(self):
+        cache.add('key:lock', 1, 30)
+
+        def finish_computing():
+            cache.set('key', ('worker value', time.time() + 60), 60)
+            cache.delete('key:lock')
+
+        worker = threading.Timer(0.1, finish_computing)
+        worker.start()
+        self.assertEqual(get_or_compute('key', self.compute('value'), 60), 'worker value')
+        worker.join()
+        self.assertEqual(self.computed, [])
+
+    def test_locked_key_is_computed_when_worker_fails(self):
+        cache.add('key:lock', 1, 30)
+        self.assertEqual(get_or_compute('key', self.compute('value'), 60, lock_timeout=0.1), 'value')
+        self.assertEqual(self.computed, ['value'])
+
+    def test_stale_value_is_served_while_recomputed(self):
+        cache.set('key', ('stale value', time.time() - 1), 60)
+
+        cache.add('key:lock', 1, 30)
+        self.assertEqual(get_or_compute('key', self.compute('value'), 60, stale_timeout=60), 'stale value')
+        self.assertEqual(self.computed, [])
+
+        cache.delete('key:lock')
+        self.assertEqual(get_or_compute('key', self.compute('value'), 60, stale_timeout=60), 'value')
+        self.assertEqual(get_or_compute('key', self.compute('other value'), 60, stale_timeout=60), 'value')
+        self.assertEqual(self.computed, ['value'])
+        self.assertFalse(cache.has_key('key:lock'))
+
+
+class LocalCacheTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.computed = []
+
+        @local_cache(timeout=60, maxsize=2)
+        def compute(value):
+            self.computed.append(value)
+            return value
+
+        self.compute = compute
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.compute(1)
+        self.compute(2)
+        self.compute(1)
+        self.compute(3)
+        self.assertEqual([self.compute(value) for value in (1, 3, 2)], [1, 3, 2])
+        self.assertEqual(self.computed, [1, 2, 3, 2])
+        self.assertEqual(len(self.compute.cache), 2)
+
+    def test_hits_and_misses_are_counted(self):
+        stats = get_local_cache_stats().get(self.compute.cache.name, {'hits': 0, 'misses': 0})
+        self.compute(1)
+        self.compute(1)
+        self.compute(2)
+
+        new_stats = get_local_cache_stats()[self.compute.cache.name]
+        self.assertEqual(new_stats['hits'] - stats['hits'], 1)
+        self.assertEqual(new_stats['misses'] - stats['misses'], 2)
+
+    def test_expired_entry_is_computed(self):
+        with mock.patch('helpers.memoize.time.monotonic', return_value=1000):
+            self.compute(1)
+        with mock.patch('helpers.memoize.time.monotonic', return_value=1059):
+            self.compute(1)
+        with mock.patch('helpers.memoize.time.monotonic', return_value=1061):
+            self.compute(1)
+        self.assertEqual(self.computed, [1, 1])
+
+    def test_failed_computation_is_not_cached(self):
+        @local_cache(timeout=60)
+        def fail(value):
+            self.computed.append(value)
+            raise ValueError
+
+        for index in range(2):
+            with self.assertRaises(ValueError):
+                fail(1)
+        self.assertEqual(self.computed, [1, 1])
+        self.assertEqual(fail.cache.key_locks, {})
+
+
+class LocalThrottleBackendTest(MTestCase):
+
+    def test_limit_is_kept_without_history(self):
+        backend = LocalThrottleBackend()
+        self.assertEqual([backend.hit('user', 2, 60)[0] for index in range(3)], [True, True, False])
+        allowed, wait = backend.hit('user', 2, 60)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 30, delta=1)
+        self.assertTrue(backend.hit('other user', 2, 60)[0])
+
+
+class QuerysetIteratorTest(MTestCase):
+
+    def test_keyset_chunks_and_ranges(self):
+        for index in range(5):
+            Product.objects.create(product_id='iterator-{}'.format(index), name='product {}'.format(index))
+        ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+
+        self.assertEqual([product.id for product in queryset_iterator(Product.objects.all(), 2)], ids)
+        self.assertEqual(list(queryset_iterator(Product.objects.all(), 2, key='-id', values=('name',))), [
+            ('product {}'.format(index),) for index in reversed(range(5))
+        ])
+
+        ranges = get_key_ranges(Product.objects.all(), 2)
+        self.assertEqual(len(ranges), 2)
+        self.assertEqual([
+            product_id for start, end in ranges
+            for product_id in queryset_iterator(Product.objects.all(), 2, values=('id',), start=start, end=end)
+        ], [(product_id,) for product_id in ids])
+
+
+class CommitBatchTest(MTestCase):
+
+    def test_values_are_passed_once_after_commit(self):
+        calls = []
+
+        def refresh(key, values):
+            calls.append((key, values))
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            add_to_commit_batch('test', refresh, 1, [1, 2])
+            add_to_commit_batch('test', refresh, 1, [2, 3])
+            add_to_commit_batch('test', refresh, 2, [4])
+            self.assertEqual(calls, [])
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(calls, [(1, {1, 2, 3}), (2, {4})])
+
+
+class ExportResponseTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for index in range(3):
+            Product.objects.create(
+                product_id='export-{}'.format(index), name='کالا {}'.format(index), price=index * 1000
+            )
+        self.rows = Product.objects.order_by('-id').values_list('name', 'price')
+
+    def test_xlsx_response(self):
+        response = get_xlsx_response('products', self.rows)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="products.xlsx"')
+
+        worksheet = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        self.assertTrue(worksheet.sheet_view.rightToLeft)
+        self.assertEqual([[cell.value for cell in row] for row in worksheet.iter_rows()], [
+            ['کالا {}'.format(index), index * 1000] for index in reversed(range(3))
+        ])
+        self.assertEqual([str(rule.sqref) for rule in worksheet.conditional_formatting], ['A1:B3'])
+
+    def test_csv_response(self):
+        response = get_csv_response('products', self.rows)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="products.csv"')
+
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(content.startswith('\ufeff'))
+        self.assertEqual([[name, Decimal(price)] for name, price in csv.reader(io.StringIO(content[1:]))], [
+            ['کالا {}'.format(index), index * 1000] for index in reversed(range(3))
+        ])
+
+
+class TokenSessionTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create(username='session', mobile_number=self.get_fake_phone_number())
+        self.token = Token.objects.create(user=self.user)
+        self.cache_key = TOKEN_SESSION_CACHE_KEY.format(self.token.key)
+
+    def set_created(self, seconds_ago):
+        created = datetime.datetime.now() - datetime.timedelta(seconds=seconds_ago)
+        Token.objects.filter(key=self.token.key).update(created=created)
+        return created
+
+    def set_last_seen(self, seconds_ago):
+        session = cache.get(self.cache_key)
+        session['last_seen'] = datetime.datetime.now() - datetime.timedelta(seconds=seconds_ago)
+        cache.set(self.cache_key, session)
+        return session['last_seen']
+
+    def authenticate(self):
+        authentication = TokenAuthSupportQueryString()
+        authentication.request = RequestFactory().get('/')
+        return authentication.authenticate_credentials(self.token.key)[0]
+
+    def test_expired_token_is_deleted(self):
+        self.set_created(settings.TOKEN_SESSION_EXPIRATION + 1)
+        self.assertIsNone(get_token_session_user(self.token.key))
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+
+    def test_last_seen_slides_in_cache(self):
+        self.assertEqual(get_token_session_user(self.token.key), self.user)
+
+        last_seen = self.set_last_seen(settings.TOKEN_SESSION_EXPIRATION - 60)
+        self.assertEqual(get_token_session_user(self.token.key), self.user)
+        self.assertGreater(cache.get(self.cache_key)['last_seen'], last_seen)
+
+        self.set_last_seen(settings.TOKEN_SESSION_EXPIRATION + 1)
+        self.assertIsNone(get_token_session_user(self.token.key))
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+
+    def test_created_is_written_after_threshold(self):
+        created = self.set_created(settings.TOKEN_SESSION_WRITE_THRESHOLD - 60)
+        get_token_session_user(self.token.key)
+        self.assertEqual(Token.objects.get(key=self.token.key).created, created)
+
+        cache.clear()
+        created = self.set_created(settings.TOKEN_SESSION_WRITE_THRESHOLD + 1)
+        get_token_session_user(self.token.key)
+        self.assertGreater(Token.objects.get(key=self.token.key).created, created)
+
+    def test_logout_ends_cached_session(self):
+        self.assertEqual(self.authenticate(), self.user)
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deactivated_user_ends_cached_session(self):
+        self.assertEqual(self.authenticate(), self.user)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
@@ -0,0 +1,141 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework import throttling
+
+# Generic cell rate algorithm (a token bucket kept as one timestamp): `tat` is the time the bucket gets full again,
+# every request moves it `period / limit` seconds forward and is refused if it would be more than `period` ahead
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local interval = period / tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+if new_tat - period > now then
+    return {0, tostring(new_tat - period - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, '0'}
+"""
+
+LOCAL_THROTTLE_KEYS_COUNT = 10000
+
+
+class RedisThrottleBackend:
+    """
+        Keeps one timestamp per key in redis, updated atomically by a script so workers share the limits
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.script = connection.register_script(GCRA_SCRIPT)
+
+    def get_key(self, key):
+        # not made by cache key function, limits must survive `bump_cache_generation`
+        return '{}:throttle:{}'.format(cache.key_prefix, key)
+
+    def hit(self, key, limit, period):
+        """
+            Counts a request of key, returns (allowed, seconds to wait for next allowed request)
+        """
+        try:
+            allowed, wait = self.script(keys=[self.get_key(key)], args=[time.time(), period, limit])
+        except RedisError:
+            return True, 0
+        return bool(allowed), float(wait)
+
+
+class LocalThrottleBackend:
+    """
+        Process local equivalent of `RedisThrottleBackend` for tests and caches other than redis,
+        keeps the last `LOCAL_THROTTLE_KEYS_COUNT` used keys
+    """
+
+    def __init__(self):
+        self.tats = OrderedDict()
+        self.lock = threading.Lock()
+
+    def hit(self, key, limit, period):
+        now = time.time()
+        with self.lock:
+            tat = max(self.tats.get(key, now), now)
+            new_tat = tat + period / limit
+            if new_tat - period > now:
+                return False, new_tat - period - now
+
+            self.tats[key] = new_tat
+            self.tats.move_to_end(key)
+            if len(self.tats) > LOCAL_THROTTLE_KEYS_COUNT:
+                self.tats.popitem(last=False)
+            return True, 0
+
+    def clear(self):
+        with self.lock:
+            self.tats.clear()
+
+
+_backends = {}
+
+
+def get_throttle_backend():
+    if 'default' not in _backends:
+        try:
+            _backends['default'] = RedisThrottleBackend(get_redis_connection('default'))
+        except NotImplementedError:
+            _backends['default'] = LocalThrottleBackend()
+    return _backends['default']
+
+
+class AtomicRateThrottleMixin:
+    """
+        Replaces request history list of `SimpleRateThrottle` by an O(1) state updated in one atomic step
+    """
+
+    def allow_request(self, request, view):
+        self.wait_time = None
+        if self.rate is None:
+            return True
+
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        # each throttle class keeps its own limit, DRF shares keys between classes of the same scope
+        key = '{}:{}'.format(type(self).__name__, key)
+        allowed, wait = get_throttle_backend().hit(key, self.num_requests, self.duration)
+        if not allowed:
+            self.wait_time = math.ceil(wait)
+        return allowed
+
+    def wait(self):
+        return self.wait_time
+
+
+class AnonRateThrottle(AtomicRateThrottleMixin, throttling.AnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(AtomicRateThrottleMixin, throttling.UserRateThrottle):
+    pass
+
+
+class ScopedRateThrottle(AtomicRateThrottleMixin, throttling.ScopedRateThrottle):
+
+    def allow_request(self, request, view):
+        # rate of scoped throttles is known after view, as in `throttling.ScopedRateThrottle.allow_request`
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            self.wait_time = None
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
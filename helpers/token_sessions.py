@@ -0,0 +1,74 @@
+import datetime
+from re import sub
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+
+TOKEN_SESSION_CACHE_KEY = 'token_session_{}'
+
+# cached sessions are rewritten at most once in this many seconds to slide their expiry
+TOKEN_SESSION_SLIDE_INTERVAL = 60
+
+
+def get_request_token_key(request):
+    header_token = request.META.get('HTTP_AUTHORIZATION', None)
+    if header_token:
+        return sub('Token ', '', header_token)
+    return request.GET.get('token', None)
+
+
+def delete_token_session(key):
+    cache.delete(TOKEN_SESSION_CACHE_KEY.format(key))
+
+
+def get_token_session_user(key):
+    """
+        Returns user of token, None if token does not exist or is expired
+
+        Sessions live in cache and their last seen time slides there, `Token.created` keeps the last seen time in
+        database and is only written when it is older than `TOKEN_SESSION_WRITE_THRESHOLD` seconds
+
+        Cached sessions keep a copy of user, they are dropped by `users.signals` when a token is deleted or its user
+        is saved. Bulk changes skip those signals, ex: `User.objects.update(is_active=False)` leaves users
+        authenticated until their sessions expire (`TOKEN_SESSION_EXPIRATION`), save users one by one or call
+        `delete_token_session` for their tokens
+    """
+    if not key:
+        return None
+
+    now = datetime.datetime.now()
+    cache_key = TOKEN_SESSION_CACHE_KEY.format(key)
+    session = cache.get(cache_key)
+    is_cached = session is not None
+
+    if not is_cached:
+        token = Token.objects.select_related('user').filter(key=key).first()
+        if token is None:
+            return None
+        session = {'user': token.user, 'created': token.created, 'last_seen': token.created}
+
+    if session['last_seen'] < now - datetime.timedelta(seconds=settings.TOKEN_SESSION_EXPIRATION):
+        Token.objects.filter(key=key).delete()
+        delete_token_session(key)
+        return None
+
+    if not is_cached or session['last_seen'] < now - datetime.timedelta(seconds=TOKEN_SESSION_SLIDE_INTERVAL):
+        session['last_seen'] = now
+        if session['created'] < now - datetime.timedelta(seconds=settings.TOKEN_SESSION_WRITE_THRESHOLD):
+            Token.objects.filter(key=key).update(created=now)
+            session['created'] = now
+        cache.set(cache_key, session, settings.TOKEN_SESSION_EXPIRATION)
+
+    return session['user']
+
+
+def get_request_token_user(request, key):
+    """
+        Shares the token lookup of a request between middlewares and authentication classes
+    """
+    token_session = getattr(request, '_token_session', None)
+    if token_session is None or token_session[0] != key:
+        token_session = (key, get_token_session_user(key))
+        request._token_session = token_session
+    return token_session[1]
@@ -0,0 +1,54 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from helpers.cache import get_cache_tags_version
+from helpers.memoize import get_or_compute
+
+
+class CachedResponseMixin:
+    """
+        Caches the rendered json of `list` (page included) and `retrieve`, so a hit does not touch the database
+
+        Keys are made of `CACHE_KEY`, url kwargs and query params, entries are dropped by
+        `helpers.cache.invalidate_cache_tags` on one of `CACHE_TAGS`. Expired responses are served for
+        `CACHE_STALE_TIMEOUT` more seconds while one worker renders them again (see `helpers.memoize.get_or_compute`)
+        Responses must not depend on the requesting user
+    """
+    CACHE_KEY = None
+    CACHE_TAGS = ()
+    CACHE_TIMEOUT = 60 * 10
+    CACHE_STALE_TIMEOUT = 60
+
+    def get_response_cache_key(self, request):
+        kwargs = ':'.join('{}={}'.format(key, value) for key, value in sorted(self.kwargs.items()))
+        query_params = urlencode(sorted(request.query_params.lists()), doseq=True)
+        return '{}:{}:{}:{}'.format(
+            self.CACHE_KEY,
+            get_cache_tags_version(self.CACHE_TAGS),
+            kwargs,
+            hashlib.md5(query_params.encode()).hexdigest()
+        )
+
+    def get_cached_response(self, request, get_response):
+        content = get_or_compute(
+            self.get_response_cache_key(request),
+            lambda: JSONRenderer().render(get_response().data),
+            self.CACHE_TIMEOUT,
+            self.CACHE_STALE_TIMEOUT
+        )
+        return HttpResponse(content, content_type='application/json')
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request,
+            lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request,
+            lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs)
+        )
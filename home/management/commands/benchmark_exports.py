@@ -0,0 +1,90 @@
+import datetime
+import multiprocessing
+import resource
+import time
+from decimal import Decimal
+from io import BytesIO
+
+import pandas
+from django.core.management import BaseCommand
+
+from helpers.exports import get_xlsx_response, get_csv_response
+
+
+def get_rows(count):
+    yield ['گزارش آزمایشی']
+    yield ['#', 'نام', 'کد', 'تاریخ', 'مبلغ', 'تعداد', 'توضیحات']
+    date = datetime.date(2024, 1, 1)
+    for i in range(count):
+        yield [
+            i + 1,
+            'کالای شماره {}'.format(i),
+            'P-{:08d}'.format(i),
+            date + datetime.timedelta(days=i % 365),
+            Decimal(i * 1000) / 3,
+            i % 50,
+            'توضیحات ردیف {} گزارش'.format(i),
+        ]
+
+
+def get_pandas_xlsx_content(count):
+    # previous `get_xlsx_response`: whole data in a list, a data frame and an in memory file
+    data = list(get_rows(count))
+    with BytesIO() as b:
+        writer = pandas.ExcelWriter(b, engine='xlsxwriter')
+        df = pandas.DataFrame(data)
+        df.to_excel(writer, sheet_name='Sheet1', index=False, header=False)
+        writer.sheets['Sheet1'].right_to_left()
+        writer.close()
+        return len(b.getvalue())
+
+
+def get_streaming_content_size(response):
+    size = 0
+    for block in response.streaming_content:
+        size += len(block)
+    response.close()
+    return size
+
+
+def get_streaming_xlsx_content(count):
+    return get_streaming_content_size(get_xlsx_response('benchmark', get_rows(count)))
+
+
+def get_streaming_csv_content(count):
+    return get_streaming_content_size(get_csv_response('benchmark', get_rows(count)))
+
+
+def measure(method, count, results):
+    started_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started_at = time.perf_counter()
+    size = method(count)
+    results.put((
+        time.perf_counter() - started_at,
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - started_rss,
+        size,
+    ))
+
+
+class Command(BaseCommand):
+    help = 'compare peak memory and time of in memory (pandas) and streaming xlsx/csv exports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        # each export runs in a forked process, peak RSS of a process never goes down
+        context = multiprocessing.get_context('fork')
+        for name, method in (
+                ('pandas xlsx', get_pandas_xlsx_content),
+                ('streaming xlsx', get_streaming_xlsx_content),
+                ('streaming csv', get_streaming_csv_content),
+        ):
+            results = context.Queue()
+            process = context.Process(target=measure, args=(method, options['rows'], results))
+            process.start()
+            duration, peak_rss, size = results.get()
+            process.join()
+            self.stdout.write('{}: {} rows in {:.2f} s, peak RSS +{:.1f} MB, file {:.1f} MB'.format(
+                name, options['rows'], duration, peak_rss / 1024, size / 1024 / 1024
+            ))
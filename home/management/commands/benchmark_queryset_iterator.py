@@ -0,0 +1,77 @@
+import gc
+import multiprocessing
+import time
+
+from django.apps import apps
+from django.core.management import BaseCommand
+from django.db import connections
+
+from helpers.db import queryset_iterator, get_key_ranges
+
+
+def offset_queryset_iterator(queryset, chunk_size=100):
+    # previous `queryset_iterator`: OFFSET chunks and a collection after each chunk
+    counter = 0
+    count = chunk_size
+    while count == chunk_size:
+        count = 0
+        for item in queryset.all().order_by('pk')[counter:counter + chunk_size]:
+            count += 1
+            yield item
+        counter += count
+        gc.collect()
+
+
+def count_range(model_label, key_range, chunk_size):
+    queryset = apps.get_model(model_label).objects.all()
+    return sum(1 for row in queryset_iterator(
+        queryset, chunk_size, values=('id',), start=key_range[0], end=key_range[1]
+    ))
+
+
+class Command(BaseCommand):
+    help = 'compare rows per second of offset and keyset queryset iterators on the first rows of a table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default='crm.ShopProductViewLog', help='app_label.ModelName')
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--skip-offset', action='store_true', help='offset iterator is quadratic on big tables')
+
+    def run(self, name, rows):
+        started_at = time.perf_counter()
+        count = sum(1 for row in rows)
+        duration = time.perf_counter() - started_at
+        self.stdout.write('{}: {} rows in {:.2f} s, {:.0f} rows/s'.format(name, count, duration, count / duration))
+
+    def handle(self, *args, **options):
+        model = apps.get_model(options['model'])
+        last_pk = model.objects.order_by('pk').values_list('pk', flat=True)[options['rows'] - 1:options['rows']].first()
+        queryset = model.objects.all()
+        if last_pk is not None:
+            queryset = queryset.filter(pk__lte=last_pk)
+        chunk_size = options['chunk_size']
+
+        if not options['skip_offset']:
+            self.run('offset, chunks of 100', offset_queryset_iterator(queryset))
+            self.run('offset', offset_queryset_iterator(queryset, chunk_size))
+        self.run('keyset', queryset_iterator(queryset, chunk_size))
+        self.run('keyset values', queryset_iterator(queryset, chunk_size, values=('id',)))
+        self.run('server side cursor', queryset_iterator(queryset, chunk_size, server_side=True))
+        self.run('server side cursor values', queryset_iterator(
+            queryset, chunk_size, values=('id',), server_side=True
+        ))
+
+        # forked processes must not share the connection of parent
+        key_ranges = get_key_ranges(queryset, options['processes'])
+        connections.close_all()
+        started_at = time.perf_counter()
+        with multiprocessing.get_context('fork').Pool(options['processes']) as pool:
+            count = sum(pool.starmap(count_range, [
+                (options['model'], key_range, chunk_size) for key_range in key_ranges
+            ]))
+        duration = time.perf_counter() - started_at
+        self.stdout.write('keyset values in {} processes: {} rows in {:.2f} s, {:.0f} rows/s'.format(
+            options['processes'], count, duration, count / duration
+        ))
@@ -0,0 +1,54 @@
+import time
+from types import SimpleNamespace
+
+from django.core.cache import cache
+from django.core.management import BaseCommand
+from rest_framework import throttling
+
+from helpers import throttling as atomic_throttling
+
+
+class Command(BaseCommand):
+    help = 'compare throttle overhead per request of request history lists and atomic throttle backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000)
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--rate', default='1000/min', help='limit of each user, ex: 1000/min')
+        parser.add_argument('--local', action='store_true', help='use process local throttle backend')
+
+    def get_throttle_class(self, base, rate):
+        return type('Benchmark{}'.format(base.__name__), (base,), {'rate': rate, 'scope': 'benchmark'})
+
+    def run(self, throttle_class, requests):
+        allowed = 0
+        started_at = time.perf_counter()
+        for request in requests:
+            if throttle_class().allow_request(request, None):
+                allowed += 1
+        return (time.perf_counter() - started_at) / len(requests), allowed
+
+    def handle(self, *args, **options):
+        users = [
+            SimpleNamespace(is_authenticated=True, pk=-index - 1) for index in range(options['users'])
+        ]
+        requests = [
+            SimpleNamespace(user=users[index % len(users)], META={'REMOTE_ADDR': '127.0.0.1'})
+            for index in range(options['requests'])
+        ]
+
+        if options['local']:
+            atomic_throttling._backends['default'] = atomic_throttling.LocalThrottleBackend()
+        backend = atomic_throttling.get_throttle_backend()
+        self.stdout.write('{} requests of {} users, rate {}, atomic backend {}'.format(
+            len(requests), len(users), options['rate'], type(backend).__name__
+        ))
+
+        for name, base in (
+                ('history list', throttling.UserRateThrottle),
+                ('atomic', atomic_throttling.UserRateThrottle),
+        ):
+            per_request, allowed = self.run(self.get_throttle_class(base, options['rate']), requests)
+            self.stdout.write('{}: {:.1f} µs per request, {} allowed'.format(name, per_request * 10 ** 6, allowed))
+
+        cache.delete_many(['throttle_benchmark_{}'.format(user.pk) for user in users])
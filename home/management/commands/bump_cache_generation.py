@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from helpers.cache import bump_cache_generation
+
+
+class Command(BaseCommand):
+    help = 'invalidate all cached data by bumping the shared cache generation'
+
+    def handle(self, *args, **options):
+        generation = bump_cache_generation()
+        self.stdout.write('cache generation: {}'.format(generation))
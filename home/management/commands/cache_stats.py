@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+
+from helpers.cache import get_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'print hit and miss counters of shared cache per key prefix'
+
+    def handle(self, *args, **options):
+        for prefix, stats in get_cache_stats().items():
+            self.stdout.write('{}: hits {} misses {} hit rate {}'.format(
+                prefix, stats['hits'], stats['misses'], stats['hit_rate']
+            ))
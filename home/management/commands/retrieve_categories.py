@@ -39,6 +39,7 @@ class Command(BaseCommand):
             Category.objects.bulk_create(categories)
             for category in Category.objects.exclude(parent_unique_code=0):
                 category.update(parent=Category.objects.get(unique_code=category.parent_unique_code))
+            Category.rebuild_paths()
 
 
 
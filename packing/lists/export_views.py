@@ -4,11 +4,6 @@ from packing.lists.views import OrderPackageWithoutAdminListView, WaitingForPack
     AffiliateAdminOrderPackagesReportListView
 from packing.models import OrderPackage
 from reports.lists.export_views import BaseExportView
-import pandas
-from io import BytesIO
-import xlsxwriter
-
-from django.http import HttpResponse
 import os
 import jdatetime
 from numpy import unique
@@ -22,6 +17,7 @@ class OrderWithoutAdminExportView(OrderPackageWithoutAdminListView, BaseExportVi
         'title': 'سفارش های در انتظار بسته بندی',
     }
     pagination_class = None
+    xlsx_data_per_form = False
 
     def get_queryset(self):
         return self.filterset_class(self.request.GET, queryset=super().get_queryset()).qs
@@ -45,55 +41,22 @@ class OrderWithoutAdminExportView(OrderPackageWithoutAdminListView, BaseExportVi
 
         return context
 
-    def xlsx_response(self, request, *args, **kwargs):
-        sheet_name = "{}.xlsx".format(self.filename)
-
-        with BytesIO() as b:
-            writer = pandas.ExcelWriter(b, engine='xlsxwriter')
-            data = []
-
-            bordered_rows = []
-            data += self.get_xlsx_data(self.get_context_data(user=request.user)['forms'])
-            df = pandas.DataFrame(data)
-            df.to_excel(
-                writer,
-                sheet_name=sheet_name,
-                index=False,
-                header=False
-            )
-            workbook = writer.book
-            worksheet = writer.sheets[sheet_name]
-            worksheet.right_to_left()
-
-            border_fmt = workbook.add_format({'bottom': 1, 'top': 1, 'left': 1, 'right': 1})
-
-            for bordered_row in bordered_rows:
-                worksheet.conditional_format(xlsxwriter.utility.xl_range(
-                    bordered_row[0], 0, bordered_row[1], len(df.columns) - 1
-                ), {'type': 'no_errors', 'format': border_fmt})
-            writer.save()
-            response = HttpResponse(b.getvalue(), content_type='application/vnd.ms-excel')
-            response['Content-Disposition'] = 'attachment; filename="{}"'.format(sheet_name)
-            return response
-
-
     @staticmethod
     def get_xlsx_data(order_packages: OrderPackage):
-        data = [
+        yield from [
             [
                 'سفارش های در انتظار بسته بندی'
             ],
             ['نام کسب و کار', 'نام مشتری', 'تلفن', 'آدرس', 'تعداد اقلام']
         ]
         for form in order_packages:
-            data.append([
+            yield [
                 form.business.name,
                 form.customer_name,
                 form.phone,
                 form.address,
                 form.products_quantity,
-            ])
-        return data
+            ]
 
 
 class AllOrdersWithoutAdminReportExportView(OrderPackageWithoutAdminListView, BaseExportView):
@@ -138,6 +101,7 @@ class WaitingForPackingOrdersExportView(WaitingForPackingOrdersListView, BaseExp
         'title': 'سفارش های بسته بندی نشده',
     }
     pagination_class = None
+    xlsx_data_per_form = False
 
     def get_queryset(self):
         return self.filterset_class(self.request.GET, queryset=super().get_queryset()).qs
@@ -161,55 +125,22 @@ class WaitingForPackingOrdersExportView(WaitingForPackingOrdersListView, BaseExp
 
         return context
 
-    def xlsx_response(self, request, *args, **kwargs):
-        sheet_name = "{}.xlsx".format(self.filename)
-
-        with BytesIO() as b:
-            writer = pandas.ExcelWriter(b, engine='xlsxwriter')
-            data = []
-
-            bordered_rows = []
-            data += self.get_xlsx_data(self.get_context_data(user=request.user)['forms'])
-            df = pandas.DataFrame(data)
-            df.to_excel(
-                writer,
-                sheet_name=sheet_name,
-                index=False,
-                header=False
-            )
-            workbook = writer.book
-            worksheet = writer.sheets[sheet_name]
-            worksheet.right_to_left()
-
-            border_fmt = workbook.add_format({'bottom': 1, 'top': 1, 'left': 1, 'right': 1})
-
-            for bordered_row in bordered_rows:
-                worksheet.conditional_format(xlsxwriter.utility.xl_range(
-                    bordered_row[0], 0, bordered_row[1], len(df.columns) - 1
-                ), {'type': 'no_errors', 'format': border_fmt})
-            writer.save()
-            response = HttpResponse(b.getvalue(), content_type='application/vnd.ms-excel')
-            response['Content-Disposition'] = 'attachment; filename="{}"'.format(sheet_name)
-            return response
-
-
     @staticmethod
     def get_xlsx_data(order_packages: OrderPackage):
-        data = [
+        yield from [
             [
                 'سفارش های بسته بندی نشده'
             ],
             ['نام کسب و کار', 'نام مشتری', 'تلفن', 'آدرس', 'تعداد اقلام']
         ]
         for form in order_packages:
-            data.append([
+            yield [
                 form.business.name,
                 form.customer_name,
                 form.phone,
                 form.address,
                 form.products_quantity,
-            ])
-        return data
+            ]
 
 
 class WaitingForPackingAllOrdersReportExportView(WaitingForPackingOrdersListView, BaseExportView):
@@ -253,6 +184,7 @@ class WaitingForShippingOrdersExportView(WaitingForShippingOrdersListView, BaseE
         'title': 'سفارش های پست  نشده',
     }
     pagination_class = None
+    xlsx_data_per_form = False
 
     def get_queryset(self):
         return self.filterset_class(self.request.GET, queryset=super().get_queryset()).qs
@@ -276,56 +208,23 @@ class WaitingForShippingOrdersExportView(WaitingForShippingOrdersListView, BaseE
 
         return context
 
-    def xlsx_response(self, request, *args, **kwargs):
-        sheet_name = "{}.xlsx".format(self.filename)
-
-        with BytesIO() as b:
-            writer = pandas.ExcelWriter(b, engine='xlsxwriter')
-            data = []
-
-            bordered_rows = []
-            data += self.get_xlsx_data(self.get_context_data(user=request.user)['forms'])
-            df = pandas.DataFrame(data)
-            df.to_excel(
-                writer,
-                sheet_name=sheet_name,
-                index=False,
-                header=False
-            )
-            workbook = writer.book
-            worksheet = writer.sheets[sheet_name]
-            worksheet.right_to_left()
-
-            border_fmt = workbook.add_format({'bottom': 1, 'top': 1, 'left': 1, 'right': 1})
-
-            for bordered_row in bordered_rows:
-                worksheet.conditional_format(xlsxwriter.utility.xl_range(
-                    bordered_row[0], 0, bordered_row[1], len(df.columns) - 1
-                ), {'type': 'no_errors', 'format': border_fmt})
-            writer.save()
-            response = HttpResponse(b.getvalue(), content_type='application/vnd.ms-excel')
-            response['Content-Disposition'] = 'attachment; filename="{}"'.format(sheet_name)
-            return response
-
-
     @staticmethod
     def get_xlsx_data(order_packages: OrderPackage):
-        data = [
+        yield from [
             [
                 'سفارش های پست  نشده'
             ],
             ['نام کسب و کار', 'نام مشتری', 'تلفن', 'آدرس', 'تعداد اقلام', 'زمان بسته بندی']
         ]
         for form in order_packages:
-            data.append([
+            yield [
                 form.business.name,
                 form.customer_name,
                 form.phone,
                 form.address,
                 form.products_quantity,
                 form.packing_data_time,
-            ])
-        return data
+            ]
 
 
 class WaitingForShippingAllOrdersReportExportView(WaitingForShippingOrdersListView, BaseExportView):
@@ -368,6 +267,7 @@ class AdminPackingReportExportView(AdminPackingReportListView, BaseExportView):
         'title': 'گزارش بسته بندی های ادمین',
     }
     pagination_class = None
+    xlsx_data_per_form = False
 
     def get_queryset(self):
         return self.filterset_class(self.request.GET, queryset=super().get_queryset()).qs
@@ -391,48 +291,16 @@ class AdminPackingReportExportView(AdminPackingReportListView, BaseExportView):
 
         return context
 
-    def xlsx_response(self, request, *args, **kwargs):
-        sheet_name = "{}.xlsx".format(self.filename)
-
-        with BytesIO() as b:
-            writer = pandas.ExcelWriter(b, engine='xlsxwriter')
-            data = []
-
-            bordered_rows = []
-            data += self.get_xlsx_data(self.get_context_data(user=request.user)['forms'])
-            df = pandas.DataFrame(data)
-            df.to_excel(
-                writer,
-                sheet_name=sheet_name,
-                index=False,
-                header=False
-            )
-            workbook = writer.book
-            worksheet = writer.sheets[sheet_name]
-            worksheet.right_to_left()
-
-            border_fmt = workbook.add_format({'bottom': 1, 'top': 1, 'left': 1, 'right': 1})
-
-            for bordered_row in bordered_rows:
-                worksheet.conditional_format(xlsxwriter.utility.xl_range(
-                    bordered_row[0], 0, bordered_row[1], len(df.columns) - 1
-                ), {'type': 'no_errors', 'format': border_fmt})
-            writer.save()
-            response = HttpResponse(b.getvalue(), content_type='application/vnd.ms-excel')
-            response['Content-Disposition'] = 'attachment; filename="{}"'.format(sheet_name)
-            return response
-
-
     @staticmethod
     def get_xlsx_data(order_packages: OrderPackage):
-        data = [
+        yield from [
             [
                 'گزارش بسته بندی های ادمین'
             ],
             ['نام کسب و کار', 'نام مشتری', 'تلفن', 'آدرس', 'تعداد اقلام', 'زمان بسته بندی', 'زمان پست']
         ]
         for form in order_packages:
-            data.append([
+            yield [
                 form.business.name,
                 form.customer_name,
                 form.phone,
@@ -440,8 +308,7 @@ class AdminPackingReportExportView(AdminPackingReportListView, BaseExportView):
                 form.products_quantity,
                 form.packing_data_time,
                 form.shipping_data_time,
-            ])
-        return data
+            ]
 
 
 class AdminPackingAllOrdersReportExportView(AdminPackingReportListView, BaseExportView):
@@ -519,6 +386,7 @@ class AffiliateAdminOrderPackagesReportExportView(AffiliateAdminOrderPackagesRep
         'title': 'گزارش  سفارشات',
     }
     pagination_class = None
+    xlsx_data_per_form = False
 
     def get_queryset(self):
         return self.filterset_class(self.request.GET, queryset=super().get_queryset()).qs
@@ -542,48 +410,16 @@ class AffiliateAdminOrderPackagesReportExportView(AffiliateAdminOrderPackagesRep
 
         return context
 
-    def xlsx_response(self, request, *args, **kwargs):
-        sheet_name = "{}.xlsx".format(self.filename)
-
-        with BytesIO() as b:
-            writer = pandas.ExcelWriter(b, engine='xlsxwriter')
-            data = []
-
-            bordered_rows = []
-            data += self.get_xlsx_data(self.get_context_data(user=request.user)['forms'])
-            df = pandas.DataFrame(data)
-            df.to_excel(
-                writer,
-                sheet_name=sheet_name,
-                index=False,
-                header=False
-            )
-            workbook = writer.book
-            worksheet = writer.sheets[sheet_name]
-            worksheet.right_to_left()
-
-            border_fmt = workbook.add_format({'bottom': 1, 'top': 1, 'left': 1, 'right': 1})
-
-            for bordered_row in bordered_rows:
-                worksheet.conditional_format(xlsxwriter.utility.xl_range(
-                    bordered_row[0], 0, bordered_row[1], len(df.columns) - 1
-                ), {'type': 'no_errors', 'format': border_fmt})
-            writer.save()
-            response = HttpResponse(b.getvalue(), content_type='application/vnd.ms-excel')
-            response['Content-Disposition'] = 'attachment; filename="{}"'.format(sheet_name)
-            return response
-
-
     @staticmethod
     def get_xlsx_data(order_packages: OrderPackage):
-        data = [
+        yield from [
             [
                 'گزارش  سفارشات'
             ],
             ['نام کسب و کار', 'نام مشتری', 'تلفن', 'آدرس', 'تعداد اقلام', 'زمان بسته بندی', 'زمان پست']
         ]
         for form in order_packages:
-            data.append([
+            yield [
                 form.business.name,
                 form.customer_name,
                 form.phone,
@@ -591,6 +427,5 @@ class AffiliateAdminOrderPackagesReportExportView(AffiliateAdminOrderPackagesRep
                 form.products_quantity,
                 form.packing_data_time,
                 form.shipping_data_time,
-            ])
-        return data
+            ]
 
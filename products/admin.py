@@ -2,7 +2,7 @@ from django.contrib import admin
 
 from products.models import Brand, Avail, ProductProperty, Category, Product, ProductGallery, ProductInventory, \
     ProductPrice, ProductPriceHistory, ProductInventoryHistory, ProductPropertyTerm, ProductAttribute, \
-    ProductAttributeTerm
+    ProductAttributeTerm, ProductActiveOffer
 
 admin.site.register(Avail)
 admin.site.register(ProductProperty)
@@ -41,3 +41,8 @@ class ProductInventoryHistoryAdmin(admin.ModelAdmin):
     list_display = ['inventory', 'previous_quantity', 'new_quantity', 'timestamp', 'changed_by']
     list_filter = ['inventory', 'timestamp', 'changed_by']
     search_fields = ['inventory']
+
+
+@admin.register(ProductActiveOffer)
+class ProductActiveOfferAdmin(admin.ModelAdmin):
+    list_display = ['product', 'offer_display', 'effective_price', 'valid_from', 'valid_to', 'last_updated']
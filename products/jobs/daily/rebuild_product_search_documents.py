@@ -0,0 +1,10 @@
+from django_extensions.management.jobs import DailyJob
+
+from products.models import ProductSearchDocument
+
+
+class Job(DailyJob):
+    help = "Rebuild search documents of every product, changes are picked up by signals during the day"
+
+    def execute(self):
+        ProductSearchDocument.refresh()
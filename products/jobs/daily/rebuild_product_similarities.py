@@ -0,0 +1,10 @@
+from django_extensions.management.jobs import DailyJob
+
+from products.models import ProductSimilarity
+
+
+class Job(DailyJob):
+    help = "Rebuild similar products of every product, co-views are only picked up here"
+
+    def execute(self):
+        ProductSimilarity.refresh()
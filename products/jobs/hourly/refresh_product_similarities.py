@@ -0,0 +1,10 @@
+from django_extensions.management.jobs import HourlyJob
+
+from products.models import ProductSimilarity
+
+
+class Job(HourlyJob):
+    help = "Recompute similar products of products changed since the last refresh"
+
+    def execute(self):
+        ProductSimilarity.refresh_changed()
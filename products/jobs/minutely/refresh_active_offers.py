@@ -0,0 +1,14 @@
+from django_extensions.management.jobs import MinutelyJob
+
+from helpers.cache import invalidate_cache_tags
+from products.models import ProductActiveOffer
+from products.signals import PRODUCTS_CACHE_TAG
+
+
+class Job(MinutelyJob):
+    help = "Refresh products active offer snapshots when offer windows open or close"
+
+    def execute(self):
+        # closed offers are deleted with signals, opened ones are inserted in bulk
+        if ProductActiveOffer.refresh():
+            invalidate_cache_tags(PRODUCTS_CACHE_TAG)
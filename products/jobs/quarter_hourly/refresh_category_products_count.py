@@ -0,0 +1,13 @@
+from django_extensions.management.jobs import QuarterHourlyJob
+
+from helpers.cache import invalidate_cache_tags
+from products.models import Category
+from products.signals import CATEGORIES_CACHE_TAG
+
+
+class Job(QuarterHourlyJob):
+    help = "Recount published products of every category for menus"
+
+    def execute(self):
+        Category.refresh_published_products_count()
+        invalidate_cache_tags(CATEGORIES_CACHE_TAG)
@@ -0,0 +1,10 @@
+from django_extensions.management.jobs import QuarterHourlyJob
+
+from products.models import ProductViewCount
+
+
+class Job(QuarterHourlyJob):
+    help = "Add new product views to view counters and recount their day, week and month windows"
+
+    def execute(self):
+        ProductViewCount.refresh()
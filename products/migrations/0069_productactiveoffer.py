@@ -0,0 +1,29 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0019_auto_20250513_1455'),
+        ('products', '0068_alter_brand_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductActiveOffer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('offer_amount', models.DecimalField(decimal_places=6, default=0, max_digits=24)),
+                ('effective_price', models.DecimalField(decimal_places=6, default=0, max_digits=24)),
+                ('offer_display', models.CharField(blank=True, max_length=150, null=True)),
+                ('valid_from', models.DateTimeField(blank=True, null=True)),
+                ('valid_to', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('offer_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shop.limitedtimeofferitems')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='active_offer', to='products.product')),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0069_productactiveoffer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField(default=0)),
+                ('last_updated', models.DateTimeField(db_index=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='products.product')),
+                ('similar_product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='products.product')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='productsimilarity',
+            index=models.Index(fields=['product', '-score'], name='product_similarity_score_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='productsimilarity',
+            unique_together={('product', 'similar_product')},
+        ),
+    ]
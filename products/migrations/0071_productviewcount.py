@@ -0,0 +1,37 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_product_view_counts(apps, schema_editor):
+    # views logged before are counted by the first `ProductViewCount.refresh`
+    Product = apps.get_model('products', 'Product')
+    ProductViewCount = apps.get_model('products', 'ProductViewCount')
+    ProductViewCount.objects.bulk_create([
+        ProductViewCount(product_id=product_id) for product_id in Product.objects.values_list('id', flat=True)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0070_auto_20261018_1828'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductViewCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField(db_index=True, default=0)),
+                ('day', models.PositiveIntegerField(default=0)),
+                ('week', models.PositiveIntegerField(default=0)),
+                ('month', models.PositiveIntegerField(db_index=True, default=0)),
+                ('last_view_log_id', models.BigIntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='view_counter', to='products.product')),
+            ],
+        ),
+        migrations.RunPython(create_product_view_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:36
+
+from django.db import migrations, models
+from django.db.models import F, Func, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_category_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def get_path(category_id):
+        if category_id not in paths:
+            parent_id = parents[category_id]
+            paths[category_id] = '{}{}/'.format(get_path(parent_id) if parent_id else '', category_id)
+        return paths[category_id]
+
+    categories = list(Category.objects.only('id', 'path'))
+    for category in categories:
+        category.path = get_path(category.id)
+    Category.objects.bulk_update(categories, ['path'], batch_size=500)
+
+
+def count_published_products(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    Product = apps.get_model('products', 'Product')
+    products_count = Product.category.through.objects.filter(
+        category__path__startswith=OuterRef('path'),
+        product__status='publish',
+    ).values(count=Func(F('product_id'), function='COUNT', template='%(function)s(DISTINCT %(expressions)s)'))
+    Category.objects.update(published_products_count=Coalesce(Subquery(products_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0071_productviewcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='published_products_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_category_paths, migrations.RunPython.noop),
+        migrations.RunPython(count_published_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:38
+
+from django.contrib.postgres.operations import TrigramExtension
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0072_category_path'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.TextField(default='')),
+                ('keywords', models.TextField(default='')),
+                ('properties', models.TextField(default='')),
+                ('summary', models.TextField(default='')),
+                ('document', models.TextField(default='')),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='products.product')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='productsearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productsearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['document'], name='product_search_document_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0073_productsearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['status', 'price', 'id'], name='product_status_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='product_status_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productviewcount',
+            index=models.Index(fields=['total', 'product'], name='product_view_count_total_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:21
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_settled_totals(apps, schema_editor):
+    # totals counted so far are settled up to `last_view_log_id`
+    ProductViewCount = apps.get_model('products', 'ProductViewCount')
+    ProductViewCount.objects.update(settled_total=F('total'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0075_product_barcode_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productviewcount',
+            name='settled_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_settled_totals, migrations.RunPython.noop),
+    ]
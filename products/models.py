@@ -3,12 +3,17 @@ import random
 from decimal import Decimal
 
 from dateutil.relativedelta import relativedelta
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField, SearchVector
 from django.core.exceptions import ValidationError
 
 from django.db import models, transaction
-from django.db.models import IntegerField, F, Sum, Q, Avg
+from django.db.models import IntegerField, F, Sum, Q, Avg, Max, Count, OuterRef, Subquery, Func, Value
+from django.db.models.functions import Concat, Substr, Coalesce
 
+from crm.models import ShopProductViewLog
 from entrance.models import StoreReceiptItem
+from helpers.db import queryset_chunks
 from helpers.functions import change_to_num
 from helpers.models import BaseModel, DECIMAL, EXPLANATION
 from main.models import Supplier, Currency, Business
@@ -123,6 +128,10 @@ class Category(BaseModel):
     name = models.CharField(max_length=255)
     parent = models.ForeignKey('self', on_delete=models.PROTECT, related_name='children', blank=True, null=True)
     picture = models.ImageField(upload_to=custom_upload_to, null=True, blank=True, default=None)
+    # ids of ancestors and itself, ex: `1/5/12/`, maintained by `save`
+    path = models.CharField(max_length=255, db_index=True, default='', blank=True)
+    # published products of category and its descendants
+    published_products_count = models.PositiveIntegerField(default=0)
 
     class Meta(BaseModel.Meta):
         verbose_name = 'Category'
@@ -138,21 +147,84 @@ class Category(BaseModel):
             ('deleteOwn.category', 'حذف دسته بندی خود'),
         )
 
+    @staticmethod
+    def get_path_ids(path):
+        return [int(category_id) for category_id in path.split('/') if category_id]
+
+    @property
+    def ancestor_ids(self):
+        return self.get_path_ids(self.path)[:-1]
+
+    def get_ancestors(self):
+        return sorted(Category.objects.filter(id__in=self.ancestor_ids), key=lambda category: len(category.path))
+
     def get_all_descendants(self):
-        descendants = []
-        children = Category.objects.filter(parent=self)
-        for child in children:
-            descendants.append(child)
-            descendants.extend(child.get_all_descendants())  # Recursive call to fetch all nested children
-        return descendants
+        if not self.path:
+            return []
+        return list(Category.objects.filter(path__startswith=self.path).exclude(pk=self.pk))
 
     def __str__(self):
-        names = [self.name]
-        parent = self.parent
-        while parent:
-            names.append(parent.name)
-            parent = parent.parent
-        return " > ".join(reversed(names))
+        names = [ancestor.name for ancestor in self.get_ancestors()] if self.path else []
+        names.append(self.name)
+        return " > ".join(names)
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            parent_path = ''
+            if self.parent_id:
+                parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first()
+            if self.pk and '/{}/'.format(self.pk) in '/' + parent_path:
+                raise ValidationError('دسته بندی نمی تواند زیر مجموعه خودش باشد')
+
+            old_path = Category.objects.filter(pk=self.pk).values_list('path', flat=True).first() if self.pk else ''
+            super().save(*args, **kwargs)
+
+            path = '{}{}/'.format(parent_path, self.pk)
+            if path != old_path:
+                Category.objects.filter(pk=self.pk).update(path=path)
+                self.path = path
+
+                if old_path:
+                    Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                        path=Concat(Value(path), Substr('path', len(old_path) + 1))
+                    )
+                    Category.refresh_published_products_count(
+                        set(self.get_path_ids(old_path) + self.get_path_ids(path)) - {self.pk}
+                    )
+
+    @classmethod
+    def rebuild_paths(cls):
+        """
+        Recompute paths of every category, used after `bulk_create` and `update` which skip `save`
+        """
+        parents = dict(cls.objects.values_list('id', 'parent_id'))
+        paths = {}
+
+        def get_path(category_id):
+            if category_id not in paths:
+                parent_id = parents[category_id]
+                paths[category_id] = '{}{}/'.format(get_path(parent_id) if parent_id else '', category_id)
+            return paths[category_id]
+
+        categories = list(cls.objects.only('id', 'path'))
+        for category in categories:
+            category.path = get_path(category.id)
+        cls.objects.bulk_update(categories, ['path'], batch_size=500)
+
+    @classmethod
+    def refresh_published_products_count(cls, category_ids=None):
+        """
+        Recount published products of categories and their descendants, pass None to recount every category
+        """
+        products_count = Product.category.through.objects.filter(
+            category__path__startswith=OuterRef('path'),
+            product__status=Product.PUBLISHED,
+        ).values(count=Func(F('product_id'), function='COUNT', template='%(function)s(DISTINCT %(expressions)s)'))
+
+        categories = cls.objects.all()
+        if category_ids is not None:
+            categories = categories.filter(id__in=category_ids)
+        categories.update(published_products_count=Coalesce(Subquery(products_count), 0))
 
 
 class Product(BaseModel):
@@ -336,53 +408,34 @@ class Product(BaseModel):
             return self.current_price.price
         raise ValueError(f"برای کالای {self.name} قیمت ثبت نشده")
 
+    @property
+    def current_offer(self):
+        active_offer = getattr(self, 'active_offer', None)
+        if active_offer and active_offer.is_valid:
+            return active_offer
+        return None
+
     @property
     def effective_price(self):
-        price = self.final_price
-        now = datetime.datetime.now()
-        offer = LimitedTimeOfferItems.objects.filter(
-            Q(product=self) &
-            Q(limited_time_offer__is_active=True) &
-            Q(limited_time_offer__from_date_time__gte=now) &
-            Q(limited_time_offer__to_date_time__lte=now)
-        ).first()
+        offer = self.current_offer
         if offer:
-            effective_price = price - offer.offer_amount
-            return effective_price if effective_price > 0 else Decimal('0.00')
-        return price
+            return offer.effective_price
+        return self.final_price
 
     @property
     def has_offer(self):
-        now = datetime.datetime.now()
-        return LimitedTimeOfferItems.objects.filter(
-            Q(product=self) &
-            Q(limited_time_offer__is_active=True) &
-            Q(limited_time_offer__from_date_time__gte=now) &
-            Q(limited_time_offer__to_date_time__lte=now)
-        ).exists()
+        return self.current_offer is not None
 
     @property
     def offer_amount(self):
-        now = datetime.datetime.now()
-        offer = LimitedTimeOfferItems.objects.filter(
-            Q(product=self) &
-            Q(limited_time_offer__is_active=True) &
-            Q(limited_time_offer__from_date_time__gte=now) &
-            Q(limited_time_offer__to_date_time__lte=now)
-        ).first()
+        offer = self.current_offer
         if offer:
             return offer.offer_amount
         return 0
 
     @property
     def offer_display(self):
-        now = datetime.datetime.now()
-        offer = LimitedTimeOfferItems.objects.filter(
-            Q(product=self) &
-            Q(limited_time_offer__is_active=True) &
-            Q(limited_time_offer__from_date_time__gte=now) &
-            Q(limited_time_offer__to_date_time__lte=now)
-        ).first()
+        offer = self.current_offer
         if offer:
             return offer.offer_display
         return None
@@ -410,6 +463,11 @@ class Product(BaseModel):
             ('updateOwn.product', 'ویرایش محصول خود'),
             ('deleteOwn.product', 'حذف محصول خود'),
         )
+        indexes = [
+            models.Index(fields=['status', 'price', 'id'], name='product_status_price_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='product_status_created_at_idx'),
+            models.Index(fields=['barcode'], name='product_barcode_idx'),
+        ]
 
     def __str__(self):
         if self.product_type == self.SIMPLE:
@@ -649,6 +707,336 @@ class ProductPrice(models.Model):
             )
 
 
+class ProductActiveOffer(models.Model):
+    product = models.OneToOneField(Product, related_name='active_offer', on_delete=models.CASCADE)
+    offer_item = models.ForeignKey(LimitedTimeOfferItems, related_name='+', on_delete=models.SET_NULL,
+                                   blank=True, null=True)
+    offer_amount = DECIMAL()
+    effective_price = DECIMAL()
+    offer_display = models.CharField(max_length=150, blank=True, null=True)
+    valid_from = models.DateTimeField(blank=True, null=True)
+    valid_to = models.DateTimeField(blank=True, null=True, db_index=True)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return '{} {}'.format(self.product.name, self.offer_display)
+
+    @property
+    def is_valid(self):
+        now = datetime.datetime.now()
+        if self.valid_from and self.valid_from > now:
+            return False
+        if self.valid_to and self.valid_to < now:
+            return False
+        return True
+
+    def set_offer(self, offer_item, now):
+        product = offer_item.product
+        price = product.current_price.price if hasattr(product, 'current_price') else Decimal('0.00')
+        offer_amount = offer_item.offer_amount
+        effective_price = price - offer_amount
+
+        self.offer_item = offer_item
+        self.offer_amount = offer_amount
+        self.effective_price = effective_price if effective_price > 0 else Decimal('0.00')
+        self.offer_display = offer_item.offer_display
+        self.valid_from = offer_item.limited_time_offer.from_date_time
+        self.valid_to = offer_item.limited_time_offer.to_date_time
+        self.last_updated = now
+
+    @classmethod
+    def refresh(cls, product_ids=None):
+        """
+        Resolve the running offer of products into their snapshot rows, pass None to refresh every product
+        Returns count of created snapshots, they are inserted in bulk without signals
+        """
+        now = datetime.datetime.now()
+        offer_items = LimitedTimeOfferItems.objects.filter(
+            Q(limited_time_offer__is_active=True) &
+            Q(limited_time_offer__from_date_time__lte=now) &
+            Q(limited_time_offer__to_date_time__gte=now)
+        ).select_related('limited_time_offer', 'product', 'product__current_price').order_by('-pk')
+        snapshots = cls.objects.all()
+
+        if product_ids is not None:
+            offer_items = offer_items.filter(product_id__in=product_ids)
+            snapshots = snapshots.filter(product_id__in=product_ids)
+
+        resolved_offers = {}
+        for offer_item in offer_items:
+            resolved_offers.setdefault(offer_item.product_id, offer_item)
+
+        with transaction.atomic():
+            snapshots.exclude(product_id__in=resolved_offers.keys()).delete()
+
+            existing_snapshots = cls.objects.in_bulk(resolved_offers.keys(), field_name='product_id')
+            snapshots_to_create = []
+            snapshots_to_update = []
+            for product_id, offer_item in resolved_offers.items():
+                snapshot = existing_snapshots.get(product_id)
+                if snapshot:
+                    snapshots_to_update.append(snapshot)
+                else:
+                    snapshot = cls(product_id=product_id)
+                    snapshots_to_create.append(snapshot)
+                snapshot.set_offer(offer_item, now)
+
+            cls.objects.bulk_create(snapshots_to_create, batch_size=100)
+            cls.objects.bulk_update(snapshots_to_update, [
+                'offer_item', 'offer_amount', 'effective_price', 'offer_display', 'valid_from', 'valid_to',
+                'last_updated'
+            ], batch_size=100)
+        return len(snapshots_to_create)
+
+
+class ProductViewCount(models.Model):
+    # views logged in the last ids may belong to transactions not committed yet, they are recounted on every refresh
+    VIEW_LOG_SETTLE_WINDOW = 10000
+
+    product = models.OneToOneField(Product, related_name='view_counter', on_delete=models.CASCADE)
+    total = models.PositiveIntegerField(default=0, db_index=True)
+    settled_total = models.PositiveIntegerField(default=0)
+    day = models.PositiveIntegerField(default=0)
+    week = models.PositiveIntegerField(default=0)
+    month = models.PositiveIntegerField(default=0, db_index=True)
+    last_view_log_id = models.BigIntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['total', 'product'], name='product_view_count_total_idx'),
+        ]
+
+    def __str__(self):
+        return '{} {}'.format(self.product_id, self.total)
+
+    @staticmethod
+    def count_views(first_id, last_id):
+        return dict(ShopProductViewLog.objects.filter(
+            id__gt=first_id,
+            id__lte=last_id
+        ).order_by().values('product_id').annotate(count=Count('id')).values_list('product_id', 'count'))
+
+    @classmethod
+    def refresh(cls):
+        """
+        Add settled views to `settled_total`, set totals to it plus views of the settle window and recount day, week
+        and month windows
+        Views up to `last_view_log_id` are settled, the last `VIEW_LOG_SETTLE_WINDOW` log ids are counted again on
+        every refresh so views committed late are not skipped
+        """
+        now = datetime.datetime.now()
+
+        cls.objects.bulk_create([
+            cls(product_id=product_id)
+            for product_id in Product.objects.filter(view_counter__isnull=True).values_list('id', flat=True)
+        ], batch_size=1000, ignore_conflicts=True)
+
+        last_view_log_id = cls.objects.aggregate(last_id=Max('last_view_log_id'))['last_id'] or 0
+        view_log_id = ShopProductViewLog.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        settled_view_log_id = max(last_view_log_id, view_log_id - cls.VIEW_LOG_SETTLE_WINDOW)
+
+        settled_views = cls.count_views(last_view_log_id, settled_view_log_id)
+        pending_views = cls.count_views(settled_view_log_id, view_log_id)
+
+        window_views = {
+            item['product_id']: item for item in ShopProductViewLog.objects.filter(
+                created_at__gte=now - datetime.timedelta(days=30)
+            ).order_by().values('product_id').annotate(
+                day=Count('id', filter=Q(created_at__gte=now - datetime.timedelta(days=1))),
+                week=Count('id', filter=Q(created_at__gte=now - datetime.timedelta(days=7))),
+                month=Count('id'),
+            )
+        }
+
+        with transaction.atomic():
+            counters = cls.objects.select_for_update().filter(
+                Q(product_id__in=settled_views.keys()) | Q(product_id__in=pending_views.keys()) |
+                Q(product_id__in=window_views.keys()) | Q(month__gt=0) | ~Q(total=F('settled_total'))
+            )
+            changed_counters = []
+            for counter in counters:
+                views = window_views.get(counter.product_id, {})
+                settled_total = counter.settled_total + settled_views.get(counter.product_id, 0)
+                total = settled_total + pending_views.get(counter.product_id, 0)
+                if (counter.total, counter.settled_total, counter.day, counter.week, counter.month) == (
+                        total, settled_total, views.get('day', 0), views.get('week', 0), views.get('month', 0)
+                ):
+                    continue
+
+                counter.settled_total = settled_total
+                counter.total = total
+                counter.last_view_log_id = settled_view_log_id
+                counter.day = views.get('day', 0)
+                counter.week = views.get('week', 0)
+                counter.month = views.get('month', 0)
+                counter.last_updated = now
+                changed_counters.append(counter)
+
+            cls.objects.bulk_update(changed_counters, [
+                'total', 'settled_total', 'day', 'week', 'month', 'last_view_log_id', 'last_updated'
+            ], batch_size=1000)
+
+
+class ProductSimilarity(models.Model):
+    product = models.ForeignKey(Product, related_name='similarities', on_delete=models.CASCADE)
+    similar_product = models.ForeignKey(Product, related_name='similar_to', on_delete=models.CASCADE)
+    score = models.PositiveIntegerField(default=0)
+    last_updated = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('product', 'similar_product')
+        indexes = [
+            models.Index(fields=['product', '-score'], name='product_similarity_score_idx'),
+        ]
+
+    def __str__(self):
+        return '{} - {} ({})'.format(self.product_id, self.similar_product_id, self.score)
+
+    @classmethod
+    def refresh(cls, product_ids=None):
+        """
+        Recompute similar products of products, pass None to rebuild every product
+        Products that are or will be similar to the given products are recomputed too
+        """
+        from products.similarity import ProductSimilarityIndex
+
+        now = datetime.datetime.now()
+        index = ProductSimilarityIndex(
+            Product.objects.filter(status=Product.PUBLISHED).values_list('id', flat=True)
+        )
+        similar_products = {}
+
+        if product_ids is None:
+            rows = cls.objects.all()
+            refresh_ids = index.product_ids
+        else:
+            refresh_ids = set(product_ids)
+            refresh_ids.update(cls.objects.filter(
+                similar_product_id__in=product_ids
+            ).values_list('product_id', flat=True))
+            for product_id in product_ids:
+                if product_id in index.product_ids:
+                    similar_products[product_id] = index.get_similar_products(product_id)
+                    refresh_ids.update(similar_product_id for similar_product_id, score in similar_products[product_id])
+            rows = cls.objects.filter(product_id__in=refresh_ids)
+
+        with transaction.atomic():
+            rows.delete()
+
+            similarities = []
+            for product_id in refresh_ids:
+                if product_id not in index.product_ids:
+                    continue
+                if product_id not in similar_products:
+                    similar_products[product_id] = index.get_similar_products(product_id)
+
+                similarities.extend(
+                    cls(product_id=product_id, similar_product_id=similar_product_id, score=score, last_updated=now)
+                    for similar_product_id, score in similar_products.pop(product_id)
+                )
+                if len(similarities) >= 1000:
+                    cls.objects.bulk_create(similarities)
+                    similarities = []
+
+            cls.objects.bulk_create(similarities)
+
+    @classmethod
+    def refresh_changed(cls):
+        """
+        Recompute products created or updated since the last refresh, rebuilds every product on first run
+        """
+        last_refresh = cls.objects.aggregate(last_refresh=Max('last_updated'))['last_refresh']
+        if last_refresh is None:
+            cls.refresh()
+            return
+
+        product_ids = list(Product.objects.filter(
+            Q(created_at__gte=last_refresh) | Q(updated_at__gte=last_refresh)
+        ).values_list('id', flat=True))
+        if product_ids:
+            cls.refresh(product_ids)
+
+
+class ProductSearchDocument(models.Model):
+    """
+        Persian normalized texts of product kept for `products.search.search_products`
+        `document` is name, keywords and properties together and is matched by trigram for typos
+    """
+    product = models.OneToOneField(Product, related_name='search_document', on_delete=models.CASCADE)
+    name = models.TextField(default='')
+    # brand and categories
+    keywords = models.TextField(default='')
+    properties = models.TextField(default='')
+    summary = models.TextField(default='')
+    document = models.TextField(default='')
+    search_vector = SearchVectorField(null=True)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            GinIndex(fields=['document'], name='product_search_document_idx', opclasses=['gin_trgm_ops']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def set_document(self, product):
+        from products.search import normalize_persian
+
+        self.name = normalize_persian(product.name)
+        self.keywords = normalize_persian(' '.join(
+            ([product.brand.name] if product.brand else []) + [category.name for category in product.category.all()]
+        ))
+        self.properties = normalize_persian(' '.join(item.name for item in product.properties.all()))
+        self.summary = normalize_persian(product.summary_explanation)
+        self.document = ' '.join(text for text in (self.name, self.keywords, self.properties) if text)
+
+    @classmethod
+    def refresh(cls, product_ids=None):
+        """
+        Rebuild search documents of products, pass None to rebuild every product
+        """
+        from products.search import SEARCH_CONFIG
+
+        products = Product.objects.select_related('brand').prefetch_related('category', 'properties').order_by('id')
+        if product_ids is not None:
+            products = products.filter(id__in=product_ids)
+
+        search_vector = (
+            SearchVector('name', weight='A', config=SEARCH_CONFIG) +
+            SearchVector('keywords', weight='B', config=SEARCH_CONFIG) +
+            SearchVector('properties', weight='C', config=SEARCH_CONFIG) +
+            SearchVector('summary', weight='D', config=SEARCH_CONFIG)
+        )
+
+        for chunk in queryset_chunks(products, 500, key='id'):
+            chunk_ids = [product.id for product in chunk]
+
+            with transaction.atomic():
+                existing_documents = cls.objects.select_for_update().in_bulk(chunk_ids, field_name='product_id')
+                documents_to_create = []
+                documents_to_update = []
+                for product in chunk:
+                    document = existing_documents.get(product.id)
+                    if document:
+                        documents_to_update.append(document)
+                    else:
+                        document = cls(product_id=product.id)
+                        documents_to_create.append(document)
+                    document.set_document(product)
+
+                cls.objects.bulk_create(documents_to_create, batch_size=500)
+                cls.objects.bulk_update(documents_to_update, [
+                    'name', 'keywords', 'properties', 'summary', 'document'
+                ], batch_size=500)
+                cls.objects.filter(product_id__in=chunk_ids).update(
+                    search_vector=search_vector,
+                    last_updated=datetime.datetime.now()
+                )
+
+
 class ProductPriceHistory(models.Model):
     INCREASE = 'i'
     DECREASE = 'd'
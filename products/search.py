@@ -0,0 +1,78 @@
+import re
+
+from django.contrib.postgres.lookups import PostgresOperatorLookup
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import TextField, F, Func, Q, FloatField, Value
+from django.utils.html import strip_tags
+
+SEARCH_CONFIG = 'simple'
+
+CHARACTERS_MAP = str.maketrans({
+    'ي': 'ی',
+    'ى': 'ی',
+    'ك': 'ک',
+    'ة': 'ه',
+    'ۀ': 'ه',
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    '‌': ' ',
+    **{str(digit): str(index) for index, digit in enumerate('۰۱۲۳۴۵۶۷۸۹')},
+    **{str(digit): str(index) for index, digit in enumerate('٠١٢٣٤٥٦٧٨٩')},
+})
+DIACRITICS_PATTERN = re.compile('[ً-ٰٟـ]')
+NON_WORD_PATTERN = re.compile(r'[^\w]+')
+
+
+def normalize_persian(text):
+    """
+        Folds arabic letters and digits to persian/latin ones, removes diacritics and punctuation
+        Ex: `كيف ۱۲` -> `کیف 12`
+    """
+    if not text:
+        return ''
+    text = DIACRITICS_PATTERN.sub('', strip_tags(str(text)).translate(CHARACTERS_MAP).lower())
+    return NON_WORD_PATTERN.sub(' ', text).strip()
+
+
+@TextField.register_lookup
+class TrigramWordSimilar(PostgresOperatorLookup):
+    """
+        `document__trigram_word_similar=query` is true when words of document are similar to query,
+        uses trigram gin index of document
+    """
+    lookup_name = 'trigram_word_similar'
+    postgres_operator = '%%>'
+
+
+class TrigramWordSimilarity(Func):
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+
+def get_search_query(query):
+    """
+        Every word has to be matched, last word is matched as a prefix to support search as you type
+    """
+    words = query.split()
+    terms = ["'{}'".format(word.replace("'", "''")) for word in words]
+    terms[-1] += ':*'
+    return SearchQuery(' & '.join(terms), config=SEARCH_CONFIG, search_type='raw')
+
+
+def search_products(queryset, query):
+    """
+        Filters products matching full text or similar (with typos) words and annotates `search_rank`
+    """
+    query = normalize_persian(query)
+    if not query:
+        return queryset.none()
+
+    search_query = get_search_query(query)
+    return queryset.filter(
+        Q(search_document__search_vector=search_query) |
+        Q(search_document__document__trigram_word_similar=query)
+    ).annotate(
+        search_rank=SearchRank(F('search_document__search_vector'), search_query) +
+                    TrigramWordSimilarity(Value(query), F('search_document__document')),
+    )
@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+from django.db.models import Count, Q, Min, Max, OuterRef, Subquery, F, Func, Value, IntegerField
+from django.db.models.functions import Coalesce, Least
+
+from products.models import Product, Brand, Category, ProductProperty
+
+FACET_VALUES_COUNT = 50
+PRICE_BUCKETS_COUNT = 10
+
+
+def get_product_ids(queryset):
+    return queryset.order_by().values('id')
+
+
+def get_brand_facet(queryset):
+    return list(Brand.objects.filter(
+        products__id__in=get_product_ids(queryset)
+    ).annotate(
+        count=Count('products')
+    ).values('id', 'name', 'count').order_by('-count', 'id')[:FACET_VALUES_COUNT])
+
+
+def get_property_facet(queryset):
+    return list(ProductProperty.objects.filter(
+        products_with_this_properties__id__in=get_product_ids(queryset)
+    ).annotate(
+        count=Count('products_with_this_properties')
+    ).values('id', 'name', 'count').order_by('-count', 'id')[:FACET_VALUES_COUNT])
+
+
+def get_category_facet(queryset, parent_id=None):
+    """
+        Children of parent (root categories when parent is None) with count of products in their subtree
+    """
+    products_count = Product.category.through.objects.filter(
+        category__path__startswith=OuterRef('path'),
+        product_id__in=get_product_ids(queryset),
+    ).values(count=Func(F('product_id'), function='COUNT', template='%(function)s(DISTINCT %(expressions)s)'))
+
+    categories = Category.objects.filter(parent_id=parent_id).annotate(
+        count=Coalesce(Subquery(products_count), 0)
+    ).values('id', 'name', 'count').order_by('-count', 'id')
+    return [category for category in categories if category['count']]
+
+
+def get_in_stock_facet(queryset):
+    return Product.objects.filter(id__in=get_product_ids(queryset)).aggregate(
+        in_stock=Count('id', filter=Q(current_inventory__inventory__gt=0)),
+        out_of_stock=Count('id', filter=Q(current_inventory__inventory__lte=0) | Q(
+            current_inventory__inventory__isnull=True
+        )),
+    )
+
+
+def get_price_facet(queryset, buckets_count=PRICE_BUCKETS_COUNT):
+    """
+        Histogram of `price`, range of prices is split to equal buckets
+    """
+    products = Product.objects.filter(id__in=get_product_ids(queryset), price__isnull=False)
+    prices = products.aggregate(min_price=Min('price'), max_price=Max('price'))
+    min_price, max_price = prices['min_price'], prices['max_price']
+    if min_price is None:
+        return []
+    if min_price == max_price:
+        return [{'min': min_price, 'max': max_price, 'count': products.count()}]
+
+    bucket = Least(Func(
+        F('price'), Value(min_price), Value(max_price), Value(buckets_count),
+        function='WIDTH_BUCKET', output_field=IntegerField()
+    ), Value(buckets_count))
+    counts = dict(products.annotate(bucket=bucket).order_by().values('bucket').annotate(
+        count=Count('id')
+    ).values_list('bucket', 'count'))
+
+    width = (max_price - min_price) / buckets_count
+    return [
+        {
+            'min': (min_price + width * index).quantize(Decimal('1')),
+            'max': (min_price + width * (index + 1)).quantize(Decimal('1')),
+            'count': counts.get(index + 1, 0),
+        } for index in range(buckets_count)
+    ]
@@ -1,21 +1,52 @@
-from django.contrib.postgres.search import TrigramSimilarity
-from django.db.models import Q, Count, Avg, Value, FloatField
+from django.db.models import Q, F, Avg, Value, FloatField
 from django.db.models.functions import Coalesce
 
 from helpers.filters import BASE_FIELD_FILTERS
 from products.models import Product, Brand, Category
+from products.search import search_products
 from django_filters import rest_framework as filters
 import django_filters
 
 
+def in_stock_filter(queryset, name, value):
+    if value:
+        return queryset.filter(current_inventory__inventory__gt=0)
+    return queryset.filter(
+        Q(current_inventory__inventory__lte=0) | Q(current_inventory__inventory__isnull=True)
+    )
+
+
+def get_ids(value):
+    return [int(i.strip()) for i in value.split(',') if i.strip().isdigit()]
+
+
+def properties_filter(queryset, name, value):
+    for property_id in get_ids(value):
+        queryset = queryset.filter(id__in=Product.properties.through.objects.filter(
+            productproperty_id=property_id
+        ).values('product_id'))
+    return queryset
+
+
+def properties_in_filter(queryset, name, value):
+    return queryset.filter(id__in=Product.properties.through.objects.filter(
+        productproperty_id__in=get_ids(value)
+    ).values('product_id'))
+
+
 class ShopProductFilter(filters.FilterSet):
     min_price = django_filters.NumberFilter(field_name='current_price__price', lookup_expr='gte')
     max_price = django_filters.NumberFilter(field_name='current_price__price', lookup_expr='lte')
     min_inventory = django_filters.NumberFilter(field_name='current_inventory__inventory', lookup_expr='gte')
     max_inventory = django_filters.NumberFilter(field_name='current_inventory__inventory', lookup_expr='lte')
-    in_stock = django_filters.BooleanFilter(method='filter_in_stock')
-    properties = filters.CharFilter(method='filter_properties')
-    properties_in = filters.CharFilter(method='filter_properties_in')
+    in_stock = django_filters.BooleanFilter(method=in_stock_filter)
+    properties = filters.CharFilter(method=properties_filter)
+    properties_in = filters.CharFilter(method=properties_in_filter)
+    # generated `in` filter of a many to many field fails to read its comma separated value
+    category__in = filters.BaseInFilter(
+        field_name='category__id',
+        lookup_expr='in'
+    )
 
     class Meta:
         model = Product
@@ -24,51 +55,28 @@ class ShopProductFilter(filters.FilterSet):
             'product_id': BASE_FIELD_FILTERS,
             'name': BASE_FIELD_FILTERS,
             'brand': ('exact', 'in'),
-            'category': ('exact', 'in'),
+            'category': ('exact',),
 
         }
 
-        def filter_in_stock(self, queryset, name, value):
-            if value:
-                return queryset.filter(current_inventory__inventory__gt=0)
-            return queryset.filter(
-                Q(current_inventory__inventory__lte=0) | Q(current_inventory__inventory__isnull=True)
-            )
-
-        def filter_properties(self, queryset, name, value):
-            try:
-                ids = [int(i.strip()) for i in value.split(',') if i.strip().isdigit()]
-            except ValueError:
-                return queryset.none()
-
-            for property_id in ids:
-                queryset.filter(perperties__id=property_id)
-
-            return queryset
-
-        def filter_properties_in(self, queryset, name, value):
-            try:
-                ids = [int(i.strip()) for i in value.split(',') if i.strip().isdigit()]
-            except ValueError:
-                return queryset.none()
-
-            return queryset.filter(perperties__id__in=ids)
-
 
 def category_tree_filter(queryset, name, value):
-    ids = [int(cat_id) for cat_id in value.split(',') if cat_id != '']
-    categories = []
-    for cat_id in ids:
-        cats = Category.objects.get(pk=cat_id).get_all_descendants()
-        categories.extend(cats)
-        categories.append(Category.objects.get(pk=cat_id))
+    ids = [int(cat_id) for cat_id in value.split(',') if cat_id.strip().isdigit()]
+
+    query = Q()
+    for path in Category.objects.filter(id__in=ids).values_list('path', flat=True):
+        query |= Q(category__path__startswith=path)
 
-    return queryset.filter(category__in=categories)
+    if not query:
+        return queryset.none()
+    return queryset.filter(id__in=Product.category.through.objects.filter(query).values('product_id'))
 
 
 def top_viewed_filter(queryset, name, value):
-    order_by = '-view_count' if value else 'view_count'
-    return queryset.annotate(view_count=Count('views_log')).order_by(order_by, '-id')
+    # products without a counter are never viewed
+    if value:
+        return queryset.order_by(F('view_counter__total').desc(nulls_last=True), '-id')
+    return queryset.order_by(F('view_counter__total').asc(nulls_first=True), '-id')
 
 
 def top_rated_filter(queryset, name, value):
@@ -78,10 +86,8 @@ def top_rated_filter(queryset, name, value):
     ).order_by(order_by)
 
 
-def product_comments_global_search(queryset, name, value):
-    return queryset.prefetch_related('product_comments').annotate(
-        similarity=TrigramSimilarity('product_comments__text', value)
-    ).pre.filter(Q(similarity__gt=0.3) | Q(name__contains=value)).distinct().order_by('-similarity')
+def product_global_search(queryset, name, value):
+    return search_products(queryset, value).order_by('-search_rank', '-id')
 
 
 class ShopProductSimpleFilter(filters.FilterSet):
@@ -100,7 +106,7 @@ class ShopProductSimpleFilter(filters.FilterSet):
     category_tree = filters.CharFilter(method=category_tree_filter)
     top_viewed = filters.BooleanFilter(method=top_viewed_filter)
     top_rated = filters.BooleanFilter(method=top_rated_filter)
-    global_search = filters.CharFilter(method=product_comments_global_search)
+    global_search = filters.CharFilter(method=product_global_search)
 
     class Meta:
         model = Product
@@ -111,6 +117,21 @@ class ShopProductSimpleFilter(filters.FilterSet):
         }
 
 
+class ShopProductFacetFilter(ShopProductSimpleFilter):
+    in_stock = django_filters.BooleanFilter(method=in_stock_filter)
+    properties = filters.CharFilter(method=properties_filter)
+    properties_in = filters.CharFilter(method=properties_in_filter)
+
+    # filters that are ignored while counting each facet, so other values of facet keep their counts
+    FACET_FILTERS = {
+        'brand': ('brand', 'brand_in'),
+        'category': ('category_in',),
+        'property': ('properties', 'properties_in'),
+        'in_stock': ('in_stock', 'min_inventory', 'max_inventory'),
+        'price': ('min_price', 'max_price'),
+    }
+
+
 class ShopProductWithCommentsFilter(filters.FilterSet):
     brand_in = filters.BaseInFilter(
         field_name='brand__id',
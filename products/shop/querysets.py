@@ -0,0 +1,82 @@
+from django.db.models import Exists, OuterRef, Value, BooleanField, Prefetch, F, Subquery, Avg, Count, FloatField, \
+    IntegerField
+from django.db.models.functions import Coalesce
+
+from products.models import ProductGallery
+from shop.models import WishList, Comparison, Comment, Rate
+
+
+def annotate_user_lists(queryset, user):
+    """
+        Annotates `is_in_user_wish_list` and `is_in_user_comparison` as `EXISTS` sub queries
+        instead of running two queries per product in serializers
+    """
+
+    if user and user.is_authenticated:
+        return queryset.annotate(
+            is_in_user_wish_list=Exists(WishList.objects.filter(customer=user, product=OuterRef('pk'))),
+            is_in_user_comparison=Exists(Comparison.objects.filter(customer=user, product=OuterRef('pk'))),
+        )
+
+    return queryset.annotate(
+        is_in_user_wish_list=Value(False, output_field=BooleanField()),
+        is_in_user_comparison=Value(False, output_field=BooleanField()),
+    )
+
+
+def prefetch_gallery_pictures(queryset):
+    """
+        Prefetches gallery of products into `gallery_pictures` with the gallery default ordering,
+        so the first picture is `gallery_pictures[0]`
+    """
+
+    return queryset.prefetch_related(Prefetch(
+        'gallery',
+        queryset=ProductGallery.objects.only('id', 'product_id', 'picture').order_by('-pk'),
+        to_attr='gallery_pictures'
+    ))
+
+
+def shop_product_list_queryset(queryset):
+    """
+        Queryset used by `ShopProductsListSerializers`, rates and wish list counts are annotated as sub queries
+        instead of running two queries per product in serializer
+    """
+
+    rate_average = Rate.objects.filter(product=OuterRef('pk')).order_by().values('product').annotate(
+        average=Avg('level')
+    ).values('average')
+    wish_list_count = WishList.objects.filter(product=OuterRef('pk')).order_by().values('product').annotate(
+        count=Count('id')
+    ).values('count')
+
+    return queryset.annotate(
+        view_count=Coalesce(F('view_counter__total'), 0),
+        rate_average=Coalesce(Subquery(rate_average, output_field=FloatField()), Value(0.0)),
+        wish_list_count=Coalesce(Subquery(wish_list_count, output_field=IntegerField()), 0),
+    ).select_related(
+        'brand', 'current_price', 'current_inventory', 'active_offer'
+    ).prefetch_related('category', 'properties', 'avails')
+
+
+def shop_product_simple_list_queryset(queryset, user):
+    """
+        Queryset used by `ShopProductsSimpleListSerializers`, runs a constant number of queries for each page
+    """
+
+    queryset = annotate_user_lists(queryset, user).select_related('brand')
+    return prefetch_gallery_pictures(queryset).prefetch_related('variations')
+
+
+def shop_product_with_comments_queryset(queryset, user):
+    """
+        Queryset used by `ShopProductsWithCommentsListSerializers`, comments are prefetched into
+        `prefetched_comments` and filtered in serializer
+    """
+
+    queryset = annotate_user_lists(queryset, user)
+    return prefetch_gallery_pictures(queryset).prefetch_related(Prefetch(
+        'product_comments',
+        queryset=Comment.objects.select_related('customer').order_by('-pk'),
+        to_attr='prefetched_comments'
+    ))
@@ -1,23 +1,25 @@
 from django.db.models import Q
 from rest_framework import serializers
 
-from helpers.functions import get_current_user
-from products.models import Product, ProductGallery, Category
+from products.models import Product, Category
 from products.serializers import ProductGallerySerializer, AvailSerializer, ProductPropertySerializer, \
     BrandShopListSerializer
-from shop.models import Comment, Rate, WishList, Comparison
+from shop.models import Comment, Rate
 from shop.serializers import CommentRepliesSerializer, CommentSerializer
 
 
 class ShopProductsListSerializers(serializers.ModelSerializer):
+    """
+        Expects queryset of `products.shop.querysets.shop_product_list_queryset`
+    """
     final_price = serializers.ReadOnlyField()
     effective_price = serializers.ReadOnlyField()
     has_offer = serializers.ReadOnlyField()
     offer_amount = serializers.ReadOnlyField()
-    current_inventory = serializers.ReadOnlyField()
-    rate = serializers.ReadOnlyField()
+    current_inventory = serializers.IntegerField(source='current_inventory.inventory', read_only=True)
+    rate = serializers.SerializerMethodField()
     offer_display = serializers.ReadOnlyField()
-    in_wish_list_count = serializers.ReadOnlyField()
+    in_wish_list_count = serializers.SerializerMethodField()
 
     image = serializers.SerializerMethodField()
     category = serializers.SerializerMethodField()
@@ -55,7 +57,14 @@ class ShopProductsListSerializers(serializers.ModelSerializer):
         return {'id': obj.brand.id, 'name': obj.brand.name} if obj.brand else None
 
     def get_category(self, obj):
-        return {'id': obj.category.id, 'name': obj.category.name} if obj.category else None
+        return [{'id': category.id, 'name': category.name} for category in obj.category.all()]
+
+    def get_rate(self, obj):
+        # products not annotated (ex: nested in notifications) are rated by a query
+        return obj.rate_average if hasattr(obj, 'rate_average') else obj.rate
+
+    def get_in_wish_list_count(self, obj):
+        return obj.wish_list_count if hasattr(obj, 'wish_list_count') else obj.in_wish_list_count
 
 
 class ShopProductVariationsSerializers(serializers.ModelSerializer):
@@ -87,10 +96,13 @@ class ShopProductVariationsSerializers(serializers.ModelSerializer):
 
 
 class ShopProductsSimpleListSerializers(serializers.ModelSerializer):
+    """
+        Expects queryset of `products.shop.querysets.shop_product_simple_list_queryset`
+    """
     image = serializers.SerializerMethodField()
     second_image = serializers.SerializerMethodField()
-    is_in_user_wish_list = serializers.SerializerMethodField()
-    is_in_user_comparison = serializers.SerializerMethodField()
+    is_in_user_wish_list = serializers.BooleanField(read_only=True)
+    is_in_user_comparison = serializers.BooleanField(read_only=True)
     offer_percentage = serializers.SerializerMethodField()
     get_current_inventory = serializers.ReadOnlyField()
     variations = ShopProductVariationsSerializers(read_only=True, many=True)
@@ -111,31 +123,18 @@ class ShopProductsSimpleListSerializers(serializers.ModelSerializer):
             'is_in_user_comparison',
             'get_current_inventory',
             'variations',
+            'brand',
         ]
 
     def get_image(self, obj):
         return obj.picture.url if obj.picture else None
 
     def get_second_image(self, obj):
-        if ProductGallery.objects.filter(product=obj).exists():
-            first_picture_of_gallery = ProductGallery.objects.filter(product=obj).first()
+        if obj.gallery_pictures:
+            first_picture_of_gallery = obj.gallery_pictures[0]
             return first_picture_of_gallery.picture.url if first_picture_of_gallery.picture else None
         return None
 
-    def get_is_in_user_wish_list(self, obj):
-        user = get_current_user()
-        if user:
-            return WishList.objects.filter(customer=user, product=obj).exists()
-        else:
-            return False
-
-    def get_is_in_user_comparison(self, obj):
-        user = get_current_user()
-        if user:
-            return Comparison.objects.filter(customer=user, product=obj).exists()
-        else:
-            return False
-
     def get_offer_percentage(self, obj):
         if obj.regular_price and obj.price:
             offer_percentage = round(((obj.regular_price - obj.price) / obj.regular_price) * 100)
@@ -144,14 +143,17 @@ class ShopProductsSimpleListSerializers(serializers.ModelSerializer):
 
 
 class ShopProductsWithCommentsListSerializers(serializers.ModelSerializer):
+    """
+        Expects queryset of `products.shop.querysets.shop_product_with_comments_queryset`
+    """
     image = serializers.SerializerMethodField()
     second_image = serializers.SerializerMethodField()
-    is_in_user_wish_list = serializers.SerializerMethodField()
-    is_in_user_comparison = serializers.SerializerMethodField()
+    is_in_user_wish_list = serializers.BooleanField(read_only=True)
+    is_in_user_comparison = serializers.BooleanField(read_only=True)
     offer_percentage = serializers.SerializerMethodField()
     get_current_inventory = serializers.ReadOnlyField()
     search_comments = serializers.SerializerMethodField()
-    comments = CommentSerializer(source='confirmed_comments', read_only=True, many=True)
+    comments = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
@@ -175,39 +177,32 @@ class ShopProductsWithCommentsListSerializers(serializers.ModelSerializer):
         return obj.picture.url if obj.picture else None
 
     def get_second_image(self, obj):
-        if ProductGallery.objects.filter(product=obj).exists():
-            first_picture_of_gallery = ProductGallery.objects.filter(product=obj).first()
+        if obj.gallery_pictures:
+            first_picture_of_gallery = obj.gallery_pictures[0]
             return first_picture_of_gallery.picture.url if first_picture_of_gallery.picture else None
         return None
 
-    def get_is_in_user_wish_list(self, obj):
-        user = get_current_user()
-        if user:
-            return WishList.objects.filter(customer=user, product=obj).exists()
-        else:
-            return False
-
-    def get_is_in_user_comparison(self, obj):
-        user = get_current_user()
-        if user:
-            return Comparison.objects.filter(customer=user, product=obj).exists()
-        else:
-            return False
-
     def get_offer_percentage(self, obj):
         if obj.regular_price and obj.price:
             offer_percentage = round(((obj.regular_price - obj.price) / obj.regular_price) * 100)
             return f'{offer_percentage}%'
         return None
 
+    def get_comments(self, obj):
+        confirmed_comments = [
+            comment for comment in obj.prefetched_comments if comment.confirmed and comment.reply_id is None
+        ]
+        return CommentSerializer(confirmed_comments, read_only=True, many=True).data
+
     def get_search_comments(self, obj):
         request = self.context.get('request')
         comment_text = request.query_params.get('global_search', None)
 
         if comment_text:
-            filtered_comments = obj.comments.filter(text__icontains=comment_text)
+            comment_text = comment_text.lower()
+            filtered_comments = [comment for comment in obj.prefetched_comments if comment_text in comment.text.lower()]
         else:
-            filtered_comments = obj.comments.all()
+            filtered_comments = obj.prefetched_comments
         return CommentSerializer(filtered_comments, read_only=True, many=True).data
 
 
@@ -350,7 +345,7 @@ class RootCategorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Category
-        fields = ['id', 'name', 'picture_url']
+        fields = ['id', 'name', 'picture_url', 'published_products_count']
 
     def get_picture_url(self, obj):
         return obj.picture.url if obj.picture else None
@@ -1,5 +1,5 @@
-from django.core.cache import cache
-from django.db.models import Q, Count, F
+from django.db.models import Q, F
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, status, viewsets
 from rest_framework.pagination import LimitOffsetPagination, PageNumberPagination
@@ -9,10 +9,19 @@ from rest_framework.views import APIView
 
 from crm.functions import save_product_view_log
 from helpers.functions import get_current_user
+from helpers.memoize import shared_cache
+from helpers.pagination import KeysetLimitOffsetPagination, KeysetPageNumberPagination
+from helpers.views.cached_response_view import CachedResponseMixin
 from products.lists.filters import RootCategoryFilter
 from products.models import Product, Category, Brand
 from products.serializers import BrandShopListSerializer, CategorySerializer
-from products.shop.filters import ShopProductFilter, BrandShopListFilter, ShopProductSimpleFilter
+from products.signals import PRODUCTS_CACHE_TAG, CATEGORIES_CACHE_TAG, BRANDS_CACHE_TAG
+from products.shop.facets import get_brand_facet, get_category_facet, get_property_facet, get_in_stock_facet, \
+    get_price_facet
+from products.shop.filters import ShopProductFilter, BrandShopListFilter, ShopProductSimpleFilter, \
+    ShopProductFacetFilter
+from products.shop.querysets import shop_product_simple_list_queryset, shop_product_with_comments_queryset, \
+    shop_product_list_queryset
 from products.shop.serializers import ShopProductsListSerializers, ShopProductDetailSerializers, ShopCommentSerializer, \
     ShopProductRateSerializer, ShopProductsSimpleListSerializers, RootCategorySerializer, \
     ShopProductsWithCommentsListSerializers
@@ -25,42 +34,109 @@ from shop.serializers import CommentRepliesSerializer, OrderProductsSimpleListSe
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
 
+# sort keys of shop product lists, each one is indexed together with id for keyset pagination
+PRODUCT_KEYSET_ORDERING_FIELDS = {
+    'id': 'id',
+    'price': 'price',
+    'created_at': 'created_at',
+    'view_count': 'view_counter__total',
+}
+PRODUCT_ORDERING_FIELDS = ['id', 'price', 'created_at']
+
 
 class ShopProductListView(generics.ListAPIView):
     serializer_class = ShopProductsListSerializers
     throttle_classes = [UserProductListRateThrottle, AnonProductListRateThrottle]
     filterset_class = ShopProductFilter
-    ordering_fields = '__all__'
-    pagination_class = LimitOffsetPagination
+    ordering_fields = PRODUCT_ORDERING_FIELDS + ['view_count']
+    pagination_class = KeysetLimitOffsetPagination
+    keyset_ordering_fields = PRODUCT_KEYSET_ORDERING_FIELDS
+    keyset_ordering = '-id'
 
     def get_queryset(self):
-        return Product.objects.filter(status=Product.PUBLISHED).annotate(view_count=Count('views_log')).select_related(
-            'brand', 'category', 'current_price', 'current_inventory', 'products_in_wish_list', 'product_comments'
-        ).prefetch_related('properties', 'avails')
+        return shop_product_list_queryset(Product.objects.filter(status=Product.PUBLISHED))
 
 
 class ShopProductSimpleListView(generics.ListAPIView):
     serializer_class = ShopProductsSimpleListSerializers
     throttle_classes = [UserProductListRateThrottle, AnonProductListRateThrottle]
     filterset_class = ShopProductSimpleFilter
-    ordering_fields = '__all__'
-    pagination_class = LimitOffsetPagination
+    ordering_fields = PRODUCT_ORDERING_FIELDS
+    pagination_class = KeysetLimitOffsetPagination
+    keyset_ordering_fields = PRODUCT_KEYSET_ORDERING_FIELDS
+    keyset_ordering = '-id'
 
     def get_queryset(self):
+        return shop_product_simple_list_queryset(
+            Product.objects.filter(status=Product.PUBLISHED, product_type__in=[Product.VARIABLE, Product.SIMPLE]),
+            self.request.user
+        )
+
+
+class ShopProductFacetedSearchView(generics.ListAPIView):
+    """
+        Page of products with counts of brands, categories, properties, stock and prices of filtered products
+
+        Each facet is counted by one grouped query over products filtered by everything but the facet itself
+    """
+    serializer_class = ShopProductsSimpleListSerializers
+    throttle_classes = [UserProductListRateThrottle, AnonProductListRateThrottle]
+    filterset_class = ShopProductFacetFilter
+    ordering_fields = PRODUCT_ORDERING_FIELDS
+    pagination_class = KeysetLimitOffsetPagination
+    keyset_ordering_fields = PRODUCT_KEYSET_ORDERING_FIELDS
+    keyset_ordering = '-id'
+
+    def get_base_queryset(self):
         return Product.objects.filter(status=Product.PUBLISHED, product_type__in=[Product.VARIABLE, Product.SIMPLE])
 
+    def get_queryset(self):
+        return shop_product_simple_list_queryset(self.get_base_queryset(), self.request.user)
+
+    def get_facet_queryset(self, facet):
+        data = self.request.query_params.copy()
+        for param in self.filterset_class.FACET_FILTERS[facet]:
+            data.pop(param, None)
+        return self.filterset_class(data, queryset=self.get_base_queryset(), request=self.request).qs
+
+    def get_category_facet_parent_id(self):
+        category_ids = self.request.query_params.get('category_tree', '').split(',')
+        if len(category_ids) == 1 and category_ids[0].strip().isdigit():
+            return int(category_ids[0])
+        return None
+
+    def get_facets(self):
+        return {
+            'brands': get_brand_facet(self.get_facet_queryset('brand')),
+            'categories': get_category_facet(
+                self.get_facet_queryset('category'),
+                self.get_category_facet_parent_id()
+            ),
+            'properties': get_property_facet(self.get_facet_queryset('property')),
+            'stock': get_in_stock_facet(self.get_facet_queryset('in_stock')),
+            'prices': get_price_facet(self.get_facet_queryset('price')),
+        }
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response.data['facets'] = self.get_facets()
+        return response
+
 
 class ShopProductWithCommentsListView(generics.ListAPIView):
     serializer_class = ShopProductsWithCommentsListSerializers
     throttle_classes = [UserProductListRateThrottle, AnonProductListRateThrottle]
     filterset_class = ShopProductSimpleFilter
-    ordering_fields = '__all__'
-    pagination_class = LimitOffsetPagination
+    ordering_fields = PRODUCT_ORDERING_FIELDS
+    pagination_class = KeysetLimitOffsetPagination
+    keyset_ordering_fields = PRODUCT_KEYSET_ORDERING_FIELDS
+    keyset_ordering = '-id'
 
     def get_queryset(self):
-        return Product.objects.filter(
-            status=Product.PUBLISHED, product_type__in=[Product.VARIABLE, Product.SIMPLE]
-        ).prefetch_related('product_comments')
+        return shop_product_with_comments_queryset(
+            Product.objects.filter(status=Product.PUBLISHED, product_type__in=[Product.VARIABLE, Product.SIMPLE]),
+            self.request.user
+        )
 
 
 class ShopProductDetailView(generics.RetrieveAPIView):
@@ -68,15 +144,14 @@ class ShopProductDetailView(generics.RetrieveAPIView):
     throttle_classes = [UserProductDetailRateThrottle, AnonProductDetailRateThrottle]
     lookup_field = 'id'
 
-    queryset = Product.objects.annotate(view_count=Count('views_log')).select_related(
+    queryset = Product.objects.annotate(view_count=Coalesce(F('view_counter__total'), 0)).select_related(
         'brand',
-        'category',
         'current_price',
         'current_inventory',
-        'products_in_wish_list',
-        # 'product_comments'
-        'gallery'
+        'active_offer',
     ).prefetch_related(
+        'category',
+        'gallery',
         'properties',
         'avails'
     )
@@ -96,7 +171,7 @@ class CommentCreateView(generics.CreateAPIView):
     queryset = Comment.objects.all()
 
 
-class CommentPagination(PageNumberPagination):
+class CommentPagination(KeysetPageNumberPagination):
     page_size = 5
     page_size_query_param = 'page_size'
     max_page_size = 20
@@ -105,6 +180,8 @@ class CommentPagination(PageNumberPagination):
 class ShopProductCommentListView(generics.ListAPIView):
     serializer_class = CommentRepliesSerializer
     pagination_class = CommentPagination
+    keyset_ordering_fields = {'id': 'id', 'created_at': 'created_at'}
+    keyset_ordering = '-id'
 
     def get_queryset(self):
         product_id = self.kwargs.get('id')
@@ -125,165 +202,106 @@ class RelatedProductPagination(PageNumberPagination):
     max_page_size = 50
 
 
-class RelatedProductsApiView(generics.ListAPIView):
+class TopViewedProductPagination(KeysetPageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+
+class RelatedProductsApiView(CachedResponseMixin, generics.ListAPIView):
     serializer_class = ShopProductsListSerializers
     throttle_classes = [UserProductListRateThrottle, AnonProductListRateThrottle]
     pagination_class = RelatedProductPagination
+    CACHE_KEY = 'related_products'
+    CACHE_TAGS = (PRODUCTS_CACHE_TAG,)
 
     def get_queryset(self):
-        product_id = self.kwargs.get('product_id')
-        cache_key = f'related_products_{product_id}'
-        cache_queryset = cache.get(cache_key)
-
-        if cache_queryset:
-            return cache_queryset
-
-        try:
-            product = Product.objects.prefetch_related('properties', 'avails').get(id=product_id)
-        except Product.DoesNotExist:
-            return Product.objects.none()
-
-        properties_ids = product.properties.values_list('id', flat=True)
-        avails_ids = product.avails.values_list('id', flat=True)
-
-        related_products = Product.objects.annotate(view_count=Count('views_log')).filter(
-            Q(category=product.category) |
-            Q(avails__id__in=avails_ids) |
-            Q(properties__id__in=properties_ids) |
-            Q(brand=product.brand)
-        ).exclude(id=product_id).annotate(
-            related_properties=Count('properties', filter=Q(properties__id__in=properties_ids)),
-            related_avails=Count('avails', filter=Q(avails__id__in=avails_ids)),
-            similarity_score=F('related_properties') + F('related_avails')
-        ).order_by('-similarity_score').distinct().select_related(
-            'category', 'brand'
-        ).prefetch_related(
-            'properties', 'avails'
-        )
-        cache.set(cache_key, related_products, 60 * 10)
-        return related_products
+        return shop_product_list_queryset(Product.objects.filter(
+            similar_to__product_id=self.kwargs.get('product_id'), status=Product.PUBLISHED
+        )).annotate(
+            similarity_score=F('similar_to__score'),
+        ).order_by('-similarity_score', '-id')
 
 
-class SimilarBrandProductsApiView(generics.ListAPIView):
+class SimilarBrandProductsApiView(CachedResponseMixin, generics.ListAPIView):
     serializer_class = ShopProductsListSerializers
     throttle_classes = [UserProductListRateThrottle, AnonProductListRateThrottle]
     pagination_class = RelatedProductPagination
+    CACHE_KEY = 'similar_brand_products'
+    CACHE_TAGS = (PRODUCTS_CACHE_TAG,)
 
     def get_queryset(self):
         product_id = self.kwargs.get('product_id')
-        cache_key = f'similar_brand_products_{product_id}'
-        cache_queryset = cache.get(cache_key)
-
-        if cache_queryset:
-            return cache_queryset
-
         product = get_object_or_404(Product, pk=product_id)
-        similar_brand_products = Product.objects.filter(
+        return shop_product_list_queryset(Product.objects.filter(
             Q(status=Product.PUBLISHED) & Q(brand=product.brand)
-        ).exclude(id=product_id).annotate(view_count=Count('views_log')).select_related(
-            'brand', 'category', 'current_price', 'current_inventory', 'products_in_wish_list', 'product_comments'
-        ).prefetch_related('properties', 'avails')
-
-        cache.set(cache_key, similar_brand_products, 60 * 10)
-        return similar_brand_products
+        ).exclude(id=product_id))
 
 
-class SimilarAvailProductsApiView(generics.ListAPIView):
+class SimilarAvailProductsApiView(CachedResponseMixin, generics.ListAPIView):
     serializer_class = ShopProductsListSerializers
     throttle_classes = [UserProductListRateThrottle, AnonProductListRateThrottle]
     pagination_class = RelatedProductPagination
+    CACHE_KEY = 'similar_avail_products'
+    CACHE_TAGS = (PRODUCTS_CACHE_TAG,)
 
     def get_queryset(self):
         product_id = self.kwargs.get('product_id')
-        cache_key = f'similar_avail_products_{product_id}'
-        cache_queryset = cache.get(cache_key)
-
-        if cache_queryset:
-            return cache_queryset
-
         product = get_object_or_404(Product, pk=product_id)
-        similar_avails_products = Product.objects.filter(
-            Q(status=Product.PUBLISHED) & Q(avails__in=product.avails)
-        ).exclude(id=product_id).annotate(view_count=Count('views_log')).select_related(
-            'brand', 'category', 'current_price', 'current_inventory', 'products_in_wish_list', 'product_comments'
-        ).prefetch_related('properties', 'avails')
+        return shop_product_list_queryset(Product.objects.filter(
+            Q(status=Product.PUBLISHED) & Q(avails__in=product.avails.all())
+        ).exclude(id=product_id))
 
-        cache.set(cache_key, similar_avails_products, 60 * 10)
-        return similar_avails_products
 
-
-class SimilarPropertiesProductsApiView(generics.ListAPIView):
+class SimilarPropertiesProductsApiView(CachedResponseMixin, generics.ListAPIView):
     serializer_class = ShopProductsListSerializers
     throttle_classes = [UserProductListRateThrottle, AnonProductListRateThrottle]
     pagination_class = RelatedProductPagination
+    CACHE_KEY = 'similar_property_products'
+    CACHE_TAGS = (PRODUCTS_CACHE_TAG,)
 
     def get_queryset(self):
         product_id = self.kwargs.get('product_id')
-        cache_key = f'similar_property_products_{product_id}'
-        cache_queryset = cache.get(cache_key)
-
-        if cache_queryset:
-            return cache_queryset
-
         product = get_object_or_404(Product, pk=product_id)
-        similar_properties_products = Product.objects.filter(
-            Q(status=Product.PUBLISHED) & Q(properties__in=product.properties)
-        ).exclude(id=product_id).annotate(view_count=Count('views_log')).select_related(
-            'brand', 'category', 'current_price', 'current_inventory', 'products_in_wish_list', 'product_comments'
-        ).prefetch_related('properties', 'avails')
+        return shop_product_list_queryset(Product.objects.filter(
+            Q(status=Product.PUBLISHED) & Q(properties__in=product.properties.all())
+        ).exclude(id=product_id))
 
-        cache.set(cache_key, similar_properties_products, 60 * 10)
-        return similar_properties_products
 
-
-class SimilarCategoryProductsApiView(generics.ListAPIView):
+class SimilarCategoryProductsApiView(CachedResponseMixin, generics.ListAPIView):
     serializer_class = ShopProductsListSerializers
     throttle_classes = [UserProductListRateThrottle, AnonProductListRateThrottle]
     pagination_class = RelatedProductPagination
+    CACHE_KEY = 'similar_category_products'
+    CACHE_TAGS = (PRODUCTS_CACHE_TAG,)
 
     def get_queryset(self):
         product_id = self.kwargs.get('product_id')
-        cache_key = f'similar_category_products_{product_id}'
-        cache_queryset = cache.get(cache_key)
-
-        if cache_queryset:
-            return cache_queryset
-
         product = get_object_or_404(Product, pk=product_id)
-        similar_category_products = Product.objects.filter(
-            Q(status=Product.PUBLISHED) & Q(category=product.category)
-        ).exclude(id=product_id).annotate(view_count=Count('views_log')).select_related(
-            'brand', 'category', 'current_price', 'current_inventory', 'products_in_wish_list', 'product_comments'
-        ).prefetch_related('properties', 'avails')
-
-        cache.set(cache_key, similar_category_products, 60 * 10)
-        return similar_category_products
+        return shop_product_list_queryset(Product.objects.filter(
+            Q(status=Product.PUBLISHED) & Q(category__in=product.category.all())
+        ).exclude(id=product_id))
 
 
 class TopViewedShopProductsAPIView(generics.ListAPIView):
     serializer_class = ShopProductsListSerializers
     throttle_classes = [UserProductListRateThrottle, AnonProductListRateThrottle]
-    pagination_class = RelatedProductPagination
+    pagination_class = TopViewedProductPagination
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['brand', 'category']
-    ordering_fields = ['view_count', 'current_price', 'title']
-    ordering = ['-view_count']
+    ordering_fields = PRODUCT_ORDERING_FIELDS + ['view_count']
+    ordering = ['-view_count', '-id']
+    keyset_ordering_fields = PRODUCT_KEYSET_ORDERING_FIELDS
+    keyset_ordering = '-view_count'
 
     def get_queryset(self):
-        return (
-            Product.objects
-                .prefetch_related('brand', 'category')
-                .select_related(
-                'brand', 'category', 'current_price', 'current_inventory', 'products_in_wish_list', 'product_comments'
-            )
-                .annotate(view_count=Count('views_log'))
-                .order_by('-view_count', '-id')
-        )
+        return shop_product_list_queryset(Product.objects.all()).order_by('-view_count', '-id')
 
 
-class RootCategoryListView(generics.ListAPIView):
+class RootCategoryListView(CachedResponseMixin, generics.ListAPIView):
     throttle_classes = [RootCategoryThrottle]
     CACHE_KEY = 'root_category_data'
+    CACHE_TAGS = (CATEGORIES_CACHE_TAG,)
     CACHE_TIMEOUT = 60 * 60 * 6
 
     serializer_class = RootCategorySerializer
@@ -292,52 +310,44 @@ class RootCategoryListView(generics.ListAPIView):
     pagination_class = LimitOffsetPagination
 
     def get_queryset(self):
-        categories = cache.get(self.CACHE_KEY)
+        return Category.objects.filter(parent=None)
 
-        if not categories:
-            categories = Category.objects.filter(parent=None)
-            cache.set(self.CACHE_KEY, categories, self.CACHE_TIMEOUT)
 
-        return categories
+@shared_cache('category_tree_data', timeout=60 * 60 * 6, stale_timeout=60 * 5, tags=(CATEGORIES_CACHE_TAG,))
+def get_category_tree():
+    categories = Category.objects.all().only('id', 'name', 'parent_id', 'published_products_count')
 
+    category_map = {}
+    for category in categories:
+        category_map.setdefault(category.parent_id, []).append({
+            'id': category.id,
+            'name': category.name,
+            'published_products_count': category.published_products_count,
+            'children': []
+        })
 
-class CategoryTreeView(APIView):
-    throttle_classes = [CategoryTreeThrottle]
-    CACHE_KEY = 'category_tree_data'
-    CACHE_TIMEOUT = 60 * 60 * 6
-
-    def get(self, request):
-        tree = cache.get(self.CACHE_KEY)
-
-        if not tree:
-            categories = Category.objects.all().only('id', 'name', 'parent_id').select_related('parent')
-
-            category_map = {}
-            for category in categories:
-                category_map.setdefault(category.parent_id, []).append({
-                    'id': category.id,
-                    'name': category.name,
-                    'children': []
-                })
+    def build_tree(parent_id=None):
+        nodes = []
+        for current_category in category_map.get(parent_id, []):
+            current_category['children'] = build_tree(current_category['id'])
+            nodes.append(current_category)
+        return nodes
 
-            def build_tree(parent_id=None):
-                nodes = []
-                for current_category in category_map.get(parent_id, []):
-                    current_category['children'] = build_tree(current_category['id'])
-                    nodes.append(current_category)
-                return nodes
+    return build_tree()
 
-            tree = build_tree()
 
-            cache.set(self.CACHE_KEY, tree, self.CACHE_TIMEOUT)
+class CategoryTreeView(APIView):
+    throttle_classes = [CategoryTreeThrottle]
 
-        return Response(tree, status=status.HTTP_200_OK)
+    def get(self, request):
+        return Response(get_category_tree(), status=status.HTTP_200_OK)
 
 
-class BrandShopListView(generics.ListAPIView):
+class BrandShopListView(CachedResponseMixin, generics.ListAPIView):
     permission_classes = [AllowAny]
     throttle_classes = [BrandThrottle]
     CACHE_KEY = 'brands_data'
+    CACHE_TAGS = (BRANDS_CACHE_TAG,)
     CACHE_TIMEOUT = 60 * 60 * 6
 
     serializer_class = BrandShopListSerializer
@@ -346,13 +356,7 @@ class BrandShopListView(generics.ListAPIView):
     pagination_class = LimitOffsetPagination
 
     def get_queryset(self):
-        brands = cache.get(self.CACHE_KEY)
-
-        if not brands:
-            brands = Brand.objects.all()
-            cache.set(self.CACHE_KEY, brands, self.CACHE_TIMEOUT)
-
-        return brands
+        return Brand.objects.all()
 
 
 class CurrentUserHasOrderProductViewSet(viewsets.ReadOnlyModelViewSet):
@@ -360,14 +364,16 @@ class CurrentUserHasOrderProductViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         user = get_current_user()
-        return Product.objects.filter(shop_order_items__shop_order__customer=user).distinct()
+        return shop_product_list_queryset(
+            Product.objects.filter(shop_order_items__shop_order__customer=user).distinct()
+        )
 
 
 class CurrentUserRelatedProductViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ShopProductsListSerializers
 
     def get_queryset(self):
-        return Product.objects.all().order_by('-created_by')
+        return shop_product_list_queryset(Product.objects.all()).order_by('-created_by')
 
 
 class PendingReviewProductsView(viewsets.ReadOnlyModelViewSet):
@@ -1,12 +1,116 @@
-from django.db.models.signals import post_save, post_delete
+import datetime
+
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from django.core.cache import cache
 
-from products.models import Category
+from helpers.cache import invalidate_cache_tags
+from products.models import Category, ProductPrice, ProductActiveOffer, Product, Brand, ProductViewCount, \
+    ProductProperty, ProductSearchDocument, ProductInventory
+from shop.models import LimitedTimeOffer, LimitedTimeOfferItems
 
-CATEGORY_TREE_CACHE_KEY = 'category_tree_data'
+PRODUCTS_CACHE_TAG = 'products'
+CATEGORIES_CACHE_TAG = 'categories'
+BRANDS_CACHE_TAG = 'brands'
 
 
 @receiver([post_save, post_delete], sender=Category)
-def clear_category_tree_cache(sender, **kwargs):
-    cache.delete(CATEGORY_TREE_CACHE_KEY)
\ No newline at end of file
+def clear_category_responses_cache(sender, **kwargs):
+    invalidate_cache_tags(CATEGORIES_CACHE_TAG, PRODUCTS_CACHE_TAG)
+
+
+@receiver([post_save, post_delete], sender=Brand)
+def clear_brand_responses_cache(sender, **kwargs):
+    invalidate_cache_tags(BRANDS_CACHE_TAG, PRODUCTS_CACHE_TAG)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductPrice)
+@receiver([post_save, post_delete], sender=ProductInventory)
+@receiver([post_save, post_delete], sender=ProductActiveOffer)
+def clear_product_responses_cache(sender, **kwargs):
+    invalidate_cache_tags(PRODUCTS_CACHE_TAG)
+
+
+@receiver(post_save, sender=Product)
+def create_product_view_counter(sender, instance, created, **kwargs):
+    if created:
+        ProductViewCount.objects.get_or_create(product=instance)
+
+
+@receiver(m2m_changed, sender=Product.category.through)
+@receiver(m2m_changed, sender=Product.properties.through)
+@receiver(m2m_changed, sender=Product.avails.through)
+def clear_product_relations_responses_cache(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_cache_tags(PRODUCTS_CACHE_TAG)
+
+
+@receiver(m2m_changed, sender=Product.category.through)
+@receiver(m2m_changed, sender=Product.properties.through)
+@receiver(m2m_changed, sender=Product.avails.through)
+def touch_product_on_relations_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Relations do not update `Product.updated_at`, which `ProductSimilarity.refresh_changed` looks for
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    product_ids = pk_set if reverse else [instance.pk]
+    if product_ids:
+        Product.objects.filter(id__in=product_ids).update(updated_at=datetime.datetime.now())
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_search_document(sender, instance, **kwargs):
+    ProductSearchDocument.refresh([instance.id])
+
+
+@receiver(m2m_changed, sender=Product.category.through)
+@receiver(m2m_changed, sender=Product.properties.through)
+def refresh_relations_search_documents(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        ProductSearchDocument.refresh([instance.pk])
+    elif pk_set:
+        ProductSearchDocument.refresh(pk_set)
+
+
+@receiver(post_save, sender=Brand)
+def refresh_brand_search_documents(sender, instance, created, **kwargs):
+    if not created:
+        ProductSearchDocument.refresh(Product.objects.filter(brand=instance).values('id'))
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_search_documents(sender, instance, created, **kwargs):
+    if not created:
+        ProductSearchDocument.refresh(Product.objects.filter(category=instance).values('id'))
+
+
+@receiver(post_save, sender=ProductProperty)
+def refresh_property_search_documents(sender, instance, created, **kwargs):
+    if not created:
+        ProductSearchDocument.refresh(Product.objects.filter(properties=instance).values('id'))
+
+
+@receiver(post_save, sender=LimitedTimeOffer)
+def refresh_offer_products_active_offer(sender, instance, **kwargs):
+    product_ids = list(LimitedTimeOfferItems.objects.filter(
+        limited_time_offer_id=instance.id
+    ).values_list('product_id', flat=True))
+    if product_ids:
+        ProductActiveOffer.refresh(product_ids)
+        invalidate_cache_tags(PRODUCTS_CACHE_TAG)
+
+
+@receiver([post_save, post_delete], sender=LimitedTimeOfferItems)
+def refresh_offer_item_product_active_offer(sender, instance, **kwargs):
+    ProductActiveOffer.refresh([instance.product_id])
+    invalidate_cache_tags(PRODUCTS_CACHE_TAG)
+
+
+@receiver([post_save, post_delete], sender=ProductPrice)
+def refresh_price_product_active_offer(sender, instance, **kwargs):
+    # snapshots keep the offer effective price, computed from the price
+    if ProductActiveOffer.objects.filter(product_id=instance.product_id).exists():
+        ProductActiveOffer.refresh([instance.product_id])
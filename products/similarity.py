@@ -0,0 +1,116 @@
+import datetime
+import heapq
+from collections import defaultdict, Counter
+from itertools import islice
+
+from crm.models import ShopProductViewLog
+
+SIMILAR_PRODUCTS_COUNT = 50
+
+PROPERTIES_WEIGHT = 3
+AVAILS_WEIGHT = 2
+CATEGORY_WEIGHT = 1
+BRAND_WEIGHT = 1
+CO_VIEWS_WEIGHT = 2
+
+# members of larger groups (ex: a wide category) are sampled as candidates instead of visiting all of them
+CANDIDATES_GROUP_SIZE = 500
+CO_VIEWS_DAYS = 90
+CO_VIEWS_PER_USER = 30
+CO_VIEWS_CAP = 5
+
+
+class ProductSimilarityIndex:
+    """
+        In memory relations of published products, used to score pairs of products
+
+        score = shared properties, avails and categories, same brand and co-views (products viewed by the same
+        user in the last `CO_VIEWS_DAYS`), each one multiplied by its weight
+    """
+
+    def __init__(self, product_ids):
+        from products.models import Product
+
+        self.product_ids = set(product_ids)
+        self.relations = {}
+        self.groups = {}
+
+        for name, through, value_field in (
+                ('properties', Product.properties.through, 'productproperty_id'),
+                ('avails', Product.avails.through, 'avail_id'),
+                ('category', Product.category.through, 'category_id'),
+        ):
+            self.add_relation(name, through.objects.values_list('product_id', value_field).iterator())
+
+        self.add_relation('brand', Product.objects.filter(
+            id__in=self.product_ids, brand__isnull=False
+        ).values_list('id', 'brand_id').iterator())
+
+        self.co_views = self.get_co_views()
+
+    def add_relation(self, name, pairs):
+        relations = defaultdict(set)
+        groups = defaultdict(list)
+        for product_id, value in pairs:
+            if product_id in self.product_ids:
+                relations[product_id].add(value)
+                groups[value].append(product_id)
+        self.relations[name] = relations
+        self.groups[name] = groups
+
+    def get_co_views(self):
+        views = ShopProductViewLog.objects.filter(
+            user__isnull=False,
+            created_at__gte=datetime.datetime.now() - datetime.timedelta(days=CO_VIEWS_DAYS)
+        ).order_by('user_id', '-created_at').values_list('user_id', 'product_id').iterator()
+
+        user_products = defaultdict(list)
+        for user_id, product_id in views:
+            products = user_products[user_id]
+            if product_id in self.product_ids and product_id not in products and len(products) < CO_VIEWS_PER_USER:
+                products.append(product_id)
+
+        co_views = defaultdict(Counter)
+        for products in user_products.values():
+            for product_id in products:
+                for other_product_id in products:
+                    if other_product_id != product_id:
+                        co_views[product_id][other_product_id] += 1
+        return co_views
+
+    def get_candidates(self, product_id):
+        candidates = set(self.co_views[product_id])
+        for name, relations in self.relations.items():
+            for value in relations.get(product_id, ()):
+                candidates.update(islice(self.groups[name][value], CANDIDATES_GROUP_SIZE))
+        candidates.discard(product_id)
+        return candidates
+
+    def get_score(self, product_id, other_product_id):
+        relations = self.relations
+        score = (
+            PROPERTIES_WEIGHT * len(relations['properties'].get(product_id, set()) &
+                                    relations['properties'].get(other_product_id, set())) +
+            AVAILS_WEIGHT * len(relations['avails'].get(product_id, set()) &
+                                relations['avails'].get(other_product_id, set())) +
+            CATEGORY_WEIGHT * len(relations['category'].get(product_id, set()) &
+                                  relations['category'].get(other_product_id, set())) +
+            BRAND_WEIGHT * len(relations['brand'].get(product_id, set()) &
+                               relations['brand'].get(other_product_id, set())) +
+            CO_VIEWS_WEIGHT * min(self.co_views[product_id][other_product_id], CO_VIEWS_CAP)
+        )
+        return score
+
+    def get_similar_products(self, product_id):
+        """
+            Returns top `SIMILAR_PRODUCTS_COUNT` (similar product id, score) of product
+        """
+        scores = (
+            (other_product_id, self.get_score(product_id, other_product_id))
+            for other_product_id in self.get_candidates(product_id)
+        )
+        return heapq.nlargest(
+            SIMILAR_PRODUCTS_COUNT,
+            (item for item in scores if item[1] > 0),
+            key=lambda item: (item[1], item[0])
+        )
@@ -1,3 +1,407 @@
-from django.test import TestCase
+import base64
+import datetime
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from crm.models import ShopProductViewLog
+from helpers.test import MTestCase
+from products.models import Product, ProductGallery, Brand, Category, ProductViewCount, ProductProperty, \
+    ProductSimilarity
+from products.search import normalize_persian, search_products
+from products.similarity import ProductSimilarityIndex
+from shop.models import WishList, Comparison, Comment, Rate
+from users.models import User
+
+
+class ShopProductListQueryCountTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='shop_customer', mobile_number=self.get_fake_phone_number())
+        self.brand = Brand.objects.create(name='brand')
+
+    def create_products(self, count):
+        products = []
+        for index in range(count):
+            product = Product.objects.create(
+                product_id='shop-{}'.format(index),
+                name='product {}'.format(index),
+                status=Product.PUBLISHED,
+                brand=self.brand,
+            )
+            ProductGallery.objects.create(product=product)
+            Comment.objects.create(customer=self.user, product=product, text='comment', confirmed=True)
+            if index % 2:
+                WishList.objects.create(customer=self.user, product=product)
+                Comparison.objects.create(customer=self.user, product=product)
+            products.append(product)
+        return products
+
+    def get_page_queries_count(self, url_name, limit):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(url_name), data={'limit': limit})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), limit)
+        return len(context)
+
+    def assert_constant_queries(self, url_name):
+        self.create_products(100)
+        self.client.force_authenticate(self.user)
+        self.get_page_queries_count(url_name, 1)
+
+        small_page_queries = self.get_page_queries_count(url_name, 10)
+        large_page_queries = self.get_page_queries_count(url_name, 100)
+        self.assertEqual(small_page_queries, large_page_queries)
+
+        self.client.force_authenticate(None)
+
+    def test_list_queries_count(self):
+        self.assert_constant_queries('products:shopProductList')
+
+    def test_list_fields(self):
+        category = Category.objects.create(name='category', slug='category', unique_code=1)
+        products = self.create_products(2)
+        products[1].category.add(category)
+        products[1].current_inventory.increase_inventory(5)
+        Rate.objects.create(customer=self.user, product=products[1], level=Rate.FOUR_STAR)
+
+        response = self.client.get(reverse('products:shopProductList'), data={'limit': 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        results = {item['id']: item for item in response.data['results']}
+        self.assertEqual(results[products[0].id]['category'], [])
+        self.assertEqual(results[products[1].id]['category'], [{'id': category.id, 'name': 'category'}])
+        self.assertEqual(results[products[1].id]['current_inventory'], 5)
+        self.assertEqual([results[product.id]['rate'] for product in products], [0, 4])
+        self.assertEqual([results[product.id]['in_wish_list_count'] for product in products], [0, 1])
+
+        response = self.client.get(reverse('products:shopProductList'), data={
+            'limit': 10, 'category__in': str(category.id)
+        })
+        self.assertEqual([item['id'] for item in response.data['results']], [products[1].id])
+
+    def test_simple_list_queries_count(self):
+        self.assert_constant_queries('shopProductSimpleList')
+
+    def test_with_comments_list_queries_count(self):
+        self.assert_constant_queries('productsWithComments')
+
+    def test_simple_list_user_lists_annotations(self):
+        products = self.create_products(2)
+        self.client.force_authenticate(self.user)
+
+        response = self.client.get(reverse('shopProductSimpleList'), data={'limit': 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        results = {item['id']: item for item in response.data['results']}
+        self.assertFalse(results[products[0].id]['is_in_user_wish_list'])
+        self.assertTrue(results[products[1].id]['is_in_user_wish_list'])
+        self.assertTrue(results[products[1].id]['is_in_user_comparison'])
+
+        self.client.force_authenticate(None)
+
+
+class ShopCachedListResponseTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        Brand.objects.create(name='brand')
+
+    def test_cached_response_without_queries(self):
+        response = self.client.get(reverse('products:brandShop'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(reverse('products:brandShop'))
+        self.assertEqual(cached_response.content, response.content)
+
+    def test_brand_save_invalidates_response(self):
+        self.client.get(reverse('products:brandShop'))
+        Brand.objects.create(name='new brand')
+
+        response = self.client.get(reverse('products:brandShop'))
+        self.assertEqual(len(response.json()), 2)
+
+    def assert_product_list_is_cached(self, url, product):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['name'] for item in response.json()['results']], [product.name])
+
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(url)
+        self.assertEqual(cached_response.content, response.content)
+
+        product.name = 'renamed'
+        product.save()
+        response = self.client.get(url)
+        self.assertEqual([item['name'] for item in response.json()['results']], ['renamed'])
+
+    def create_products(self):
+        brand = Brand.objects.get()
+        product = Product.objects.create(product_id='product', name='product', status=Product.PUBLISHED, brand=brand)
+        similar = Product.objects.create(product_id='similar', name='similar', status=Product.PUBLISHED, brand=brand)
+        return product, similar
+
+    def test_related_products_are_cached(self):
+        product, similar = self.create_products()
+        ProductSimilarity.objects.create(
+            product=product, similar_product=similar, score=1, last_updated=datetime.datetime.now()
+        )
+        self.assert_product_list_is_cached(
+            reverse('products:relatedProducts', kwargs={'product_id': product.id}), similar
+        )
+
+    def test_similar_brand_products_are_cached(self):
+        product, similar = self.create_products()
+        self.assert_product_list_is_cached(
+            reverse('products:similarBrandProducts', kwargs={'product_id': product.id}), similar
+        )
+
+
+class CategoryTreeCacheTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_category_tree_is_cached_until_categories_change(self):
+        Category.objects.create(slug='root', unique_code=1, name='root')
+        response = self.client.get(reverse('categoryTree'))
+        self.assertEqual(len(response.data), 1)
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('categoryTree'))
+
+        Category.objects.create(slug='other', unique_code=2, name='other')
+        response = self.client.get(reverse('categoryTree'))
+        self.assertEqual(len(response.data), 2)
+
+
+class CategoryPathTest(MTestCase):
+
+    def create_category(self, code, parent=None):
+        return Category.objects.create(slug=str(code), unique_code=code, name=str(code), parent=parent)
+
+    def test_paths_follow_parent_reassignment(self):
+        root = self.create_category(1)
+        other_root = self.create_category(2)
+        child = self.create_category(3, parent=root)
+        grandchild = self.create_category(4, parent=child)
+        self.assertEqual(grandchild.path, '{}/{}/{}/'.format(root.id, child.id, grandchild.id))
+
+        child.parent = other_root
+        child.save()
+
+        grandchild.refresh_from_db()
+        self.assertEqual(grandchild.path, '{}/{}/{}/'.format(other_root.id, child.id, grandchild.id))
+        self.assertEqual([category.id for category in grandchild.get_ancestors()], [other_root.id, child.id])
+        self.assertEqual(root.get_all_descendants(), [])
+
+    def test_category_can_not_be_moved_under_itself(self):
+        root = self.create_category(1)
+        child = self.create_category(2, parent=root)
+
+        root.parent = child
+        with self.assertRaises(ValidationError):
+            root.save()
+
+    def test_published_products_count(self):
+        root = self.create_category(1)
+        child = self.create_category(2, parent=root)
+        product = Product.objects.create(product_id='counted', name='counted', status=Product.PUBLISHED)
+        product.category.add(child)
+
+        Category.refresh_published_products_count()
+        root.refresh_from_db()
+        self.assertEqual(root.published_products_count, 1)
+
+
+class ProductSearchTest(MTestCase):
+
+    def test_normalize_persian(self):
+        self.assertEqual(normalize_persian('كيفِ چرم‌دار ۱۲'), 'کیف چرم دار 12')
+
+    def test_search_document_is_updated_with_product(self):
+        brand = Brand.objects.create(name='ايكس')
+        product = Product.objects.create(product_id='searched', name='كرم دست', status=Product.PUBLISHED, brand=brand)
+
+        self.assertEqual(list(search_products(Product.objects.all(), 'کرم')), [product])
+        self.assertEqual(list(search_products(Product.objects.all(), 'ایکس')), [product])
+
+        product.name = 'شامپو'
+        product.save()
+        self.assertEqual(list(search_products(Product.objects.all(), 'شامپ')), [product])
+        self.assertEqual(list(search_products(Product.objects.all(), 'کرم')), [])
+
+
+class ShopProductFacetedSearchTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.brand = Brand.objects.create(name='brand')
+        self.other_brand = Brand.objects.create(name='other brand')
+        self.category = Category.objects.create(slug='root', unique_code=1, name='root')
+        for index in range(10):
+            product = Product.objects.create(
+                product_id='faceted-{}'.format(index),
+                name='product {}'.format(index),
+                status=Product.PUBLISHED,
+                brand=self.brand if index % 2 else self.other_brand,
+                price=index * 1000,
+            )
+            product.category.add(self.category)
+
+    def test_facets_counts(self):
+        response = self.client.get(reverse('shopProductFacetedSearch'), data={'brand_in': self.brand.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        facets = response.data['facets']
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual({item['id']: item['count'] for item in facets['brands']}, {
+            self.brand.id: 5, self.other_brand.id: 5
+        })
+        self.assertEqual(facets['categories'], [{'id': self.category.id, 'name': 'root', 'count': 5}])
+        self.assertEqual(sum(bucket['count'] for bucket in facets['prices']), 5)
+
+    def get_facets_queries_count(self, limit):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(
+                reverse('shopProductFacetedSearch'), data={'limit': limit, 'category_tree': self.category.id}
+            )
+        return len(context)
+
+    def test_facets_queries_count(self):
+        self.assertEqual(self.get_facets_queries_count(1), self.get_facets_queries_count(10))
+
+
+class ShopProductKeysetPaginationTest(MTestCase):
+
+    def test_pages_follow_sort_key(self):
+        for index in range(7):
+            Product.objects.create(
+                product_id='keyset-{}'.format(index),
+                name='product {}'.format(index),
+                status=Product.PUBLISHED,
+                price=(index % 3) * 1000 if index else None,
+            )
+        expected_ids = list(Product.objects.order_by('price', 'id').values_list('id', flat=True))
+
+        ids = []
+        url = reverse('shopProductSimpleList') + '?cursor=&ordering=price&limit=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(ids, expected_ids)
+
+    def test_tampered_cursor_is_not_found(self):
+        for ordering in ('price', 'view_count', 'created_at'):
+            cursor = base64.urlsafe_b64encode(json.dumps(['abc', 5]).encode()).decode()
+            response = self.client.get(reverse('shopProductSimpleList'), data={'cursor': cursor, 'ordering': ordering})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_offset_pagination_is_kept(self):
+        Product.objects.create(product_id='offset', name='offset', status=Product.PUBLISHED)
+        response = self.client.get(reverse('shopProductSimpleList'), data={'limit': 1, 'offset': 0})
+        self.assertEqual(response.data['count'], 1)
+
+
+@mock.patch.object(ProductViewCount, 'VIEW_LOG_SETTLE_WINDOW', 3)
+class ProductViewCountTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(product_id='viewed', name='viewed', status=Product.PUBLISHED)
+        self.other_product = Product.objects.create(product_id='other', name='other', status=Product.PUBLISHED)
+
+    def log_views(self, product, *ids):
+        for log_id in ids:
+            ShopProductViewLog.objects.create(id=log_id, product=product)
+
+    def get_counts(self):
+        ProductViewCount.refresh()
+        return list(ProductViewCount.objects.order_by('product_id').values_list('total', 'settled_total', 'month'))
+
+    def test_views_committed_late_are_counted(self):
+        self.log_views(self.product, 1, 2, 3, 4, 5)
+        self.log_views(self.other_product, 10)
+        # ids up to 7 are settled, 8 to 10 are recounted on next refresh
+        self.assertEqual(self.get_counts(), [(5, 5, 5), (1, 0, 1)])
+
+        self.log_views(self.other_product, 9)
+        self.assertEqual(self.get_counts(), [(5, 5, 5), (2, 0, 2)])
+
+        self.log_views(self.product, 11, 12, 13, 14)
+        self.assertEqual(self.get_counts(), [(9, 6, 9), (2, 2, 2)])
+        self.assertEqual(self.get_counts(), [(9, 6, 9), (2, 2, 2)])
+
+    def test_old_views_leave_windows(self):
+        self.log_views(self.product, 1, 2)
+        ShopProductViewLog.objects.filter(id=1).update(
+            created_at=datetime.datetime.now() - datetime.timedelta(days=40)
+        )
+        self.assertEqual(self.get_counts(), [(2, 0, 1), (0, 0, 0)])
+
+
+class ProductSimilarityTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.brand = Brand.objects.create(name='brand')
+        self.property = ProductProperty.objects.create(name='property')
+        self.category = Category.objects.create(name='category', slug='category', unique_code=1)
+        self.product = self.create_product('product', brand=self.brand)
+        self.same_brand = self.create_product('same brand', brand=self.brand)
+        self.same_category = self.create_product('same category')
+        self.co_viewed = self.create_product('co viewed')
+        self.draft = self.create_product('draft', status=Product.DRAFT)
+
+        for product in (self.product, self.same_brand, self.draft):
+            product.properties.add(self.property)
+        self.product.category.add(self.category)
+        self.same_category.category.add(self.category)
+        for index in range(2):
+            user = User.objects.create(username='viewer {}'.format(index), mobile_number=self.get_fake_phone_number())
+            for product in (self.product, self.co_viewed):
+                ShopProductViewLog.objects.create(user=user, product=product)
+
+    def create_product(self, name, status=Product.PUBLISHED, **kwargs):
+        return Product.objects.create(product_id=name, name=name, status=status, **kwargs)
+
+    def get_similarities(self, product):
+        return list(ProductSimilarity.objects.filter(product=product).order_by(
+            '-score', '-similar_product_id'
+        ).values_list('similar_product_id', 'score'))
+
+    def test_scores(self):
+        index = ProductSimilarityIndex(Product.objects.filter(status=Product.PUBLISHED).values_list('id', flat=True))
+        # shared property and brand, two co-views, shared category, draft products are left out
+        self.assertEqual(index.get_similar_products(self.product.id), [
+            (self.co_viewed.id, 4), (self.same_brand.id, 4), (self.same_category.id, 1)
+        ])
+        self.assertEqual(index.get_similar_products(self.same_category.id), [(self.product.id, 1)])
+
+    def test_refresh_of_changed_products(self):
+        ProductSimilarity.refresh()
+        self.assertEqual(self.get_similarities(self.same_category), [(self.product.id, 1)])
+
+        self.same_category.properties.add(self.property)
+        self.same_brand.status = Product.DRAFT
+        self.same_brand.save()
+        ProductSimilarity.refresh([self.same_category.id, self.same_brand.id])
+
+        # products similar to the changed ones are recomputed too
+        self.assertEqual(self.get_similarities(self.product), [(self.co_viewed.id, 4), (self.same_category.id, 4)])
+        self.assertEqual(self.get_similarities(self.same_category), [(self.product.id, 4)])
+        self.assertEqual(self.get_similarities(self.same_brand), [])
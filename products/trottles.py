@@ -1,8 +1,9 @@
-from rest_framework.throttling import BaseThrottle, UserRateThrottle, AnonRateThrottle
+import math
+
+from rest_framework.throttling import BaseThrottle
 from rest_framework.exceptions import Throttled
-from django.core.cache import cache
-import time
 
+from helpers.throttling import UserRateThrottle, AnonRateThrottle, get_throttle_backend
 from users.models import User
 
 
@@ -41,9 +42,9 @@ class BrandThrottle(UserRateThrottle):
 
 
 class DynamicRateThrottle(BaseThrottle):
-    def __init__(self):
-        self.history = None
-
+    """
+        Requests per minute by role of user and method of request
+    """
     rates = {
         'anon': {'GET': 30, 'POST': 10},
         'authenticated': {'GET': 60, 'POST': 20},
@@ -53,15 +54,15 @@ class DynamicRateThrottle(BaseThrottle):
 
     def get_cache_key(self, request):
         if request.user.is_authenticated:
-            return f'throttle_user_{request.user.id}'
+            return f'dynamic_throttle_user_{request.user.id}_{request.method}'
         else:
-            return f'throttle_anon_{self.get_ident(request)}'
+            return f'dynamic_throttle_anon_{self.get_ident(request)}_{request.method}'
 
     def get_rate(self, request):
         method = request.method
 
         if request.user.is_authenticated:
-            if getattr(request.user, 'user_type') and request.user.user_type == User.MANAGER:
+            if getattr(request.user, 'user_type', None) == User.MANAGER:
                 user_type = 'manager'
             elif request.user.is_staff:
                 user_type = 'staff'
@@ -73,24 +74,13 @@ class DynamicRateThrottle(BaseThrottle):
         return self.rates.get(user_type, {}).get(method, 10)
 
     def allow_request(self, request, view):
-        cache_key = self.get_cache_key(request)
         rate = self.get_rate(request)
+        allowed, wait = get_throttle_backend().hit(self.get_cache_key(request), rate, 60)
 
-        self.history = cache.get(cache_key, [])
-        now = time.time()
-
-        self.history = [timestamp for timestamp in self.history if now - timestamp < 60]
-
-        if len(self.history) >= rate:
-            raise Throttled(detail=f"Throttle limit exceeded. Max {rate} {request.method} requests per minute.")
-
-        self.history.append(now)
-        cache.set(cache_key, self.history, timeout=60)
+        if not allowed:
+            raise Throttled(
+                wait=math.ceil(wait),
+                detail=f"Throttle limit exceeded. Max {rate} {request.method} requests per minute."
+            )
 
         return True
-
-    def wait(self):
-        if self.history:
-            earliest = min(self.history)
-            return 60 - (time.time() - earliest)
-        return None
\ No newline at end of file
@@ -68,13 +68,13 @@ urlpatterns = [
     url(r'^product/(?P<product_id>[0-9]+)/similarBrand$', SimilarBrandProductsApiView.as_view(),
         name='similarBrandProducts'),
     url(r'^product/(?P<product_id>[0-9]+)/similarAvails$', SimilarAvailProductsApiView.as_view(),
-        name='similarBrandProducts'),
+        name='similarAvailsProducts'),
     url(r'^product/(?P<product_id>[0-9]+)/similarProperties$', SimilarPropertiesProductsApiView.as_view(),
         name='similarPropertiesProduct'),
     url(r'^product/(?P<product_id>[0-9]+)/similarCategory$', SimilarCategoryProductsApiView.as_view(),
         name='similarCategoryProduct'),
 
-    url(r'^product/topViewed$', TopViewedShopProductsAPIView.as_view(), name='shopProductList'),
+    url(r'^product/topViewed$', TopViewedShopProductsAPIView.as_view(), name='topViewedProducts'),
 
     url(r'^product/(?P<product_id>[0-9]+)/viewSummary$', ProductViewSummaryAPIView.as_view(),
         name='productViewSummary'),
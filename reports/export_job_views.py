@@ -0,0 +1,29 @@
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import generics
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from reports.models import ExportJob
+from reports.serializers import ExportJobSerializer
+
+
+class ExportJobDetailView(generics.RetrieveAPIView):
+    permission_classes = (IsAuthenticated,)
+    serializer_class = ExportJobSerializer
+
+    def get_queryset(self):
+        return ExportJob.objects.filter(user=self.request.user)
+
+
+class ExportJobDownloadView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, pk):
+        job = get_object_or_404(ExportJob, pk=pk, user=request.user, status=ExportJob.DONE)
+        return FileResponse(
+            job.file.open('rb'),
+            as_attachment=True,
+            filename=job.file_name,
+            content_type=job.content_type or None
+        )
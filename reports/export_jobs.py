@@ -0,0 +1,151 @@
+import datetime
+import re
+import secrets
+import tempfile
+import traceback
+
+from django.core.files import File
+from django.core.handlers.base import BaseHandler
+from django.db import transaction
+from django.db.models import Q
+from django.test import RequestFactory
+from rest_framework import status
+from rest_framework.response import Response
+
+from reports.models import ExportJob
+
+BACKGROUND_QUERY_PARAM = 'background'
+
+# identical requests get the job of a recent request (and its file) in this many seconds
+EXPORT_JOB_REUSE_TIMEOUT = 10 * 60
+# running jobs older than this are assumed to be lost by their worker and are claimed again
+EXPORT_JOB_TIMEOUT = 30 * 60
+EXPORT_JOB_KEEP_DAYS = 1
+
+EXTENSIONS = {
+    'xlsx': 'xlsx',
+    'csv': 'csv',
+    'pdf': 'pdf',
+}
+
+
+def is_background_export(request):
+    return request.GET.get(BACKGROUND_QUERY_PARAM) in ('1', 'true')
+
+
+def enqueue_export_job(request):
+    """
+        Returns a job rendering this export request off request, a recent job of an identical request is reused
+    """
+    query = request.GET.copy()
+    query.pop('token', None)
+    query.pop(BACKGROUND_QUERY_PARAM, None)
+
+    now = datetime.datetime.now()
+    key = ExportJob.get_key(request.user.id, request.path, query)
+    job = ExportJob.objects.filter(
+        key=key,
+        created_at__gte=now - datetime.timedelta(seconds=EXPORT_JOB_REUSE_TIMEOUT)
+    ).exclude(status=ExportJob.FAILED).order_by('-created_at').first()
+
+    if job is None:
+        job = ExportJob.objects.create(
+            user=request.user,
+            key=key,
+            path=request.path,
+            query_string=query.urlencode(),
+            host=request.get_host(),
+            is_secure=request.is_secure(),
+            created_at=now,
+        )
+    return job
+
+
+def get_export_job_response(request):
+    from reports.serializers import ExportJobSerializer
+
+    job = enqueue_export_job(request)
+    return Response(ExportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+def claim_export_job():
+    """
+        Marks the oldest pending job as running and returns it, workers skip jobs locked by each other
+    """
+    now = datetime.datetime.now()
+    with transaction.atomic():
+        job = ExportJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status=ExportJob.PENDING) | Q(
+                status=ExportJob.RUNNING,
+                started_at__lt=now - datetime.timedelta(seconds=EXPORT_JOB_TIMEOUT)
+            )
+        ).order_by('created_at').first()
+        if job:
+            job.status = ExportJob.RUNNING
+            job.started_at = now
+            job.save(update_fields=['status', 'started_at'])
+    return job
+
+
+class ExportJobHandler(BaseHandler):
+    """
+        Runs requests of jobs through middlewares and views of the project, as requests of their users
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.load_middleware()
+
+    def get_job_response(self, job):
+        # a one time token known only to this request, `get_request_token_user` returns user of job for it
+        token = secrets.token_hex(20)
+        request = RequestFactory().get(
+            '{}?{}'.format(job.path, job.query_string),
+            HTTP_HOST=job.host,
+            HTTP_AUTHORIZATION='Token {}'.format(token),
+            secure=job.is_secure,
+        )
+        request._token_session = (token, job.user)
+        return self.get_response(request)
+
+
+def get_file_name(job, response):
+    match = re.search(r'filename="([^"]+)"', response.get('Content-Disposition', ''))
+    if match:
+        return match.group(1)
+    export_type = job.path.rstrip('/').rsplit('/', 1)[-1]
+    return '{}.{}'.format(job.id, EXTENSIONS.get(export_type, 'html'))
+
+
+def render_export_job(job, handler=None):
+    handler = handler or ExportJobHandler()
+    try:
+        response = handler.get_job_response(job)
+        if response.status_code != status.HTTP_200_OK:
+            raise ValueError('export responded {}'.format(response.status_code))
+
+        with tempfile.TemporaryFile() as file:
+            for chunk in response.streaming_content if response.streaming else [response.content]:
+                file.write(chunk)
+            response.close()
+
+            job.file_name = get_file_name(job, response)
+            job.content_type = response.get('Content-Type', '')
+            job.file.save(job.file_name, File(file), save=False)
+        job.status = ExportJob.DONE
+    except Exception:
+        job.status = ExportJob.FAILED
+        job.error = traceback.format_exc()
+
+    job.finished_at = datetime.datetime.now()
+    job.save()
+    return job
+
+
+def delete_old_export_jobs():
+    for job in ExportJob.objects.filter(
+            created_at__lt=datetime.datetime.now() - datetime.timedelta(days=EXPORT_JOB_KEEP_DAYS)
+    ).exclude(status=ExportJob.RUNNING).iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
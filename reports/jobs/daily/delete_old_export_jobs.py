@@ -0,0 +1,10 @@
+from django_extensions.management.jobs import DailyJob
+
+from reports.export_jobs import delete_old_export_jobs
+
+
+class Job(DailyJob):
+    help = "Delete old export jobs and their files"
+
+    def execute(self):
+        delete_old_export_jobs()
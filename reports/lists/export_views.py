@@ -1,21 +1,20 @@
 import datetime
+import itertools
 import json
 import re
-from io import BytesIO
 
 import jdatetime
-import pandas
-import xlsxwriter
 from django.db.models import Q
-from django.http.response import HttpResponse
 from django.shortcuts import render
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from wkhtmltopdf.views import PDFTemplateView
 
-from helpers.exports import get_xlsx_response
+from helpers.db import ordered_queryset_iterator
+from helpers.exports import get_xlsx_response, get_csv_response, XlsxStreamWriter
 from helpers.functions import rgetattr, date_to_str, add_separator, bool_to_str, fee_display
+from reports.export_jobs import is_background_export, get_export_job_response
 from server.settings import DATE_FORMAT
 
 
@@ -32,6 +31,8 @@ class BaseExportView(APIView, PDFTemplateView):
     filterset_class = None
     context = {}
     template_prefix = None
+    # when False `get_xlsx_data` gets all forms and writes the whole sheet
+    xlsx_data_per_form = True
 
     def get_template_prefix(self):
         if self.template_prefix:
@@ -58,46 +59,26 @@ class BaseExportView(APIView, PDFTemplateView):
 
         return context
 
-    def xlsx_response(self, request, *args, **kwargs):
-        sheet_name = "{}.xlsx".format(self.filename)
-
-        with BytesIO() as b:
-            writer = pandas.ExcelWriter(b, engine='xlsxwriter')
-            data = []
-
-            bordered_rows = []
-            i = 0
-            for form in self.get_context_data(user=request.user)['forms']:
-                data += self.get_xlsx_data(form)
-
-                bordered_rows.append([i, len(data) - 1])
-
-                i = len(data) + 2
-
-                data.append([])
-                data.append([])
-
-            df = pandas.DataFrame(data)
-            df.to_excel(
-                writer,
-                sheet_name=sheet_name,
-                index=False,
-                header=False
-            )
-            workbook = writer.book
-            worksheet = writer.sheets[sheet_name]
-            worksheet.right_to_left()
+    def write_xlsx(self, writer, forms):
+        """
+            Writes rows of each form (`get_xlsx_data(form)`) in a bordered block followed by two empty rows,
+            or rows of `get_xlsx_data(forms)` when `xlsx_data_per_form` is False
+        """
+        if not self.xlsx_data_per_form:
+            writer.write_rows(self.get_xlsx_data(ordered_queryset_iterator(forms)))
+            return
 
-            border_fmt = workbook.add_format({'bottom': 1, 'top': 1, 'left': 1, 'right': 1})
+        for form in ordered_queryset_iterator(forms):
+            first_row = writer.row
+            writer.write_rows(self.get_xlsx_data(form))
+            writer.add_border(first_row, writer.row - 1)
+            writer.skip_rows(2)
 
-            for bordered_row in bordered_rows:
-                worksheet.conditional_format(xlsxwriter.utility.xl_range(
-                    bordered_row[0], 0, bordered_row[1], len(df.columns) - 1
-                ), {'type': 'no_errors', 'format': border_fmt})
-            writer.save()
-            response = HttpResponse(b.getvalue(), content_type='application/vnd.ms-excel')
-            response['Content-Disposition'] = 'attachment; filename="{}"'.format(sheet_name)
-            return response
+    def xlsx_response(self, request, *args, **kwargs):
+        file_name = "{}.xlsx".format(self.filename)
+        writer = XlsxStreamWriter(file_name)
+        self.write_xlsx(writer, self.get_context_data(user=request.user)['forms'])
+        return writer.get_response(file_name)
 
     def pdf_response(self, request, *args, **kwargs):
         self.filename = "{}.pdf".format(self.filename)
@@ -111,6 +92,9 @@ class BaseExportView(APIView, PDFTemplateView):
         )
 
     def export(self, request, export_type, *args, **kwargs):
+        if is_background_export(request):
+            return get_export_job_response(request)
+
         if export_type == 'xlsx':
             return self.xlsx_response(request, *args, **kwargs)
         elif export_type == 'pdf':
@@ -226,8 +210,13 @@ class BaseListExportView(PDFTemplateView):
     def get_response(self, request, *args, **kwargs):
         export_type = kwargs.get('export_type')
 
+        if is_background_export(request):
+            return get_export_job_response(request)
+
         if export_type == 'xlsx':
             return get_xlsx_response('{}.xlsx'.format(self.filename), self.get_xlsx_data(self.get_rows()))
+        elif export_type == 'csv':
+            return get_csv_response('{}.csv'.format(self.filename), self.get_xlsx_data(self.get_rows()))
         elif export_type == 'pdf':
             self.filename = "{}.pdf".format(self.filename)
             return super().get(request, user=request.user, *args, **kwargs)
@@ -248,17 +237,22 @@ class BaseListExportView(PDFTemplateView):
                 filters_text += " ({})".format(type_text)
             filters_text += ": {}  -  ".format(applied_filter['value'])
 
-        data = [
-            [self.title],
-            ["فیلتر های اعمال شده:", filters_text],
-            *[[data['text'], data['value']] for data in self.get_additional_data()],
-            self.get_header_texts()
-        ]
+        yield [self.title]
+        yield ["فیلتر های اعمال شده:", filters_text]
+        for data in self.get_additional_data():
+            yield [data['text'], data['value']]
+        yield self.get_header_texts()
+
+        headers = self.get_headers()
+        select_texts = {
+            header['value']: {item['value']: item['text'] for item in header['items']}
+            for header in headers if header.get('type', None) == 'select'
+        }
         i = 0
-        for item in list(items) + self.get_appended_rows():
+        for item in itertools.chain(ordered_queryset_iterator(items), self.get_appended_rows()):
             i += 1
             row = [i]
-            for header in self.get_headers():
+            for header in headers:
                 value = rgetattr(item, header['value'])
                 value_type = header.get('type', None)
 
@@ -271,7 +265,7 @@ class BaseListExportView(PDFTemplateView):
                 elif value_type == 'text' and value is not None:
                     value = str(value)
                 elif value_type == 'select' and value is not None:
-                    value = [item['text'] for item in header['items'] if item['value'] == value][0]
+                    value = select_texts[header['value']][value]
                 elif value_type == 'fee' and value is not None:
                     value = fee_display(value, display_type='xlsx')
                 else:
@@ -280,8 +274,4 @@ class BaseListExportView(PDFTemplateView):
                         value = value_display()
 
                 row.append(value)
-            data.append(row)
-
-        return data
-
-
+            yield row
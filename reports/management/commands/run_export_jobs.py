@@ -0,0 +1,29 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import close_old_connections
+
+from reports.export_jobs import claim_export_job, render_export_job, ExportJobHandler
+
+
+class Command(BaseCommand):
+    help = 'render queued export jobs, runs until stopped unless --once is passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+        parser.add_argument('--sleep', type=float, default=2, help='seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        handler = ExportJobHandler()
+        while True:
+            close_old_connections()
+            job = claim_export_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+
+            started_at = time.perf_counter()
+            job = render_export_job(job, handler)
+            self.stdout.write('{} {} in {:.1f} s'.format(job, job.file_name, time.perf_counter() - started_at))
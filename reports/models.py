@@ -0,0 +1,54 @@
+import hashlib
+import json
+import uuid
+
+from django.db import models
+
+
+def export_job_upload_to(instance, filename):
+    # media files are public, a random directory keeps exports of users unguessable
+    return 'export_jobs/{}/{}'.format(uuid.uuid4().hex, filename)
+
+
+class ExportJob(models.Model):
+    PENDING = 'pe'
+    RUNNING = 'ru'
+    DONE = 'do'
+    FAILED = 'fa'
+
+    STATUS_CHOICES = (
+        (PENDING, 'در صف'),
+        (RUNNING, 'در حال ساخت'),
+        (DONE, 'آماده'),
+        (FAILED, 'ناموفق'),
+    )
+
+    user = models.ForeignKey('users.User', related_name='export_jobs', on_delete=models.CASCADE)
+    # hash of user, path and filters, identical requests share a job
+    key = models.CharField(max_length=32, db_index=True)
+    path = models.CharField(max_length=255)
+    query_string = models.TextField(blank=True)
+    host = models.CharField(max_length=255)
+    is_secure = models.BooleanField(default=False)
+
+    status = models.CharField(choices=STATUS_CHOICES, max_length=2, default=PENDING)
+    file = models.FileField(upload_to=export_job_upload_to, null=True, blank=True)
+    file_name = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField()
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='export_job_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return '{} {} {}'.format(self.id, self.path, self.status)
+
+    @staticmethod
+    def get_key(user_id, path, query):
+        return hashlib.md5(json.dumps([user_id, path, sorted(query.lists())]).encode()).hexdigest()
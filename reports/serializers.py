@@ -0,0 +1,18 @@
+from django.urls import reverse
+from rest_framework import serializers
+
+from helpers.serializers import SModelSerializer
+from reports.models import ExportJob
+
+
+class ExportJobSerializer(SModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ('id', 'status', 'file_name', 'created_at', 'finished_at', 'download_url')
+
+    def get_download_url(self, obj: ExportJob):
+        if obj.status != ExportJob.DONE:
+            return None
+        return reverse('exportJobDownload', kwargs={'pk': obj.id})
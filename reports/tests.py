@@ -0,0 +1,69 @@
+import datetime
+import tempfile
+
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from helpers.test import MTestCase
+from reports.export_jobs import enqueue_export_job, claim_export_job, render_export_job, EXPORT_JOB_TIMEOUT
+from reports.models import ExportJob
+from users.models import User
+
+
+class ExportJobHandlerStub:
+
+    def get_job_response(self, job):
+        response = HttpResponse(b'exported', content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="products.csv"'
+        return response
+
+
+class ExportJobTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='exporter', mobile_number=self.get_fake_phone_number())
+
+    def get_request(self, **params):
+        request = RequestFactory().get('/reports/lists/products/csv', data=params)
+        request.user = self.user
+        return request
+
+    def create_job(self, status, created_at, started_at=None):
+        return ExportJob.objects.create(
+            user=self.user, key=status, path='/reports/lists/products/csv', host='testserver', status=status,
+            created_at=created_at, started_at=started_at
+        )
+
+    def test_recent_job_of_identical_request_is_reused(self):
+        job = enqueue_export_job(self.get_request(name='a', token='first', background=1))
+        self.assertEqual(enqueue_export_job(self.get_request(name='a', token='second')), job)
+        self.assertNotEqual(enqueue_export_job(self.get_request(name='b')), job)
+
+        ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.FAILED)
+        self.assertNotEqual(enqueue_export_job(self.get_request(name='a')), job)
+
+    def test_running_jobs_are_skipped_until_timeout(self):
+        now = datetime.datetime.now()
+        running = self.create_job(ExportJob.RUNNING, now - datetime.timedelta(minutes=2), started_at=now)
+        pending = self.create_job(ExportJob.PENDING, now - datetime.timedelta(minutes=1))
+
+        self.assertEqual(claim_export_job(), pending)
+        self.assertIsNone(claim_export_job())
+
+        ExportJob.objects.filter(pk=running.pk).update(
+            started_at=now - datetime.timedelta(seconds=EXPORT_JOB_TIMEOUT + 1)
+        )
+        self.assertEqual(claim_export_job(), running)
+
+    def test_rendered_file_is_stored(self):
+        job = self.create_job(ExportJob.RUNNING, datetime.datetime.now())
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            render_export_job(job, ExportJobHandlerStub())
+
+            job.refresh_from_db()
+            self.assertEqual(job.status, ExportJob.DONE)
+            self.assertEqual(job.file_name, 'products.csv')
+            self.assertEqual(job.content_type, 'text/csv; charset=utf-8')
+            with job.file.open('rb') as file:
+                self.assertEqual(file.read(), b'exported')
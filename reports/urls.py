@@ -1,4 +1,8 @@
+from django.conf.urls import url
+
+from reports.export_job_views import ExportJobDetailView, ExportJobDownloadView
 
 urlpatterns = [
+    url(r'^exportJobs/(?P<pk>[0-9]+)$', ExportJobDetailView.as_view(), name='exportJobDetail'),
+    url(r'^exportJobs/(?P<pk>[0-9]+)/download$', ExportJobDownloadView.as_view(), name='exportJobDownload'),
 ]
-
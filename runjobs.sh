@@ -5,8 +5,24 @@ workTree=/home/mmd/sobhan/server
 echo "---Activating virtualenv..."
 source /home/mmd/sobhan/env/bin/activate
 
+# run every minute, longer periods run in their first minute (read before minutely jobs take time)
+minute=$(date +%-M)
+hour=$(date +%-H)
+
 echo "---Running jobs..."
 cd $workTree
 python manage.py runjobs minutely
 
-echo "---Done..."
\ No newline at end of file
+if [ $((minute % 15)) -eq 0 ]; then
+    python manage.py runjobs quarter_hourly
+fi
+
+if [ $minute -eq 0 ]; then
+    python manage.py runjobs hourly
+fi
+
+if [ $minute -eq 0 ] && [ $hour -eq 3 ]; then
+    python manage.py runjobs daily
+fi
+
+echo "---Done..."
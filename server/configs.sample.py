@@ -12,6 +12,19 @@ Databases = {
     }
 }
 
+Caches = {
+    'default': {
+        'BACKEND': 'helpers.cache.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+        'KEY_PREFIX': 'exuni',
+        'KEY_FUNCTION': 'helpers.cache.make_key',
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'IGNORE_EXCEPTIONS': True,
+        }
+    }
+}
+
 client = MongoClient(
     host='localhost',
     port=27017
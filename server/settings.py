@@ -16,7 +16,7 @@ import os
 import datetime
 import sys
 
-from server.configs import Databases, RequestLogs
+from server.configs import Databases, RequestLogs, Caches
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SERVER_URL = 'http://127.0.0.1:7000'
@@ -94,8 +94,6 @@ MIDDLEWARE = [
 
     'helpers.middlewares.modify_request_middleware.ModifyRequestMiddleware',
 
-    'helpers.middlewares.check_token_expiration.CheckTokenExpiration',
-
     'helpers.middlewares.log_request_middleWare.LogRequestMiddleware',
     'helpers.middlewares.check_financial_year_middleware.CheckFinancialYearMiddleware',
 
@@ -151,6 +149,8 @@ WSGI_APPLICATION = 'server.wsgi.application'
 
 DATABASES = Databases
 
+CACHES = Caches
+
 # Password validation
 # https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
 
@@ -188,7 +188,7 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
     ),
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.ScopedRateThrottle',
+        'helpers.throttling.ScopedRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'verification_code': '5/hours',
@@ -217,6 +217,20 @@ MEDIA_URL = '/media/'
 AUTH_USER_MODEL = 'users.User'
 
 TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
+if TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'helpers.cache.LocMemCache',
+            'KEY_FUNCTION': 'helpers.cache.make_key',
+        }
+    }
+
+DJANGO_REDIS_LOG_IGNORED_EXCEPTIONS = True
+
+# tokens expire after this many seconds without requests, see helpers.token_sessions
+TOKEN_SESSION_EXPIRATION = 60 * 60
+TOKEN_SESSION_WRITE_THRESHOLD = 60 * 10
 DEVELOPING = (sys.argv[1] == 'runserver')
 
 LOCALE_PATHS = (
@@ -3,10 +3,12 @@ from decimal import Decimal
 
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from django.db import transaction
-from django.db.models import F, Q
+from django.db.models import F, Q, Case, When, Value, IntegerField
 
+from helpers.cache import invalidate_cache_tags
 from products.models import ProductInventoryHistory, ProductInventory, Product
-from shop.models import LimitedTimeOfferItems
+from products.signals import PRODUCTS_CACHE_TAG
+from shop.models import LimitedTimeOfferItems, ShopOrder, ShopOrderItem
 
 
 def reduce_inventory(product_id, val, user=None):
@@ -56,3 +58,76 @@ def increase_inventory(product_id, val, user=None):
             )
         except ObjectDoesNotExist:
             raise ValidationError('product inventory not found')
+
+
+def place_shop_order(customer, cart_items, shipment_address):
+    """
+    Registers cart items as a shop order with a constant number of queries
+
+    Inventories are locked in id order (so concurrent orders can not deadlock) and reduced by one conditional
+    update, totals are computed from prices read while locking
+    """
+    now = datetime.datetime.now()
+    quantities = {}
+    for item in cart_items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+    with transaction.atomic():
+        inventories = list(ProductInventory.objects.filter(
+            product_id__in=quantities.keys()
+        ).select_related('product').select_for_update(of=('self',)).order_by('id'))
+
+        if len(inventories) != len(quantities):
+            raise ValidationError('product inventory not found')
+
+        for inventory in inventories:
+            if inventory.inventory < quantities[inventory.product_id]:
+                raise ValidationError('موجودی کالا کافی نیست: {}'.format(inventory.product.name))
+
+        quantity_case = Case(
+            *[When(id=inventory.id, then=Value(quantities[inventory.product_id])) for inventory in inventories],
+            output_field=IntegerField()
+        )
+        updated_count = ProductInventory.objects.filter(
+            id__in=[inventory.id for inventory in inventories],
+            inventory__gte=quantity_case
+        ).update(inventory=F('inventory') - quantity_case, last_updated=now)
+        if updated_count != len(inventories):
+            raise ValidationError('موجودی کالا کافی نیست')
+
+        prices = {inventory.product_id: inventory.product.last_price or Decimal('0') for inventory in inventories}
+
+        shop_order = ShopOrder.objects.create(
+            customer=customer,
+            date_time=now,
+            shipment_address=shipment_address,
+            total_price=sum(prices[product_id] * quantity for product_id, quantity in quantities.items()),
+            total_product_quantity=sum(quantities.values()),
+        )
+
+        ShopOrderItem.objects.bulk_create([
+            ShopOrderItem(
+                shop_order=shop_order,
+                product_id=inventory.product_id,
+                price=prices[inventory.product_id],
+                product_quantity=quantities[inventory.product_id],
+                created_by=customer,
+                created_at=now,
+            ) for inventory in inventories
+        ])
+
+        ProductInventoryHistory.objects.bulk_create([
+            ProductInventoryHistory(
+                inventory=inventory,
+                action=ProductInventoryHistory.DECREASE,
+                amount=quantities[inventory.product_id],
+                previous_quantity=inventory.inventory,
+                new_quantity=inventory.inventory - quantities[inventory.product_id],
+                changed_by=customer,
+            ) for inventory in inventories
+        ])
+
+        # inventories are updated without signals, cached product lists show them
+        transaction.on_commit(lambda: invalidate_cache_tags(PRODUCTS_CACHE_TAG))
+
+    return shop_order
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0019_auto_20250513_1455'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['product', 'created_at', 'id'], name='comment_product_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoporder',
+            index=models.Index(fields=['customer', 'date_time', 'id'], name='shop_order_customer_date_idx'),
+        ),
+    ]
@@ -155,6 +155,9 @@ class ShopOrder(BaseModel):
             ('updateOwn.shop_order', 'ویرایش سفارش های فروشگاه خود'),
             ('deleteOwn.shop_order', 'حذف سفارش های فروشگاه خود'),
         )
+        indexes = [
+            models.Index(fields=['customer', 'date_time', 'id'], name='shop_order_customer_date_idx'),
+        ]
 
     # FSM status change functions
 
@@ -312,6 +315,9 @@ class Comment(BaseModel):
             ('updateOwn.comment', 'ویرایش کامنت های خود'),
             ('deleteOwn.comment', 'حذف کامنت های خود'),
         )
+        indexes = [
+            models.Index(fields=['product', 'created_at', 'id'], name='comment_product_created_at_idx'),
+        ]
 
 
 class Rate(BaseModel):
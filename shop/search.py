@@ -1,12 +1,16 @@
-from django.contrib.postgres.search import SearchQuery, SearchVector, SearchRank, TrigramSimilarity
-from django.db.models import Q, Value, CharField
-from django.db.models.functions import Greatest
-from rest_framework import status
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Value, CharField
+from rest_framework import status, generics
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from products.models import Product, Brand, Category
-from shop.throttles import UserSearchAutoCompleteRateThrottle, AnonSearchAutoCompleteRateThrottle
+from products.search import search_products
+from products.shop.querysets import shop_product_simple_list_queryset
+from products.shop.serializers import ShopProductsSimpleListSerializers
+from shop.throttles import UserSearchAutoCompleteRateThrottle, AnonSearchAutoCompleteRateThrottle, \
+    UserProductSearchRateThrottle, AnonProductSearchRateThrottle
 
 
 class GlobalAutoCompleteSearchAPIView(APIView):
@@ -17,31 +21,17 @@ class GlobalAutoCompleteSearchAPIView(APIView):
         if len(query) < 3:
             return Response({'result': []}, status=status.HTTP_400_BAD_REQUEST)
 
-        search_query = SearchQuery(query)
-        search_vector = (
-            SearchVector('name', weight='A') +
-            SearchVector('brand__name', weight='B') +
-            SearchVector('category__name', weight='B')
-
-        )
         result = []
 
-        product_queryset = Product.objects.annotate(
-            rank=SearchRank(search_vector, search_query),
-            similarity=Greatest(
-                TrigramSimilarity('name', query),
-                TrigramSimilarity('brand__name', query),
-                TrigramSimilarity('category__name', query),
-            )
-        ).filter(
-            similarity__gt=0.15
+        product_queryset = search_products(
+            Product.objects.filter(status=Product.PUBLISHED),
+            query
         ).annotate(
             type=Value('product', output_field=CharField())
         ).values(
             'id', 'name', 'type'
         ).order_by(
-            '-rank',
-            '-similarity'
+            '-search_rank'
         )[:5]
 
         result.extend(product_queryset)
@@ -49,7 +39,7 @@ class GlobalAutoCompleteSearchAPIView(APIView):
         brand_queryset = Brand.objects.annotate(
             similarity=TrigramSimilarity('name', query)
         ).filter(
-            search_querysimilarity__gt=0.3
+            similarity__gt=0.3
         ).annotate(
             type=Value('brand', output_field=CharField())
         ).values(
@@ -63,7 +53,7 @@ class GlobalAutoCompleteSearchAPIView(APIView):
         category_queryset = Category.objects.annotate(
             similarity=TrigramSimilarity('name', query)
         ).filter(
-            search_querysimilarity__gt=0.3
+            similarity__gt=0.3
         ).annotate(
             type=Value('category', output_field=CharField())
         ).values(
@@ -74,4 +64,20 @@ class GlobalAutoCompleteSearchAPIView(APIView):
 
         result.extend(category_queryset)
 
-        return Response({'result': result}, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({'result': result}, status=status.HTTP_200_OK)
+
+
+class ShopProductSearchView(generics.ListAPIView):
+    """
+        Published products ranked by matched full text words and similarity of words (for typos)
+    """
+    serializer_class = ShopProductsSimpleListSerializers
+    throttle_classes = [UserProductSearchRateThrottle, AnonProductSearchRateThrottle]
+    pagination_class = LimitOffsetPagination
+
+    def get_queryset(self):
+        queryset = search_products(
+            Product.objects.filter(status=Product.PUBLISHED, product_type__in=[Product.VARIABLE, Product.SIMPLE]),
+            self.request.query_params.get('search_value', '')
+        ).order_by('-search_rank', '-id')
+        return shop_product_simple_list_queryset(queryset, self.request.user)
@@ -4,8 +4,8 @@ from cms.views import HeaderElementApiView, PopUpElementApiView, BannerContentAp
 from crm.views import UserCurrentNotificationsAPIView, UserCurrentNotificationsBySortAPIView
 from products.shop.views import ShopProductSimpleListView, BrandShopListView, CategoryTreeView, RootCategoryListView, \
     ShopProductWithCommentsListView, CurrentUserHasOrderProductViewSet, CurrentUserRelatedProductViewSet, \
-    PendingReviewProductsView, UserProductsWithCommentView
-from shop.search import GlobalAutoCompleteSearchAPIView
+    PendingReviewProductsView, UserProductsWithCommentView, ShopProductFacetedSearchView
+from shop.search import GlobalAutoCompleteSearchAPIView, ShopProductSearchView
 from shop.views import ToggleWishListBTNView, ToggleComparisonListBTNView, CurrentUserCartApiView, CartSyncView, \
     CartDetailView, ClearCustomerCartView, CurrentUserWishListApiView, WishListDetailView, WishlistSyncView, \
     CurrentUserComparisonApiView, ComparisonSyncView, ComparisonDetailView, SyncAllDataView, \
@@ -21,6 +21,7 @@ urlpatterns = [
     url(r'^changePhoneByVerificationCode$', ChangePhoneView.as_view()),
 
     url(r'^products$', ShopProductSimpleListView.as_view(), name='shopProductSimpleList'),
+    url(r'^products/facets$', ShopProductFacetedSearchView.as_view(), name='shopProductFacetedSearch'),
 
     url(r'^brands$', BrandShopListView.as_view(),name='brandShop'),
     url(r'^categoryTree$', CategoryTreeView.as_view(), name='categoryTree'),
@@ -56,6 +57,7 @@ urlpatterns = [
     url(r'^currentShopHomePageStory$', ShopHomePageStoryApiView.as_view(), name='currentShopHomePageStory'),
 
     url(r'^searchAutoCompelete$', GlobalAutoCompleteSearchAPIView.as_view(), name='globalAutoCompleteSearch'),
+    url(r'^products/search$', ShopProductSearchView.as_view(), name='shopProductSearch'),
 
     url(r'^productsWithComments$', ShopProductWithCommentsListView.as_view(), name='productsWithComments'),
 
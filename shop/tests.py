@@ -1,3 +1,51 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+
+from helpers.test import MTestCase
+from products.models import Product, ProductInventory, ProductInventoryHistory
+from shop.helpers import place_shop_order
+from shop.models import Cart, ShipmentAddress, ShopOrderItem
+from users.models import User
+
+
+class PlaceShopOrderTest(MTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.customer = User.objects.create(username='customer', mobile_number=self.get_fake_phone_number())
+        self.address = ShipmentAddress.objects.create(
+            customer=self.customer, state='tehran', city='tehran', address='address', zip_code='1234567890'
+        )
+        self.first = Product.objects.create(product_id='first', name='first', price=100, first_inventory=5)
+        self.second = Product.objects.create(product_id='second', name='second', price=30, first_inventory=2)
+
+    def add_to_cart(self, product, quantity):
+        return Cart.objects.create(customer=self.customer, product=product, quantity=quantity)
+
+    def test_order_reduces_inventories(self):
+        cart_items = [self.add_to_cart(self.first, 2), self.add_to_cart(self.first, 1), self.add_to_cart(self.second, 2)]
+
+        shop_order = place_shop_order(self.customer, cart_items, self.address)
+
+        self.assertEqual(ProductInventory.objects.get(product=self.first).inventory, 2)
+        self.assertEqual(ProductInventory.objects.get(product=self.second).inventory, 0)
+        self.assertEqual(shop_order.total_price, Decimal('360'))
+        self.assertEqual(shop_order.total_product_quantity, 5)
+        self.assertEqual(
+            set(ShopOrderItem.objects.filter(shop_order=shop_order).values_list('product_id', 'product_quantity')),
+            {(self.first.id, 3), (self.second.id, 2)}
+        )
+        history = ProductInventoryHistory.objects.get(
+            inventory__product=self.first, action=ProductInventoryHistory.DECREASE
+        )
+        self.assertEqual((history.amount, history.previous_quantity, history.new_quantity), (3, 5, 2))
+
+    def test_insufficient_inventory_is_rejected(self):
+        cart_items = [self.add_to_cart(self.first, 1), self.add_to_cart(self.second, 3)]
+
+        with self.assertRaises(ValidationError):
+            place_shop_order(self.customer, cart_items, self.address)
+
+        self.assertEqual(ProductInventory.objects.get(product=self.first).inventory, 5)
+        self.assertFalse(ShopOrderItem.objects.exists())
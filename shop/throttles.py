@@ -1,4 +1,4 @@
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+from helpers.throttling import UserRateThrottle, AnonRateThrottle
 
 
 class SyncAllDataThrottle(UserRateThrottle):
@@ -13,6 +13,14 @@ class AnonSearchAutoCompleteRateThrottle(AnonRateThrottle):
     rate = '40/min'
 
 
+class UserProductSearchRateThrottle(UserRateThrottle):
+    rate = '60/min'
+
+
+class AnonProductSearchRateThrottle(AnonRateThrottle):
+    rate = '40/min'
+
+
 class AddToCardRateThrottle(UserRateThrottle):
     rate = '20/min'
 
@@ -9,7 +9,6 @@ from django.http import Http404, HttpResponseForbidden
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from rest_framework.exceptions import ValidationError
-from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.views import APIView
 
@@ -18,11 +17,12 @@ from rest_framework import status, generics
 
 from helpers.auth import BasicObjectPermission
 from helpers.functions import get_current_user
+from helpers.pagination import KeysetLimitOffsetPagination
 from products.models import Product
 from shop.filters import ShopOrderFilter
-from shop.helpers import reduce_inventory
+from shop.helpers import place_shop_order
 from shop.models import Cart, WishList, Comparison, ShipmentAddress, LimitedTimeOffer, Rate, Comment, ShopOrder, \
-    ShopOrderItem, ShopOrderStatusHistory
+    ShopOrderStatusHistory
 from shop.serializers import CartCRUDSerializer, CartRetrieveSerializer, WishListRetrieveSerializer, \
     WishListCRUDSerializer, ComparisonRetrieveSerializer, ComparisonCRUDSerializer, ShipmentAddressCRUDSerializer, \
     ShipmentAddressRetrieveSerializer, LimitedTimeOfferItemsSerializer, LimitedTimeOfferSerializer, RateSerializer, \
@@ -475,48 +475,21 @@ class ShopOrderRegistrationView(APIView):
     def post(self, request):
         data = request.data
         customer = get_current_user()
-        cart_items = Cart.objects.filter(customer=customer).select_related('product')
-        if not cart_items.exists():
+        cart_items = list(Cart.objects.filter(customer=customer))
+        if not cart_items:
             return Response({'detail': 'your cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             with transaction.atomic():
+                shop_order = place_shop_order(customer, cart_items, data['address'])
+                Cart.objects.filter(id__in=[item.id for item in cart_items]).delete()
 
-                #Preventing  race condition
-                product_ids = [item.product.id for item in cart_items]
-                locked_products = Product.objects.filter(id__in=product_ids).select_for_update()
-
-                product_map = {product.id: product for product in locked_products}
-
-                shop_order = ShopOrder.objects.create(
-                    customer=customer,
-                    date_time=datetime.datetime.now(),
-                    shipment_address=data['address'],
-                )
-
-                for item in cart_items:
-                    product = product_map[item.product.id]
-                    if product.inventory < item.quantity:
-                        raise Exception('not enough inventory for {}'.format(product.name))
-
-                    ShopOrderItem.objects.create(
-                        shop_order=shop_order,
-                        product=item.product,
-                        price=item.product.last_price,
-                        product_quantity=item.quantity,
-                    )
-
-                    # Inventory reduction
-                    reduce_inventory(item.product.id, item.quantity)
-
-                cart_items.delete()
-                shop_order.set_constants()
-                return Response(
-                    {
-                        'detail': 'initial order registration completed',
-                        'order_id': shop_order.exuni_tracking_code,
-                        'exuni_tracking_code': shop_order.exuni_tracking_code
-                    }, status=status.HTTP_201_CREATED)
+            return Response(
+                {
+                    'detail': 'initial order registration completed',
+                    'order_id': shop_order.exuni_tracking_code,
+                    'exuni_tracking_code': shop_order.exuni_tracking_code
+                }, status=status.HTTP_201_CREATED)
 
         except Exception as exception:
             return Response({'detail': str(exception)}, status=status.HTTP_400_BAD_REQUEST)
@@ -712,10 +685,12 @@ class ToggleComparisonListBTNView(APIView):
 class UserOrdersListView(generics.ListAPIView):
 
     serializer_class = CustomerShopOrderSimpleSerializer
-    throttle_classes = OrderRetrieveThrottle
+    throttle_classes = [OrderRetrieveThrottle]
     filterset_class = ShopOrderFilter
-    ordering_fields = '__all__'
-    pagination_class = LimitOffsetPagination
+    ordering_fields = ['id', 'date_time']
+    pagination_class = KeysetLimitOffsetPagination
+    keyset_ordering_fields = {'id': 'id', 'date_time': 'date_time'}
+    keyset_ordering = '-id'
 
     def get_queryset(self):
         return ShopOrder.objects.filter(
@@ -1,13 +1,9 @@
-import pandas
 from django.db.models import Q
-from io import BytesIO
 
 from helpers.functions import add_separator, date_to_str, datetime_to_time
 from reports.lists.export_views import BaseExportView
 from subscription.models import Factor, Transaction
 from subscription.views import FactorListView, UserTurnover
-import xlsxwriter
-from django.http import HttpResponse
 
 
 class SubscriptionFactorListExportView(FactorListView, BaseExportView):
@@ -18,6 +14,7 @@ class SubscriptionFactorListExportView(FactorListView, BaseExportView):
         'title': 'لیست فاکتور ها',
     }
     pagination_class = None
+    xlsx_data_per_form = False
 
     def get_queryset(self):
         return self.filterset_class(self.request.GET, queryset=super().get_queryset()).qs
@@ -41,40 +38,9 @@ class SubscriptionFactorListExportView(FactorListView, BaseExportView):
 
         return context
 
-    def xlsx_response(self, request, *args, **kwargs):
-        sheet_name = "{}.xlsx".format(self.filename)
-
-        with BytesIO() as b:
-            writer = pandas.ExcelWriter(b, engine='xlsxwriter')
-            data = []
-
-            bordered_rows = []
-            data += self.get_xlsx_data(self.get_context_data(user=request.user)['forms'])
-            df = pandas.DataFrame(data)
-            df.to_excel(
-                writer,
-                sheet_name=sheet_name,
-                index=False,
-                header=False
-            )
-            workbook = writer.book
-            worksheet = writer.sheets[sheet_name]
-            worksheet.right_to_left()
-
-            border_fmt = workbook.add_format({'bottom': 1, 'top': 1, 'left': 1, 'right': 1})
-
-            for bordered_row in bordered_rows:
-                worksheet.conditional_format(xlsxwriter.utility.xl_range(
-                    bordered_row[0], 0, bordered_row[1], len(df.columns) - 1
-                ), {'type': 'no_errors', 'format': border_fmt})
-            writer.save()
-            response = HttpResponse(b.getvalue(), content_type='application/vnd.ms-excel')
-            response['Content-Disposition'] = 'attachment; filename="{}"'.format(sheet_name)
-            return response
-
     @staticmethod
     def get_xlsx_data(factors: Factor):
-        data = [
+        yield from [
             [
                 'لیست فاکتور ها'
             ],
@@ -85,7 +51,7 @@ class SubscriptionFactorListExportView(FactorListView, BaseExportView):
             is_paid = 'نا موفق'
             if form.is_paid:
                 is_paid = 'موفق'
-            data.append([
+            yield [
                 date_to_str(form.created_at),
                 datetime_to_time(form.created_at),
                 form.id,
@@ -95,8 +61,7 @@ class SubscriptionFactorListExportView(FactorListView, BaseExportView):
                 round(form.value_added_tax),
                 round(form.get_payable_amount()),
                 is_paid,
-            ])
-        return data
+            ]
 
 
 class SubscriptionFactorDetailExportView(FactorListView, BaseExportView):
@@ -130,37 +95,6 @@ class SubscriptionFactorDetailExportView(FactorListView, BaseExportView):
 
         return context
 
-    def xlsx_response(self, request, *args, **kwargs):
-        sheet_name = "{}.xlsx".format(self.filename)
-
-        with BytesIO() as b:
-            writer = pandas.ExcelWriter(b, engine='xlsxwriter')
-            data = []
-
-            bordered_rows = []
-            data += self.get_xlsx_data(self.get_context_data(user=request.user)['forms'])
-            df = pandas.DataFrame(data)
-            df.to_excel(
-                writer,
-                sheet_name=sheet_name,
-                index=False,
-                header=False
-            )
-            workbook = writer.book
-            worksheet = writer.sheets[sheet_name]
-            worksheet.right_to_left()
-
-            border_fmt = workbook.add_format({'bottom': 1, 'top': 1, 'left': 1, 'right': 1})
-
-            for bordered_row in bordered_rows:
-                worksheet.conditional_format(xlsxwriter.utility.xl_range(
-                    bordered_row[0], 0, bordered_row[1], len(df.columns) - 1
-                ), {'type': 'no_errors', 'format': border_fmt})
-            writer.save()
-            response = HttpResponse(b.getvalue(), content_type='application/vnd.ms-excel')
-            response['Content-Disposition'] = 'attachment; filename="{}"'.format(sheet_name)
-            return response
-
 
 class UserTurnoverListExportView(UserTurnover, BaseExportView):
     template_name = 'export/sample_form_export.html'
@@ -170,6 +104,7 @@ class UserTurnoverListExportView(UserTurnover, BaseExportView):
         'title': 'لیست  گردش حساب کاربر',
     }
     pagination_class = None
+    xlsx_data_per_form = False
 
     def get_queryset(self):
         return self.filterset_class(self.request.GET, queryset=super().get_queryset()).qs
@@ -193,40 +128,9 @@ class UserTurnoverListExportView(UserTurnover, BaseExportView):
 
         return context
 
-    def xlsx_response(self, request, *args, **kwargs):
-        sheet_name = "{}.xlsx".format(self.filename)
-
-        with BytesIO() as b:
-            writer = pandas.ExcelWriter(b, engine='xlsxwriter')
-            data = []
-
-            bordered_rows = []
-            data += self.get_xlsx_data(self.get_context_data(user=request.user)['forms'])
-            df = pandas.DataFrame(data)
-            df.to_excel(
-                writer,
-                sheet_name=sheet_name,
-                index=False,
-                header=False
-            )
-            workbook = writer.book
-            worksheet = writer.sheets[sheet_name]
-            worksheet.right_to_left()
-
-            border_fmt = workbook.add_format({'bottom': 1, 'top': 1, 'left': 1, 'right': 1})
-
-            for bordered_row in bordered_rows:
-                worksheet.conditional_format(xlsxwriter.utility.xl_range(
-                    bordered_row[0], 0, bordered_row[1], len(df.columns) - 1
-                ), {'type': 'no_errors', 'format': border_fmt})
-            writer.save()
-            response = HttpResponse(b.getvalue(), content_type='application/vnd.ms-excel')
-            response['Content-Disposition'] = 'attachment; filename="{}"'.format(sheet_name)
-            return response
-
     @staticmethod
     def get_xlsx_data(transactions: Transaction):
-        data = [
+        yield from [
             [
                 'گردش حساب کاربر'
             ],
@@ -237,7 +141,7 @@ class UserTurnoverListExportView(UserTurnover, BaseExportView):
                 factor = form.factor.id
             else:
                 factor = '-'
-            data.append([
+            yield [
                 date_to_str(form.created_at),
                 datetime_to_time(form.created_at),
                 form.explanation,
@@ -245,5 +149,4 @@ class UserTurnoverListExportView(UserTurnover, BaseExportView):
                 add_separator(form.bes),
                 add_separator(form.cumulative_remain),
                 factor,
-            ])
-        return data
+            ]
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from helpers.token_sessions import delete_token_session
+from users.models import User
+
+
+@receiver(post_delete, sender=Token)
+def clear_deleted_token_session(sender, instance, **kwargs):
+    delete_token_session(instance.key)
+
+
+@receiver(post_save, sender=User)
+def clear_user_token_sessions(sender, instance, created, **kwargs):
+    # not sent by queryset `update`, see `helpers.token_sessions.get_token_session_user`
+    if created:
+        return
+    for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+        delete_token_session(key)
@@ -1,4 +1,4 @@
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+from helpers.throttling import UserRateThrottle, AnonRateThrottle
 
 
 class UserUpdateRateThrottle(UserRateThrottle):